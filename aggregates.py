@@ -0,0 +1,223 @@
+"""分组聚合 - AGGREGATES 中的表的聚合索引
+
+统计不再每次遍历整表：聚合索引和其他索引一样挂在表缓存上，随每次写入增量更新。
+每组记 计数 / 和 / 平方和，以及 值 -> 个数 的多重集合和排好序的不同取值，
+删除时最大最小值仍然正确；更新一行是几次字典操作加上不同取值上的一次二分。
+合并日志时聚合和快照一起写到 data/<表名>.agg.json（带快照签名），重启后读出再叠加日志，不用重算。
+经外键的分组（班级）由外键分组（学生）按父表的当前值合并得到，首次使用时构建；
+之后父表记录的值改变（学生换班），由挂在父表缓存上的监视器调用 move 把该学生的整组移过去。
+
+这里只有数据结构；加锁、挂监视器、读写文件和 SQL 后端上的计算在 data_storage 中。
+"""
+import bisect
+
+
+class Summary:
+    """一组数值的计数、和、平方和，以及取值的多重集合"""
+    __slots__ = ('count', 'total', 'squares', 'counts', 'values')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.squares = 0
+        # 值 -> 个数，以及排好序的不同取值（最大最小值、小于某值的个数）
+        self.counts = {}
+        self.values = []
+
+    def add(self, value, n=1):
+        self.count += n
+        self.total += value * n
+        self.squares += value * value * n
+        current = self.counts.get(value)
+        if current is None:
+            self.counts[value] = n
+            bisect.insort(self.values, value)
+        else:
+            self.counts[value] = current + n
+
+    def remove(self, value, n=1):
+        current = self.counts.get(value)
+        if current is None:
+            return
+        n = min(n, current)
+        if current == n:
+            del self.counts[value]
+            del self.values[bisect.bisect_left(self.values, value)]
+        else:
+            self.counts[value] = current - n
+        self.count -= n
+        if self.count:
+            self.total -= value * n
+            self.squares -= value * value * n
+        else:
+            # 清空时归零，不留下浮点误差
+            self.total = self.squares = 0
+
+    def merge(self, other, sign=1):
+        """加上（sign 为 -1 时减去）另一组"""
+        update = self.add if sign > 0 else self.remove
+        for value, n in other.counts.items():
+            update(value, n)
+
+    def below(self, limit):
+        """小于 limit 的值的个数"""
+        values = self.values
+        return sum(self.counts[v] for v in values[:bisect.bisect_left(values, limit)])
+
+    def to_json(self):
+        return [self.count, self.total, self.squares, [[v, self.counts[v]] for v in self.values]]
+
+    @classmethod
+    def from_json(cls, data):
+        summary = cls()
+        summary.count, summary.total, summary.squares, pairs = data
+        summary.counts = {v: n for v, n in pairs}
+        summary.values = [v for v, _ in pairs]
+        return summary
+
+
+def summary_dict(summary, below=None):
+    """
+    一组的结果：{'count', 'sum', 'sum_squares', 'min', 'max'}，传了 below 时另有 'below'
+    summary 为 None（没有数据）时 count 为 0，min / max 为 None
+    """
+    if summary is None:
+        summary = Summary()
+    result = {
+        'count': summary.count,
+        'sum': summary.total,
+        'sum_squares': summary.squares,
+        'min': summary.values[0] if summary.values else None,
+        'max': summary.values[-1] if summary.values else None,
+    }
+    if below is not None:
+        result['below'] = summary.below(below)
+    return result
+
+
+def number(value):
+    """参与聚合的数值（bool 不算），其他取值返回 None"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    return None
+
+
+class AggregateIndex:
+    """一张表的聚合索引"""
+    __slots__ = ('column', 'total', 'groups', 'joins', 'joined', 'parents', 'current')
+
+    def __init__(self, config, rows=()):
+        """config: (聚合字段, 分组字段, {父表字段: 外键字段})，见 data_storage.AGGREGATES"""
+        column, group_columns, joins = config
+        self.column = column
+        self.total = Summary()
+        self.groups = {group: {} for group in group_columns}
+        self.joins = joins
+        # 经外键的分组 {父表字段: {值: Summary}}，没构建或已失效时为 None
+        self.joined = None
+        # 父表被外键引用的字段上的唯一索引，以及判断它是否还是父表当前缓存的函数（见 build_joins）
+        self.parents = None
+        self.current = None
+        for row in rows:
+            self.add(row)
+
+    def add(self, row):
+        self._update(row, 1)
+
+    def remove(self, row):
+        self._update(row, -1)
+
+    def _update(self, row, sign):
+        value = number(row.get(self.column))
+        if value is None:
+            return
+        targets = [self.total]
+        for group, summaries in self.groups.items():
+            targets.append(_group_summary(summaries, row.get(group), sign))
+        if self.joined is not None and not self.current():
+            self.joined = None
+        if self.joined is not None:
+            for group, fk_column in self.joins.items():
+                parent = self._parent(row.get(fk_column))
+                if parent is not None:
+                    targets.append(_group_summary(self.joined[group], parent.get(group), sign))
+        for summary in targets:
+            if summary is None:
+                continue
+            if sign > 0:
+                summary.add(value)
+            else:
+                summary.remove(value)
+        for group, summaries in self.groups.items():
+            _drop_empty(summaries, row.get(group))
+
+    def _parent(self, fk_value):
+        rows = self.parents.lookup(fk_value)
+        return rows[0] if rows else None
+
+    def build_joins(self, parents, current):
+        """
+        由外键分组合并出经外键的分组
+        :param parents: 父表被外键引用的字段上的唯一索引（有 column 属性和 lookup 方法）
+        :param current: 无参函数，父表重新加载过（监视器已经不在）时返回 False，之后的写入使经外键的分组失效
+        """
+        self.parents = parents
+        self.current = current
+        joined = {}
+        for group, fk_column in self.joins.items():
+            summaries = joined[group] = {}
+            for fk_value, summary in self.groups[fk_column].items():
+                parent = self._parent(fk_value)
+                if parent is not None:
+                    _group_summary(summaries, parent.get(group), 1).merge(summary)
+        self.joined = joined
+
+    def move(self, parent, sign):
+        """父表增加（sign=1）或去掉（sign=-1）一条记录时，把引用它的那组计入或移出对应分组"""
+        if self.joined is None:
+            return
+        for group, fk_column in self.joins.items():
+            summary = self.groups[fk_column].get(parent.get(self.parents.column))
+            if summary is None:
+                continue
+            summaries = self.joined[group]
+            _group_summary(summaries, parent.get(group), 1).merge(summary, sign)
+            _drop_empty(summaries, parent.get(group))
+
+    def summary(self, group=None, value=None):
+        """整表（group 为 None）或一组的 Summary，没有数据时返回 None；经外键的分组需先 build_joins"""
+        if group is None:
+            return self.total
+        if group in self.joins:
+            return self.joined[group].get(value)
+        return self.groups[group].get(value)
+
+    def to_json(self):
+        return {
+            'total': self.total.to_json(),
+            'groups': {group: [[key, summary.to_json()] for key, summary in summaries.items()]
+                       for group, summaries in self.groups.items()},
+        }
+
+    @classmethod
+    def from_json(cls, config, data):
+        index = cls(config)
+        index.total = Summary.from_json(data['total'])
+        for group in index.groups:
+            index.groups[group] = {key: Summary.from_json(summary)
+                                   for key, summary in data['groups'].get(group, [])}
+        return index
+
+
+def _group_summary(summaries, key, sign):
+    """取一组的 Summary；增加时没有就新建，减少时没有返回 None"""
+    summary = summaries.get(key)
+    if summary is None and sign > 0:
+        summary = summaries[key] = Summary()
+    return summary
+
+
+def _drop_empty(summaries, key):
+    summary = summaries.get(key)
+    if summary is not None and not summary.count:
+        del summaries[key]
@@ -0,0 +1,341 @@
+"""成绩分析 - 全校成绩的分布统计
+
+对整个年级 / 学校计算：人次、平均分、标准差、最高最低分、中位数、四分位数和百分位数、
+及格率、优秀率、分数段分布，按科目、按班级分组，以及 科目 × 班级 的交叉表。
+
+分数的取值很少（0~100 分，最多两位小数），所以不逐组排序，而是先把每个分数编成
+“第几个不同取值”，用一次计数（np.bincount）得到每个 科目×班级 格子的分数分布矩阵
+（格子数 × 不同取值数）。科目、班级和全校的分布都是这个矩阵按轴求和，
+所有统计量在分布矩阵上做向量运算：累计和求百分位，矩阵乘法求总分和平方和。
+整个过程对行数是线性的，和分组多少无关。
+
+数据每个版本（成绩表或学生表有修改时变化）只取一次：打开了 COLUMNAR_GRADES 时
+直接用列式存储的数组，否则遍历成绩记录。结果按版本缓存，SQL 后端没有版本号，每次重算。
+装了 NumPy 时做向量运算，否则用纯 Python 计算同样的结果。
+"""
+import math
+import threading
+from array import array
+from collections import Counter
+
+import columnar
+import data_storage
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+PASS_SCORE = 60
+EXCELLENT_SCORE = 90
+# 报表中的百分位数
+PERCENTILES = (10, 25, 50, 75, 90)
+# 分数段的下界，最后一段包含满分
+HISTOGRAM_EDGES = (0, 60, 70, 80, 90)
+
+SCORE_SCALE = columnar.SCORE_SCALE
+
+_cache = {'key': None, 'report': None}
+_cache_lock = threading.Lock()
+
+
+def histogram_labels():
+    """分数段名称，如 '0-59'、'90-100'"""
+    bounds = list(HISTOGRAM_EDGES[1:]) + [None]
+    return [f'{low}-{high - 1}' if high is not None else f'{low}-100'
+            for low, high in zip(HISTOGRAM_EDGES, bounds)]
+
+
+def get_report():
+    """
+    全校成绩分析报表（按数据版本缓存）
+    :return: {'overall': 统计, 'subjects': [...], 'classes': [...], 'pivot': {...},
+              'histogram_labels': [...], 'percentiles': [...]}；
+             统计为 _stats 的字典，没有成绩的格子为 None
+    """
+    # 先取版本再取数据：期间有写入时缓存键偏旧，下次会重算，不会把旧数据记在新版本下
+    key = data_storage.get_data_version('grades', 'students')
+    with _cache_lock:
+        if key is not None and _cache['key'] == key:
+            return _cache['report']
+    report = _build_report(_load_cells())
+    if key is not None:
+        with _cache_lock:
+            _cache.update(key=key, report=report)
+    return report
+
+
+# ==================== 取数 ====================
+
+class _Cells:
+    """
+    每个成绩的 (科目编号, 班级编号, 分数编号)
+    班级编号 len(classes) 表示学号不在学生表中的成绩：计入科目和全校，不计入班级
+    """
+
+    def __init__(self, subjects, classes, subject_codes, class_codes, scores):
+        self.subjects = subjects
+        self.classes = classes
+        self.subject_codes = subject_codes
+        self.class_codes = class_codes
+        # 分数按 SCORE_SCALE 定点表示的整数
+        self.scores = scores
+
+
+def _student_classes():
+    """学号 -> 班级"""
+    return {row['student_id']: row.get('class_name')
+            for row in data_storage.scan('students', columns=('student_id', 'class_name'))}
+
+
+def _load_cells():
+    student_classes = _student_classes()
+    classes = sorted({c for c in student_classes.values() if c is not None})
+    class_lookup = {name: code for code, name in enumerate(classes)}
+    unknown = len(classes)
+
+    columns = data_storage.get_grade_columns()
+    if columns is not None and np is not None and len(columns):
+        # 列式存储：科目直接用字典编码，学号编码经一张小表换成班级编号
+        dictionaries = columns.dictionaries
+        student_class = np.array([class_lookup.get(student_classes.get(s), unknown)
+                                  for s in dictionaries['student_id']], dtype=np.int64)
+        codes = columns.columns
+        return _Cells(
+            list(dictionaries['subject']), classes,
+            np.asarray(codes['subject']).astype(np.int64),
+            student_class[np.asarray(codes['student_id'])],
+            np.asarray(codes['score']).astype(np.int64))
+
+    subjects = []
+    subject_lookup = {}
+    subject_codes = array('q')
+    class_codes = array('q')
+    scores = array('q')
+    for row in data_storage.scan('grades'):
+        score = row.get('score')
+        if not isinstance(score, (int, float)) or isinstance(score, bool):
+            continue
+        subject = row.get('subject')
+        code = subject_lookup.get(subject)
+        if code is None:
+            code = subject_lookup[subject] = len(subjects)
+            subjects.append(subject)
+        subject_codes.append(code)
+        class_codes.append(class_lookup.get(student_classes.get(row.get('student_id')), unknown))
+        scores.append(int(round(score * SCORE_SCALE)))
+    if np is not None:
+        subject_codes, class_codes, scores = (np.frombuffer(a, dtype=np.int64) if len(a) else
+                                              np.zeros(0, dtype=np.int64)
+                                              for a in (subject_codes, class_codes, scores))
+    return _Cells(subjects, classes, subject_codes, class_codes, scores)
+
+
+# ==================== 报表 ====================
+
+def _build_report(cells):
+    """由每个成绩的编号算出报表：先得到 科目×班级 的分数分布，再按轴合并"""
+    n_subjects, n_classes = len(cells.subjects), len(cells.classes)
+    if np is not None:
+        values, matrix = _distribution_numpy(cells, n_subjects, n_classes + 1)
+        describe = _describe_numpy
+        cube = matrix.reshape(n_subjects, n_classes + 1, len(values))
+        by_subject = cube.sum(axis=1)
+        by_class = cube[:, :n_classes].sum(axis=0)
+        overall = by_subject.sum(axis=0, keepdims=True)
+        pivot = cube[:, :n_classes].reshape(n_subjects * n_classes, len(values))
+    else:
+        values, matrix = _distribution_python(cells, n_subjects, n_classes + 1)
+        describe = _describe_python
+        width = n_classes + 1
+        by_subject = [_sum_rows(matrix[s * width:(s + 1) * width]) for s in range(n_subjects)]
+        by_class = [_sum_rows(matrix[c::width]) for c in range(n_classes)]
+        overall = [_sum_rows(by_subject)] if by_subject else [[0] * len(values)]
+        pivot = [matrix[s * width + c] for s in range(n_subjects) for c in range(n_classes)]
+
+    subject_stats = describe(values, by_subject)
+    class_stats = describe(values, by_class)
+    cell_stats = describe(values, pivot)
+    pivot_rows = [cell_stats[s * n_classes:(s + 1) * n_classes] for s in range(n_subjects)]
+    order = sorted(range(n_subjects), key=lambda s: str(cells.subjects[s]))
+    return {
+        'overall': describe(values, overall)[0],
+        'subjects': [dict(subject_stats[s], name=cells.subjects[s])
+                     for s in order if subject_stats[s] is not None],
+        'classes': [dict(stats, name=name) for name, stats in zip(cells.classes, class_stats)
+                    if stats is not None],
+        'pivot': {
+            'subjects': [cells.subjects[s] for s in order],
+            'classes': cells.classes,
+            'average': [[cell and cell['average'] for cell in pivot_rows[s]] for s in order],
+            'pass_rate': [[cell and cell['pass_rate'] for cell in pivot_rows[s]] for s in order],
+            'count': [[cell['count'] if cell else 0 for cell in pivot_rows[s]] for s in order],
+        },
+        'histogram_labels': histogram_labels(),
+        'percentiles': list(PERCENTILES),
+    }
+
+
+def _distribution_numpy(cells, n_subjects, width):
+    """
+    :return: (不同的分数值（升序，定点整数）, 矩阵[格子, 分数编号] = 人次)
+    格子编号 = 科目编号 * width + 班级编号
+    """
+    scores = cells.scores
+    if not len(scores):
+        return np.zeros(0, dtype=np.int64), np.zeros((n_subjects * width, 0), dtype=np.int64)
+    low = int(scores.min())
+    offsets = scores - low
+    # 分数范围很小：按偏移计数就能得到有哪些取值，不需要排序
+    present = np.bincount(offsets) > 0
+    values = np.flatnonzero(present) + low
+    codes = (np.cumsum(present) - 1)[offsets]
+    cell = cells.subject_codes * width + cells.class_codes
+    matrix = np.bincount(cell * len(values) + codes, minlength=n_subjects * width * len(values))
+    return values, matrix.reshape(n_subjects * width, len(values))
+
+
+def _describe_numpy(values, matrix):
+    """
+    分布矩阵每一行（一个分组）的统计
+    :param values: 升序的不同分数（定点整数）
+    :param matrix: [分组, 分数编号] = 人次
+    :return: 每行一个 _stats 字典，没有成绩的行为 None
+    """
+    matrix = np.asarray(matrix, dtype=np.int64)
+    if not len(values):
+        return [None] * len(matrix)
+    values = np.asarray(values, dtype=np.int64)
+    scores = values / SCORE_SCALE
+    counts = matrix.sum(axis=1)
+    safe = np.maximum(counts, 1)
+    # 总分和平方和在定点整数上求和是精确的，之后的运算和纯 Python 版本一一对应，结果相同
+    totals = matrix @ values
+    means = totals / safe / SCORE_SCALE
+    variances = np.maximum(matrix @ (values * values) / safe / SCORE_SCALE ** 2 - means * means, 0)
+    cumulative = np.cumsum(matrix, axis=1)
+    present = matrix > 0
+    lowest = scores[present.argmax(axis=1)]
+    highest = scores[len(values) - 1 - present[:, ::-1].argmax(axis=1)]
+
+    def percentile(p):
+        # 与 np.percentile 的默认（线性插值）一致：第 (n-1)*p/100 个值，见 _interpolate
+        below, fraction = np.divmod((counts - 1) * p, 100)
+        lo = (cumulative <= below[:, None]).sum(axis=1)
+        hi = (cumulative <= (below + (fraction > 0))[:, None]).sum(axis=1)
+        lo, hi = np.minimum(lo, len(values) - 1), np.minimum(hi, len(values) - 1)
+        return _interpolate(values[lo], values[hi], fraction)
+
+    percentiles = {p: percentile(p) for p in PERCENTILES}
+    passed = matrix[:, values >= PASS_SCORE * SCORE_SCALE].sum(axis=1)
+    excellent = matrix[:, values >= EXCELLENT_SCORE * SCORE_SCALE].sum(axis=1)
+    # 分数段人次 = 段上界处的累计人次之差
+    bounds = np.searchsorted(values, np.array(HISTOGRAM_EDGES[1:]) * SCORE_SCALE)
+    edges = np.concatenate([np.zeros((len(matrix), 1), dtype=np.int64), cumulative], axis=1)
+    marks = np.concatenate([np.zeros((len(matrix), 1), dtype=np.int64), edges[:, bounds],
+                            counts[:, None]], axis=1)
+    histograms = np.diff(marks, axis=1)
+
+    columns = [counts.tolist(), means.tolist(), np.sqrt(variances).tolist(),
+               lowest.tolist(), highest.tolist(),
+               [percentiles[p].tolist() for p in PERCENTILES],
+               passed.tolist(), excellent.tolist(), histograms.tolist()]
+    result = []
+    for i, count in enumerate(columns[0]):
+        if not count:
+            result.append(None)
+            continue
+        result.append(_stats(count, columns[1][i], columns[2][i], columns[3][i], columns[4][i],
+                             [column[i] for column in columns[5]],
+                             columns[6][i], columns[7][i], columns[8][i]))
+    return result
+
+
+def _distribution_python(cells, n_subjects, width):
+    """_distribution_numpy 的纯 Python 版本，矩阵是列表的列表"""
+    cell_counts = Counter(zip(cells.subject_codes, cells.class_codes, cells.scores))
+    values = sorted({score for _, _, score in cell_counts})
+    position = {value: i for i, value in enumerate(values)}
+    matrix = [[0] * len(values) for _ in range(n_subjects * width)]
+    for (subject, class_code, score), n in cell_counts.items():
+        matrix[subject * width + class_code][position[score]] += n
+    return values, matrix
+
+
+def _sum_rows(rows):
+    return [sum(column) for column in zip(*rows)] if rows else []
+
+
+def _describe_python(values, matrix):
+    """_describe_numpy 的纯 Python 版本"""
+    scores = [value / SCORE_SCALE for value in values]
+    result = []
+    for row in matrix:
+        count = sum(row)
+        if not count:
+            result.append(None)
+            continue
+        total = sum(n * v for n, v in zip(row, values))
+        mean = total / count / SCORE_SCALE
+        variance = max(sum(n * v * v for n, v in zip(row, values)) / count / SCORE_SCALE ** 2 - mean * mean, 0)
+        present = [s for n, s in zip(row, scores) if n]
+        cumulative = []
+        running = 0
+        for n in row:
+            running += n
+            cumulative.append(running)
+
+        def nth(k):
+            # 第 k 个（从 0 起）分数（定点整数）
+            for i, c in enumerate(cumulative):
+                if c > k:
+                    return values[i]
+            return values[-1]
+
+        percentiles = []
+        for p in PERCENTILES:
+            below, fraction = divmod((count - 1) * p, 100)
+            low = nth(below)
+            percentiles.append(_interpolate(low, nth(below + 1) if fraction else low, fraction))
+        passed = sum(n for n, v in zip(row, values) if v >= PASS_SCORE * SCORE_SCALE)
+        excellent = sum(n for n, v in zip(row, values) if v >= EXCELLENT_SCORE * SCORE_SCALE)
+        histogram = [0] * len(HISTOGRAM_EDGES)
+        for n, v in zip(row, values):
+            histogram[sum(1 for edge in HISTOGRAM_EDGES[1:] if v >= edge * SCORE_SCALE)] += n
+        result.append(_stats(count, mean, math.sqrt(variance), present[0], present[-1],
+                             percentiles, passed, excellent, histogram))
+    return result
+
+
+def _interpolate(low, high, fraction):
+    """
+    百分位数：两个相邻分数（定点整数）之间按 fraction/100 线性插值，四舍五入到两位小数
+    全程用整数计算，只在最后舍入一次，NumPy 和纯 Python 两种算法的结果完全相同；参数可以是 NumPy 数组
+    """
+    # 精确值以 1/(SCORE_SCALE*100) 分为单位，换算成 0.01 分时四舍五入
+    exact = low * 100 + (high - low) * fraction
+    return (2 * exact + SCORE_SCALE) // (2 * SCORE_SCALE) / 100
+
+
+def _stats(count, mean, std, lowest, highest, percentiles, passed, excellent, histogram):
+    """一个分组的统计字典；比率为百分数，百分位数已由 _interpolate 舍入"""
+    named = dict(zip(PERCENTILES, percentiles))
+    return {
+        'count': count,
+        'average': round(mean, 2),
+        'std': round(std, 2),
+        'min': _plain(lowest),
+        'max': _plain(highest),
+        'median': named.get(50, percentiles[len(percentiles) // 2]),
+        'q1': named.get(25),
+        'q3': named.get(75),
+        'percentiles': {f'p{p}': v for p, v in named.items()},
+        'pass_rate': round(passed * 100 / count, 1),
+        'excellent_rate': round(excellent * 100 / count, 1),
+        'histogram': list(histogram),
+    }
+
+
+def _plain(score):
+    """整数分还原成 int，和存储里原来的写法一致"""
+    return int(score) if float(score).is_integer() else round(score, 2)
@@ -1,10 +1,11 @@
 """学生成绩管理系统 - Flask + Jinja2 版"""
-from flask import Flask, render_template, request, redirect, url_for, flash, session
+from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify
 from functools import wraps
 import student_service
 import grade_service
 import user_service
 import school_service
+import pagination
 from data_storage import ensure_data_files
 import csv
 import io
@@ -13,6 +14,10 @@ from flask import Response
 app = Flask(__name__)
 app.secret_key = 'your-secret-key-here'
 
+# 成绩列表的筛选参数（同 grade_service.query_grades 的参数名）
+GRADE_FILTERS = ('student_id', 'subject', 'exam_type', 'date_from', 'date_to',
+                 'min_score', 'max_score', 'class_name')
+
 # 确保数据文件存在
 ensure_data_files()
 
@@ -60,66 +65,54 @@ def logout():
 @login_required
 def dashboard():
     """系统仪表盘"""
-    # 聚合数据
-    students = student_service.get_all_students()
-    classes = school_service.get_all_classes()
-    courses = school_service.get_all_courses()
-    grades = grade_service.get_all_grades()
-    
-    stats = {
-        'student_count': len(students),
-        'class_count': len(classes),
-        'course_count': len(courses),
-        'failed_count': len([g for g in grades if g['score'] < 60])
-    }
-    
-    # 获取最近添加的5个学生（假设列表是按时间顺序或者我们直接取最后5个倒序）
-    recent_students = students[-5:][::-1]
+    # 计数和最近添加的学生都由存储层随写入维护，不读取整张表
+    stats = school_service.get_dashboard_summary(recent=5)
+    recent_students = stats.pop('recent_students')
     
     return render_template('dashboard.html', stats=stats, recent_students=recent_students, active_page='dashboard')
 
 @app.route('/students')
 @login_required
 def index():
-    """学生列表页面（带搜索）"""
+    """学生列表页面（带搜索，分页）"""
     keyword = request.args.get('keyword')
-    if keyword:
-        students = student_service.search_students(keyword)
-    else:
-        students = student_service.get_all_students()
+    sort = request.args.get('sort') or 'student_id'
+    cursor = request.args.get('cursor')
+    page = student_service.search_students(
+        keyword, page_size=request.args.get('page_size', pagination.DEFAULT_PAGE_SIZE),
+        cursor=cursor, sort=sort)
+    
+    # 只查本页学生的 GPA
+    gpas = grade_service.get_gpas(s['student_id'] for s in page['items'])
+    students = [dict(s, gpa=gpas[s['student_id']]['gpa'] if s['student_id'] in gpas else None)
+                for s in page['items']]
         
-    return render_template('student_list.html', students=students, active_page='students', keyword=keyword)
+    return render_template('student_list.html', students=students, next_cursor=page['next_cursor'],
+                           cursor=cursor, sort=sort, active_page='students', keyword=keyword)
 
 @app.route('/students/export')
 @login_required
 def export_students_action():
-    """导出学生数据为CSV"""
-    students = student_service.get_all_students()
+    """导出学生数据为CSV（边读边输出，不在内存中拼出整个文件）"""
+    columns = ['student_id', 'name', 'class_name', 'gender', 'age', 'phone', 'email', 'address']
     
-    # 使用 StringIO 在内存中生成 CSV
-    si = io.StringIO()
-    cw = csv.writer(si)
-    # 写入表头
-    cw.writerow(['学号', '姓名', '班级', '性别', '年龄', '电话', '邮箱', '地址'])
-    # 写入数据
-    for s in students:
-        cw.writerow([
-            s.get('student_id'),
-            s.get('name'),
-            s.get('class_name'),
-            s.get('gender'),
-            s.get('age'),
-            s.get('phone'),
-            s.get('email'),
-            s.get('address')
-        ])
-        
-    output = si.getvalue()
-    # 解决中文乱码，添加 BOM
-    output = '\ufeff' + output
+    def generate():
+        si = io.StringIO()
+        cw = csv.writer(si)
+        # 解决中文乱码，添加 BOM；写入表头
+        si.write('\ufeff')
+        cw.writerow(['学号', '姓名', '班级', '性别', '年龄', '电话', '邮箱', '地址'])
+        # 写入数据，每攒够一批输出一次
+        for i, s in enumerate(student_service.iter_students(columns), 1):
+            cw.writerow([s[c] for c in columns])
+            if i % 1000 == 0:
+                yield si.getvalue()
+                si.seek(0)
+                si.truncate(0)
+        yield si.getvalue()
     
     return Response(
-        output,
+        generate(),
         mimetype="text/csv",
         headers={"Content-disposition": "attachment; filename=students_export.csv"}
     )
@@ -232,6 +225,14 @@ def add_course_action():
         flash(result['message'], 'error')
     return redirect(url_for('course_list_page'))
 
+@app.route('/courses/credit/<int:course_id>', methods=['POST'])
+@login_required
+def update_course_credit_action(course_id):
+    """修改课程学分"""
+    result = school_service.update_course_credit(course_id, request.form.get('credit'))
+    flash(result['message'], 'success' if result['success'] else 'error')
+    return redirect(url_for('course_list_page'))
+
 @app.route('/courses/delete/<int:course_id>', methods=['POST'])
 @login_required
 def delete_course_action(course_id):
@@ -332,21 +333,34 @@ def delete_student_action(student_id):
 @app.route('/grades')
 @login_required
 def grades_page():
-    """成绩列表页面"""
-    student_id = request.args.get('student_id')
-    if student_id:
-        grades = grade_service.get_grades_by_student(student_id)
-    else:
-        grades = grade_service.get_all_grades()
+    """成绩列表页面（可按学号、科目、考试类型、日期范围、分数范围、班级筛选，分页）"""
+    sort = request.args.get('sort') or 'id'
+    cursor = request.args.get('cursor')
+    filters = {name: request.args.get(name, '').strip() for name in GRADE_FILTERS}
+    filters = {name: value for name, value in filters.items() if value}
+    params = dict(filters)
+    for name in ('min_score', 'max_score'):
+        if name in params:
+            try:
+                params[name] = float(params[name])
+            except ValueError:
+                flash('分数格式错误', 'error')
+                del params[name], filters[name]
+    # 学生姓名由存储层按本页的学号关联取出
+    page = grade_service.query_grades(
+        page_size=request.args.get('page_size', pagination.DEFAULT_PAGE_SIZE),
+        cursor=cursor, sort=sort, columns=('student_name',), **params)
+    grades, next_cursor = page['items'], page['next_cursor']
     
-    # 补充学生姓名信息
-    students = student_service.get_all_students()
-    student_map = {s['student_id']: s['name'] for s in students}
+    ranks = grade_service.get_grade_ranks(grades)
     
     for grade in grades:
-        grade['student_name'] = student_map.get(grade['student_id'], '未知')
+        grade['student_name'] = grade['student_name'] or '未知'
+        grade['ranks'] = ranks[grade['id']]
         
-    return render_template('grade_list.html', grades=grades, active_page='grades')
+    return render_template('grade_list.html', grades=grades, next_cursor=next_cursor, cursor=cursor,
+                           sort=sort, filters=filters, courses=school_service.get_all_courses(),
+                           classes=school_service.get_all_classes(), active_page='grades')
 
 
 @app.route('/grades/add', methods=['GET', 'POST'])
@@ -383,20 +397,15 @@ def add_grade_page():
 @login_required
 def edit_grade_page(grade_id):
     """编辑成绩页面 & 处理"""
-    # 查找成绩（由于现在不是 ORM，直接调 Service）
-    all_grades = grade_service.get_all_grades()
-    grade = next((g for g in all_grades if g['id'] == grade_id), None)
+    grade = grade_service.get_grade_by_id(grade_id, columns=('student_name',))
     
     if not grade:
         flash('成绩记录不存在', 'error')
         return redirect(url_for('grades_page'))
     
-    students = student_service.get_all_students()
+    # 编辑时学生不可更改，表单不需要学生列表
     courses = school_service.get_all_courses()
-    
-    # 补充当前成绩的学生姓名
-    student_name = next((s['name'] for s in students if s['student_id'] == grade['student_id']), '未知')
-    grade['student_name'] = student_name
+    grade['student_name'] = grade['student_name'] or '未知'
 
     if request.method == 'POST':
         grade_data = {
@@ -417,7 +426,7 @@ def edit_grade_page(grade_id):
         except ValueError:
             flash('分数格式错误', 'error')
 
-    return render_template('grade_form.html', grade=grade, students=students, courses=courses, active_page='grades')
+    return render_template('grade_form.html', grade=grade, students=[], courses=courses, active_page='grades')
 
 
 @app.route('/grades/delete/<int:grade_id>', methods=['POST'])
@@ -443,13 +452,42 @@ def statistics_page():
     
     students = student_service.get_all_students()
     
+    report = grade_service.get_analytics()['data']
+    
     return render_template('statistics.html', 
                          stats=result['data'], 
+                         report=report,
                          students=students, 
                          current_student_id=student_id,
                          active_page='statistics')
 
 
+@app.route('/api/rankings')
+@login_required
+def rankings_api():
+    """某科目某场考试的排行（JSON）：?subject=&exam_type=&exam_date=&class_name=&limit=&lowest=1，不传日期为最近一场"""
+    subject = request.args.get('subject')
+    exam_type = request.args.get('exam_type')
+    if not subject or not exam_type:
+        return jsonify({'success': False, 'message': '需要科目和考试类型'}), 400
+    limit = pagination.clamp_page_size(request.args.get('limit', 10))
+    rows = grade_service.get_rankings(subject, exam_type, request.args.get('exam_date'),
+                                      request.args.get('class_name'), limit,
+                                      request.args.get('lowest') == '1')
+    return jsonify({'success': True, 'data': rows})
+
+
+@app.route('/api/statistics')
+@login_required
+def statistics_api():
+    """统计数据（JSON）：筛选后的概况，以及全校的分析报表"""
+    result = grade_service.get_statistics(request.args.get('student_id'),
+                                          request.args.get('subject'),
+                                          request.args.get('class_name'))
+    data = dict(result['data'], analytics=grade_service.get_analytics()['data'])
+    return jsonify({'success': True, 'data': data})
+
+
 if __name__ == '__main__':
     print("学生成绩管理系统 (Flask) 启动中...")
     print("访问地址: http://localhost:5002")
@@ -0,0 +1,255 @@
+"""成绩表的列式存储
+
+每个字段一列，存在连续的数组里，而不是每行一个字典：
+- id 为 64 位整数列；
+- score 按定点数存储（乘以 SCORE_SCALE 后取整）为 32 位整数列；
+- student_id / subject / exam_type / exam_date 做字典编码：列里只存小整数编号，
+  编号到原值的对照表每列一份，编号宽度按取值个数选 1 / 2 / 4 字节。
+
+文件格式（grades.col）可以直接 mmap：
+    8 字节魔数 | 4 字节头部长度 | 头部 JSON | 按 8 字节对齐的各列数据
+头部记录行数、各列的类型码 / 偏移 / 长度、字典，以及生成时快照文件的签名。
+多个 worker 映射同一个文件时共享只读的物理页，不需要各自解析 JSON。
+装了 NumPy 时统计直接在缓冲区上做向量运算，否则逐个遍历数组。
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+MAGIC = b'GRDCOL01'
+SCORE_SCALE = 100
+
+# 字典编码的列
+CODED_COLUMNS = ('student_id', 'subject', 'exam_type', 'exam_date')
+# 能用列式存储表示的字段
+FIELDS = ('id',) + CODED_COLUMNS + ('score',)
+
+_HEADER = struct.Struct('<8sI')
+
+
+def _code_type(size):
+    """按字典大小选最窄的无符号整数类型"""
+    if size <= 0xFF:
+        return 'B'
+    if size <= 0xFFFF:
+        return 'H'
+    return 'I'
+
+
+def _typecode(column):
+    return column.typecode if isinstance(column, array) else column.format
+
+
+def _encode_score(score):
+    return int(round(score * SCORE_SCALE))
+
+
+def _decode_score(value):
+    # 整数分仍还原成 int，和 JSON 里原来的写法一致
+    if value % SCORE_SCALE == 0:
+        return value // SCORE_SCALE
+    return value / SCORE_SCALE
+
+
+class GradeColumns:
+    """成绩表的列式表示；列可以是 array.array，也可以是 mmap 上的只读 memoryview"""
+
+    def __init__(self, columns, dictionaries, size, source=None):
+        self.columns = columns
+        self.dictionaries = dictionaries
+        self.size = size
+        self.source = source
+        self._lookup = {name: {value: code for code, value in enumerate(values)}
+                        for name, values in dictionaries.items()}
+
+    def __len__(self):
+        return self.size
+
+    @classmethod
+    def from_rows(cls, rows):
+        """
+        由行记录构造
+        :return: GradeColumns；有列式存储表示不了的记录（多余或缺少的字段、非数值分数、
+                 定点数表示不精确的分数等）时返回 None，调用方继续用行记录
+        """
+        dictionaries = {name: [] for name in CODED_COLUMNS}
+        lookups = {name: {} for name in CODED_COLUMNS}
+        codes = {name: [] for name in CODED_COLUMNS}
+        ids = array('q')
+        scores = array('i')
+        allowed = set(FIELDS)
+        for row in rows:
+            # 缺少的字段还原时会变成 None，同样表示不了
+            if len(row) != len(allowed) or not allowed.issuperset(row):
+                return None
+            score = row['score']
+            row_id = row['id']
+            if (not isinstance(score, (int, float)) or isinstance(score, bool)
+                    or not isinstance(row_id, int)):
+                return None
+            encoded = _encode_score(score)
+            if encoded / SCORE_SCALE != score:
+                # 小数位多于 SCORE_SCALE 能表示的（如 59.555），还原不回原值
+                return None
+            ids.append(row_id)
+            scores.append(encoded)
+            for name in CODED_COLUMNS:
+                value = row.get(name)
+                lookup = lookups[name]
+                code = lookup.get(value)
+                if code is None:
+                    code = lookup[value] = len(dictionaries[name])
+                    dictionaries[name].append(value)
+                codes[name].append(code)
+        columns = {'id': ids, 'score': scores}
+        for name in CODED_COLUMNS:
+            columns[name] = array(_code_type(len(dictionaries[name])), codes[name])
+        return cls(columns, dictionaries, len(ids))
+
+    # ==================== 文件读写 ====================
+
+    def save(self, path, source=None):
+        """写入列式文件（临时文件 + 原子替换）；source 为对应快照文件的签名"""
+        header = {
+            'rows': self.size,
+            'byteorder': sys.byteorder,
+            'scale': SCORE_SCALE,
+            'source': list(source) if source else None,
+            'dictionaries': self.dictionaries,
+            'columns': {},
+        }
+        offset = 0
+        for name in FIELDS:
+            column = self.columns[name]
+            nbytes = len(column) * column.itemsize
+            header['columns'][name] = [_typecode(column), offset, nbytes]
+            offset += nbytes + (-nbytes % 8)
+        header_bytes = json.dumps(header, ensure_ascii=False).encode('utf-8')
+        data_start = _HEADER.size + len(header_bytes)
+        padding = -data_start % 8
+
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(_HEADER.pack(MAGIC, len(header_bytes)))
+                f.write(header_bytes)
+                f.write(b'\0' * padding)
+                for name in FIELDS:
+                    data = bytes(self.columns[name])
+                    f.write(data)
+                    f.write(b'\0' * (-len(data) % 8))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+
+    @classmethod
+    def load(cls, path, source=None):
+        """
+        以只读 mmap 打开列式文件，列直接是映射区上的 memoryview（不复制）
+        :param source: 期望的快照签名，不一致（文件已过期）时返回 None
+        :return: GradeColumns 或 None（文件不存在、格式不对或已过期）
+        """
+        try:
+            with open(path, 'rb') as f:
+                if os.fstat(f.fileno()).st_size < _HEADER.size:
+                    return None
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except FileNotFoundError:
+            return None
+        magic, header_len = _HEADER.unpack_from(mapped, 0)
+        if magic != MAGIC:
+            return None
+        header = json.loads(mapped[_HEADER.size:_HEADER.size + header_len].decode('utf-8'))
+        if (header['byteorder'] != sys.byteorder or header['scale'] != SCORE_SCALE
+                or (source is not None and header['source'] != list(source))):
+            return None
+        data_start = _HEADER.size + header_len
+        data_start += -data_start % 8
+        view = memoryview(mapped)
+        columns = {}
+        for name, (typecode, offset, nbytes) in header['columns'].items():
+            start = data_start + offset
+            columns[name] = view[start:start + nbytes].cast(typecode)
+        return cls(columns, header['dictionaries'], header['rows'], source=header['source'])
+
+    # ==================== 读取 ====================
+
+    def positions(self, filters):
+        """
+        满足所有等值条件的行号
+        :param filters: {字典编码列: 值}
+        :return: 行号列表；没有条件时返回 None 表示全部行
+        """
+        if not filters:
+            return None
+        wanted = []
+        for name, value in filters.items():
+            code = self._lookup[name].get(value)
+            if code is None:
+                return []
+            wanted.append((self.columns[name], code))
+        if np is not None:
+            mask = np.ones(self.size, dtype=bool)
+            for column, code in wanted:
+                mask &= np.frombuffer(column, dtype=_typecode(column)) == code
+            return np.flatnonzero(mask).tolist()
+        column, code = wanted[0]
+        result = [i for i, c in enumerate(column) if c == code]
+        for column, code in wanted[1:]:
+            result = [i for i in result if column[i] == code]
+        return result
+
+    def score_stats(self, positions=None):
+        """
+        分数的 (个数, 总和, 最小, 最大)，按原始分数返回
+        :param positions: 行号列表，None 表示全部行
+        """
+        scores = self.columns['score']
+        if positions is not None and not positions:
+            return 0, 0, None, None
+        if np is not None:
+            values = np.frombuffer(scores, dtype=_typecode(scores))
+            if positions is not None:
+                values = values[positions]
+            if not len(values):
+                return 0, 0, None, None
+            count, total = len(values), int(values.sum(dtype=np.int64))
+            low, high = int(values.min()), int(values.max())
+        else:
+            values = scores if positions is None else [scores[i] for i in positions]
+            count = len(values)
+            if not count:
+                return 0, 0, None, None
+            total, low, high = sum(values), min(values), max(values)
+        return count, _decode_score(total), _decode_score(low), _decode_score(high)
+
+    def rows(self, positions=None):
+        """逐行生成字典（每次都是新字典）"""
+        columns = [self.columns[name] for name in FIELDS]
+        if positions is not None:
+            columns = [[column[i] for i in positions] for column in columns]
+        students, subjects, exam_types, exam_dates = (self.dictionaries[name] for name in CODED_COLUMNS)
+        for row_id, student, subject, exam_type, exam_date, score in zip(*columns):
+            yield {
+                'id': row_id,
+                'student_id': students[student],
+                'subject': subjects[subject],
+                'exam_type': exam_types[exam_type],
+                'exam_date': exam_dates[exam_date],
+                'score': _decode_score(score),
+            }
@@ -0,0 +1,293 @@
+"""学分绩点视图 - GPA_VIEWS 中的表的 GPA 物化视图
+
+每个学生每学期以及累计的 学分和、学分×绩点 之和、学分×分数 之和，
+GPA = Σ学分×绩点 / Σ学分，加权平均分 = Σ学分×分数 / Σ学分。
+学分经外键在课程表的名称索引上查找（每条成绩 O(1)），不把成绩和课程两两比对。
+视图挂在成绩表缓存上随写入增量更新：一条成绩的增删改只改这个学生的几个和；
+课程的学分修改时，由挂在课程表缓存上的监视器调用 move，经成绩表的科目索引找出该课程的成绩，
+撤回旧学分、计入新学分。另外按 (累计 GPA, 学号) 维护有序列表，学生列表按 GPA 排序时直接二分定位。
+首次使用时整表计算，成绩很多时可以分给进程池。
+
+这里只有数据结构和计算；加锁、挂监视器和 SQL 后端上的取数在 data_storage 中。
+"""
+import bisect
+import gc
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+
+def grade_point(score, scale):
+    """分数 -> 绩点：不低于分数线时取对应绩点，都不到为 0（scale 见 data_storage.GPA_SCALE）"""
+    for threshold, point in scale:
+        if score >= threshold:
+            return point
+    return 0.0
+
+
+class GpaRules:
+    """一张表的 GPA 计算规则，由 data_storage 中 GPA_VIEWS / GPA_EXAM_TYPES / GPA_SCALE 等配置得出"""
+    __slots__ = ('group', 'column', 'fk_column', 'credit_column', 'name_column', 'date_column',
+                 'exam_types', 'scale', 'term_of')
+
+    def __init__(self, config, name_column, date_column, exam_types, scale, term_of):
+        """
+        :param config: (学生字段, 分数字段, 课程外键字段, 学分字段)
+        :param name_column: 课程表中被外键引用的字段
+        :param date_column: 得出学期的日期字段，term_of(日期) 为学期
+        :param exam_types: 计入 GPA 的考试类型，None 为全部
+        :param scale: ((分数线, 绩点), ...)，见 grade_point
+        """
+        self.group, self.column, self.fk_column, self.credit_column = config
+        self.name_column = name_column
+        self.date_column = date_column
+        self.exam_types = exam_types
+        self.scale = scale
+        self.term_of = term_of
+
+    def credit(self, course):
+        """课程的学分，不是正数或没有课程时返回 None"""
+        credit = course.get(self.credit_column) if course is not None else None
+        if type(credit) in (int, float) and credit > 0:
+            return credit
+        return None
+
+    def credits(self, courses):
+        """课程名称 -> 学分（只含学分为正数的课程）"""
+        credits = {}
+        for course in courses:
+            credit = self.credit(course)
+            if credit is not None:
+                credits[course.get(self.name_column)] = credit
+        return credits
+
+    def item(self, row, credit):
+        """一条成绩计入 GPA 的 (学分, 绩点, 分数, 学期)，不计入时返回 None"""
+        if credit is None:
+            return None
+        if self.exam_types is not None and row.get('exam_type') not in self.exam_types:
+            return None
+        score = row.get(self.column)
+        if type(score) is not int and type(score) is not float:
+            return None
+        return credit, grade_point(score, self.scale), score, self.term_of(row.get(self.date_column))
+
+
+def gpa_sums(rows, credits, rules):
+    """
+    一批成绩的汇总（整表计算和进程池的工作进程共用）
+    :param credits: 课程名称 -> 学分（见 GpaRules.credits）
+    :return: {学号: {学期: [学分和, 学分×绩点之和, 学分×分数之和, 成绩条数]}}
+    """
+    group, fk_column = rules.group, rules.fk_column
+    sums = {}
+    for row in rows:
+        item = rules.item(row, credits.get(row.get(fk_column)))
+        if item is None:
+            continue
+        credit, point, score, term = item
+        terms = sums.get(row.get(group))
+        if terms is None:
+            terms = sums[row.get(group)] = {}
+        target = terms.get(term)
+        if target is None:
+            terms[term] = [credit, credit * point, credit * score, 1]
+        else:
+            target[0] += credit
+            target[1] += credit * point
+            target[2] += credit * score
+            target[3] += 1
+    return sums
+
+
+# 进程池中工作进程的输入：fork 时由父进程继承，不经过序列化
+_worker_input = {}
+
+
+def _worker_init(parts, credits, rules):
+    _worker_input.update(parts=parts, credits=credits, rules=rules)
+
+
+def _worker(part):
+    data = _worker_input
+    return gpa_sums(data['parts'][part], data['credits'], data['rules'])
+
+
+def _parallel_gpa_sums(rows, credits, rules, workers):
+    """
+    按学号把成绩分成 workers 份交给进程池分别汇总；每个学生只在一份里，结果直接合并，
+    且每个学生的成绩仍按原顺序累加，与在当前进程内计算的结果完全相同
+    """
+    parts = [[] for _ in range(workers)]
+    for row in rows:
+        parts[hash(row.get(rules.group)) % workers].append(row)
+    context = multiprocessing.get_context('fork')
+    # 冻结现有对象，子进程中的垃圾回收不去遍历（从而复制）继承来的整个堆
+    gc.freeze()
+    try:
+        with ProcessPoolExecutor(workers, mp_context=context, initializer=_worker_init,
+                                 initargs=(parts, credits, rules)) as pool:
+            results = list(pool.map(_worker, range(workers)))
+    finally:
+        gc.unfreeze()
+    sums = {}
+    for result in results:
+        sums.update(result)
+    return sums
+
+
+class GpaView:
+    """一张表的 GPA 物化视图"""
+    __slots__ = ('rules', 'terms', 'order', 'parents', 'children', 'current', 'stale')
+
+    def __init__(self, rules, rows, courses, workers=0):
+        """
+        整表计算；只有调用 watch 之后才随写入维护（SQL 后端上临时计算的视图不调用）
+        :param workers: 大于 1 且系统支持 fork 时用这么多个进程分段计算
+        """
+        self.rules = rules
+        credits = rules.credits(courses)
+        if workers > 1 and 'fork' in multiprocessing.get_all_start_methods():
+            self.terms = _parallel_gpa_sums(rows, credits, rules, workers)
+        else:
+            self.terms = gpa_sums(rows, credits, rules)
+        self.order = sorted(key for key in map(self._order_key, self.terms) if key is not None)
+        self.parents = None
+        self.children = None
+        self.current = None
+        # 课程表重新加载后监视器不在了，视图作废，下次使用时重算
+        self.stale = False
+
+    def watch(self, parents, children, current):
+        """
+        开始随写入维护
+        :param parents: 课程表被外键引用的字段（名称）上的唯一索引
+        :param children: 成绩表外键字段（科目）上的哈希索引，课程学分变化时找出该课程的成绩
+        :param current: 无参函数，课程表重新加载过（监视器已经不在）时返回 False，之后的写入使视图作废
+        """
+        self.parents = parents
+        self.children = children
+        self.current = current
+
+    def _order_key(self, student):
+        total = self.total(student)
+        if total is None:
+            return None
+        return total[1] / total[0], student
+
+    def total(self, student):
+        """学生的累计 [学分和, 学分×绩点之和, 学分×分数之和, 成绩条数]，没有计入 GPA 的成绩时返回 None"""
+        terms = self.terms.get(student)
+        if not terms:
+            return None
+        return [sum(values) for values in zip(*terms.values())]
+
+    def add(self, row):
+        self._update(row, 1)
+
+    def remove(self, row):
+        self._update(row, -1)
+
+    def _update(self, row, sign):
+        if self.stale:
+            return
+        if not self.current():
+            self.stale = True
+            return
+        courses = self.parents.lookup(row.get(self.rules.fk_column))
+        credit = self.rules.credit(courses[0] if courses else None)
+        student = row.get(self.rules.group)
+        old = self._order_key(student)
+        if self._apply(row, sign, credit):
+            self._reorder({student: old})
+
+    def _apply(self, row, sign, credit):
+        """把一条成绩计入（sign=1）或撤回（sign=-1）学期的和，不调整有序列表；不计入 GPA 时返回 False"""
+        item = self.rules.item(row, credit)
+        if item is None:
+            return False
+        credit, point, score, term = item
+        student = row.get(self.rules.group)
+        terms = self.terms.get(student)
+        if terms is None:
+            terms = self.terms[student] = {}
+        target = terms.get(term)
+        if target is None:
+            target = terms[term] = [0, 0, 0, 0]
+        target[0] += sign * credit
+        target[1] += sign * credit * point
+        target[2] += sign * credit * score
+        target[3] += sign
+        if target[3] <= 0:
+            del terms[term]
+            if not terms:
+                del self.terms[student]
+        return True
+
+    def _reorder(self, old_keys):
+        """按学生修改前的排序键 {学号: 旧键} 调整有序列表；学生多时整体重排比逐个二分插入快"""
+        changes = [(old, self._order_key(student)) for student, old in old_keys.items()]
+        changes = [(old, new) for old, new in changes if old != new]
+        if len(changes) * 16 < len(self.order):
+            for old, new in changes:
+                if old is not None:
+                    del self.order[bisect.bisect_left(self.order, old)]
+                if new is not None:
+                    bisect.insort(self.order, new)
+            return
+        removed = {old for old, _ in changes if old is not None}
+        self.order = [key for key in self.order if key not in removed]
+        self.order.extend(new for _, new in changes if new is not None)
+        self.order.sort()
+
+    def move(self, course, sign):
+        """课程增加（sign=1）或去掉（sign=-1，修改学分时先去掉旧的）时，计入或撤回该课程的全部成绩"""
+        if self.stale:
+            return
+        credit = self.rules.credit(course)
+        if credit is None:
+            return
+        group = self.rules.group
+        old_keys = {}
+        for row in self.children.lookup(course.get(self.rules.name_column)):
+            student = row.get(group)
+            if student not in old_keys:
+                old_keys[student] = self._order_key(student)
+            self._apply(row, sign, credit)
+        self._reorder(old_keys)
+
+    def summary(self, student):
+        """学生的累计和各学期 GPA / 加权平均分，没有计入 GPA 的成绩时返回 None"""
+        terms = self.terms.get(student)
+        if not terms:
+            return None
+        result = _gpa_dict(self.total(student))
+        result['terms'] = [dict(_gpa_dict(values), term=term) for term, values in sorted(terms.items())]
+        return result
+
+    def summaries(self, students):
+        """{学号: summary}，没有计入 GPA 的成绩的学生不在结果中"""
+        result = {}
+        for student in students:
+            summary = self.summary(student)
+            if summary is not None:
+                result[student] = summary
+        return result
+
+    def ordered(self, after=None, limit=None, desc=False):
+        """有序列表中 (GPA, 学号) 之后（不含）的最多 limit 个，desc 时从高到低"""
+        order = self.order
+        if desc:
+            end = len(order) if after is None else bisect.bisect_left(order, tuple(after))
+            start = 0 if limit is None else max(end - limit, 0)
+            return order[start:end][::-1]
+        start = 0 if after is None else bisect.bisect_right(order, tuple(after))
+        return order[start:None if limit is None else start + limit]
+
+
+def _gpa_dict(values):
+    credits, points, scores, _ = values
+    return {
+        'gpa': round(points / credits, 2),
+        'average': round(scores / credits, 2),
+        'credits': round(credits, 2),
+    }
@@ -1,54 +1,171 @@
 """成绩管理服务 - 构造 SQL 并调用模拟引擎"""
-from data_storage import execute_sql
-import student_service
+from data_storage import (IntegrityError, execute_sql, execute_many, gpa_summary, join_rows, rank_rows, summarize,
+                          top_ranked)
+import analytics
+import pagination
 
+# 成绩列表可以排序的字段（存储层对这些字段有有序索引）
+GRADE_SORTS = ('id', 'score', 'student_id')
+# 修改成绩时可以更新的字段，其他传入的字段忽略（字段名会拼进 SQL）
+GRADE_UPDATE_FIELDS = ('student_id', 'subject', 'score', 'exam_type', 'exam_date')
 
-def get_all_grades():
-    """获取所有成绩"""
+
+def get_all_grades(page_size=None, cursor=None, sort=None):
+    """
+    获取所有成绩
+    不传 page_size 时返回全部成绩的列表；传入时只取一页，返回
+    {'items': 本页成绩, 'next_cursor': 下一页游标}，下一页把 next_cursor 作为 cursor 传回
+    :param sort: 排序字段（见 GRADE_SORTS），前面加 '-' 为降序，默认按录入顺序
+    """
+    if page_size is not None:
+        return query_grades(page_size=page_size, cursor=cursor, sort=sort)
     sql = "SELECT * FROM grades"
     return execute_sql(sql)
 
 
+def query_grades(subject=None, exam_type=None, date_from=None, date_to=None, min_score=None,
+                 max_score=None, class_name=None, student_id=None, page_size=None, cursor=None, sort=None,
+                 columns=None):
+    """
+    按条件筛选成绩，条件为 None 或空串时不限制，多个条件同时满足
+    存储层在科目、考试类型、考试日期、学号上有哈希索引，分数和考试日期上有有序索引，
+    按候选行最少的那个索引取行，其余条件逐行判断
+    :param date_from / date_to: 考试日期范围（含两端），'YYYY-MM-DD'
+    :param min_score / max_score: 分数范围（含两端）
+    :param class_name: 班级，先查出班级的学号，再按学号筛选成绩
+    :param columns: 同时取出的学生字段（'student_name' / 'class_name'，见 data_storage.JOIN_COLUMNS），
+                    只按结果中的学号查找学生
+    :return: 不传 page_size 时返回成绩列表；传入时分页，返回值同 get_all_grades
+    """
+    conditions = []
+    params = {}
+    for column, op, name, value in (
+            ('student_id', '=', 'student_id', student_id),
+            ('subject', '=', 'subject', subject),
+            ('exam_type', '=', 'exam_type', exam_type),
+            ('exam_date', '>=', 'date_from', date_from),
+            ('exam_date', '<=', 'date_to', date_to),
+            ('score', '>=', 'min_score', min_score),
+            ('score', '<=', 'max_score', max_score)):
+        if value is not None and value != '':
+            conditions.append(f'{column} {op} :{name}')
+            params[name] = value
+    if class_name:
+        sql = "SELECT student_id FROM students WHERE class_name = :class_name"
+        student_ids = [s['student_id'] for s in execute_sql(sql, {'class_name': class_name})]
+        if not student_ids:
+            return [] if page_size is None else {'items': [], 'next_cursor': None}
+        conditions.append('student_id IN :student_ids')
+        params['student_ids'] = student_ids
+    where = ' AND '.join(conditions) or None
+
+    if page_size is not None:
+        column, desc = pagination.parse_sort(sort, GRADE_SORTS, 'id')
+        page_size = pagination.clamp_page_size(page_size)
+        sql = pagination.keyset_query("SELECT * FROM grades", column, desc,
+                                      pagination.decode_cursor(cursor), params, where)
+        params['limit'] = page_size + 1
+        page = pagination.page(execute_sql(sql, params), column, page_size)
+        if columns:
+            page['items'] = join_rows('grades', page['items'], columns)
+        return page
+    sql = "SELECT * FROM grades"
+    if where:
+        sql += f" WHERE {where}"
+    grades = execute_sql(sql, params)
+    return join_rows('grades', grades, columns) if columns else grades
+
+
 def get_grades_by_student(student_id):
     """获取某个学生的所有成绩"""
     sql = "SELECT * FROM grades WHERE student_id = :student_id"
     return execute_sql(sql, {'student_id': student_id})
 
 
-def add_grade(grade_data):
-    """添加成绩"""
-    # 验证学生是否存在
-    student = student_service.get_student_by_id(grade_data['student_id'])
-    if not student:
-        return {'success': False, 'message': '学生不存在'}
-    
+def get_grade_by_id(grade_id, columns=None):
+    """根据 ID 获取成绩；columns 同 query_grades"""
+    sql = "SELECT * FROM grades WHERE id = :id"
+    results = execute_sql(sql, {'id': grade_id})
+    if results and columns:
+        results = join_rows('grades', results, columns)
+    return results[0] if results else None
+
+
+def _validate_grade(grade_data):
+    """校验必填字段和分数范围，通过返回 None，否则返回错误信息"""
     # 验证必填字段
     required_fields = ['student_id', 'subject', 'score']
     for field in required_fields:
         if field not in grade_data:
-            return {'success': False, 'message': f'缺少必填字段: {field}'}
+            return f'缺少必填字段: {field}'
     
     # 验证分数范围
     score = grade_data['score']
     if not isinstance(score, (int, float)) or score < 0 or score > 100:
-        return {'success': False, 'message': '分数必须在 0-100 之间'}
+        return '分数必须在 0-100 之间'
+    return None
+
+
+def _reference_message(error):
+    """外键检查失败时的提示"""
+    return '课程不存在' if error.column == 'subject' else '学生不存在'
+
+
+def add_grade(grade_data):
+    """添加成绩（学生是否存在由存储层的外键检查）"""
+    error = _validate_grade(grade_data)
+    if error:
+        return {'success': False, 'message': error}
     
     sql = """
     INSERT INTO grades (student_id, subject, score, exam_type, exam_date)
     VALUES (:student_id, :subject, :score, :exam_type, :exam_date)
     """
     
-    execute_sql(sql, grade_data)
+    try:
+        execute_sql(sql, grade_data)
+    except IntegrityError as e:
+        return {'success': False, 'message': _reference_message(e)}
     return {'success': True, 'message': '添加成功'}
 
 
+def add_grades_bulk(grades_data):
+    """
+    批量添加成绩（如导入一次考试的全部成绩）
+    整批校验通过后才写入，且只写一次；任何一条不合法则整批不写入
+    :param grades_data: 成绩字典列表
+    :return: 结果字典，失败时 errors 列出每条错误
+    """
+    if not grades_data:
+        return {'success': True, 'message': '成功添加 0 条成绩', 'count': 0}
+    errors = []
+    for i, grade_data in enumerate(grades_data, 1):
+        error = _validate_grade(grade_data)
+        if error:
+            errors.append(f'第 {i} 条: {error}')
+
+    # 一次查询校验所有涉及的学生是否存在
+    student_ids = list({g['student_id'] for g in grades_data if 'student_id' in g})
+    sql = "SELECT * FROM students WHERE student_id IN :student_ids"
+    existing = {s['student_id'] for s in execute_sql(sql, {'student_ids': student_ids})}
+    for i, grade_data in enumerate(grades_data, 1):
+        if 'student_id' in grade_data and grade_data['student_id'] not in existing:
+            errors.append(f'第 {i} 条: 学生不存在')
+
+    if errors:
+        return {'success': False, 'message': errors[0], 'errors': errors}
+
+    sql = """
+    INSERT INTO grades (student_id, subject, score, exam_type, exam_date)
+    VALUES (:student_id, :subject, :score, :exam_type, :exam_date)
+    """
+    count = execute_many(sql, grades_data)
+    return {'success': True, 'message': f'成功添加 {count} 条成绩', 'count': count}
+
+
 def update_grade(grade_id, grade_data):
     """更新成绩"""
-    # 这里稍微麻烦点，因为模拟器需要先查是否存在
-    all_grades = get_all_grades()
-    exists = any(g['id'] == grade_id for g in all_grades)
-    
-    if not exists:
+    if not get_grade_by_id(grade_id):
          return {'success': False, 'message': '成绩记录不存在'}
          
     if 'score' in grade_data:
@@ -56,13 +173,18 @@ def update_grade(grade_id, grade_data):
         if not isinstance(score, (int, float)) or score < 0 or score > 100:
             return {'success': False, 'message': '分数必须在 0-100 之间'}
 
-    sql = "UPDATE grades SET ... WHERE id=:id"
-    params = {
-        'where_id': grade_id,
-        'update_data': grade_data
-    }
+    # 只更新传入的、允许修改的字段
+    grade_data = {field: value for field, value in grade_data.items() if field in GRADE_UPDATE_FIELDS}
+    if not grade_data:
+        return {'success': False, 'message': '没有可更新的字段'}
+    assignments = ', '.join(f'{field} = :{field}' for field in grade_data)
+    sql = f"UPDATE grades SET {assignments} WHERE id = :where_id"
+    params = dict(grade_data, where_id=grade_id)
     
-    execute_sql(sql, params)
+    try:
+        execute_sql(sql, params)
+    except IntegrityError as e:
+        return {'success': False, 'message': _reference_message(e)}
     return {'success': True, 'message': '更新成功'}
 
 
@@ -77,24 +199,98 @@ def delete_grade(grade_id):
         return {'success': False, 'message': '成绩记录不存在'}
 
 
-def get_statistics(student_id=None):
-    """获取成绩统计"""
-    # 这里直接复用 python 计算，因为 JSON 无法像 SQL 那样直接聚合
-    grades = get_all_grades()
-    
-    if student_id:
-        grades = [g for g in grades if g['student_id'] == student_id]
+def count_failed(pass_score=60):
+    """不及格成绩条数（读存储层维护的聚合）"""
+    return summarize('grades', below=pass_score)['below']
+
+
+def get_statistics(student_id=None, subject=None, class_name=None):
+    """
+    获取成绩统计，可按学生 / 科目 / 班级中的一项筛选
+    单项筛选直接读存储层维护的分组聚合，同时给出多项时按条件查询
+    """
+    filters = {name: value for name, value in
+               (('student_id', student_id), ('subject', subject), ('class_name', class_name)) if value}
+    if len(filters) <= 1:
+        group, value = next(iter(filters.items()), (None, None))
+        summary = summarize('grades', group, value)
+        row = {'count': summary['count'], 'max': summary['max'], 'min': summary['min'],
+               'average': summary['sum'] / summary['count'] if summary['count'] else None}
+    else:
+        sql = "SELECT COUNT(score) AS count, AVG(score) AS average, MAX(score) AS max, MIN(score) AS min FROM grades"
+        params = {}
+        conditions = []
+        if 'class_name' in filters:
+            students = execute_sql("SELECT student_id FROM students WHERE class_name = :class_name",
+                                   {'class_name': class_name})
+            params['student_ids'] = [s['student_id'] for s in students]
+            conditions.append("student_id IN :student_ids")
+        for name in ('student_id', 'subject'):
+            if name in filters:
+                params[name] = filters[name]
+                conditions.append(f"{name} = :{name}")
+        sql += " WHERE " + " AND ".join(conditions)
+        row = execute_sql(sql, params)[0]
     
-    if not grades:
+    if not row['count']:
         return {'success': True, 'data': {'count': 0, 'average': 0, 'max': 0, 'min': 0}}
     
-    scores = [g['score'] for g in grades]
     return {
         'success': True,
         'data': {
-            'count': len(scores),
-            'average': round(sum(scores) / len(scores), 2),
-            'max': max(scores),
-            'min': min(scores)
+            'count': row['count'],
+            'average': round(row['average'], 2),
+            'max': row['max'],
+            'min': row['min']
         }
     }
+
+
+def get_analytics():
+    """全校成绩分析：分位数、标准差、及格率 / 优秀率、分数段分布、科目 × 班级交叉表（见 analytics.py）"""
+    return {'success': True, 'data': analytics.get_report()}
+
+
+def get_grade_ranks(grades):
+    """
+    成绩在同一科目同一场考试中的名次（排名由存储层随成绩增删改维护）
+    :return: {成绩 id: {'class': 班内名次, 'cohort': 全体名次}}，名次为
+             {'rank', 'total', 'percentile'}，学生不存在时 'class' 为 None
+    """
+    grades = list(grades)
+    in_class = rank_rows('grades', grades, 'class_name')
+    in_cohort = rank_rows('grades', grades)
+    return {grade['id']: {'class': c, 'cohort': a} for grade, c, a in zip(grades, in_class, in_cohort)}
+
+
+def get_rankings(subject, exam_type, exam_date=None, class_name=None, limit=10, lowest=False):
+    """
+    某科目某场考试的前 limit 名（lowest=True 时为最后 limit 名）
+    :param exam_date: 考试日期，不传为该科目该类型最近的一场考试（都没有日期时为没有日期的那场）
+    :param class_name: 只看该班级，不传为全体
+    :return: [{'rank': 名次, **成绩}, ...]
+    """
+    if not exam_date:
+        sql = "SELECT MAX(exam_date) AS exam_date FROM grades WHERE subject = :subject AND exam_type = :exam_type"
+        latest = execute_sql(sql, {'subject': subject, 'exam_type': exam_type})
+        exam_date = latest[0]['exam_date'] if latest else None
+    key = {'subject': subject, 'exam_type': exam_type, 'exam_date': exam_date}
+    group = 'class_name' if class_name else None
+    rows = top_ranked('grades', key, limit, group, class_name, lowest)
+    return [dict(row, rank=rank) for rank, row in rows]
+
+
+def get_student_gpa(student_id):
+    """
+    学生的学分绩点：GPA 和学分加权平均分，累计以及各学期（存储层维护的物化视图，随成绩和课程学分更新）
+    只计入科目是已有课程且课程有学分的成绩，见 data_storage.GPA_EXAM_TYPES / GPA_SCALE
+    """
+    data = gpa_summary('grades', [student_id]).get(student_id)
+    if data is None:
+        return {'success': False, 'message': '该学生没有计入 GPA 的成绩'}
+    return {'success': True, 'data': data}
+
+
+def get_gpas(student_ids):
+    """学号 -> GPA 信息（同 get_student_gpa 的 data），没有计入 GPA 的成绩的学生不在结果中"""
+    return gpa_summary('grades', list(student_ids))
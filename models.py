@@ -1,5 +1,5 @@
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import Column, String, Integer, Float, Date, ForeignKey
+from sqlalchemy import Column, String, Integer, Float, Date, ForeignKey, Index
 from sqlalchemy.orm import relationship
 
 db = SQLAlchemy()
@@ -16,9 +16,18 @@ class Student(db.Model):
     phone = Column(String(20), nullable=True, comment='电话')
     email = Column(String(100), nullable=True, comment='邮箱')
     address = Column(String(200), nullable=True, comment='地址')
+    created_at = Column(String(20), nullable=True, comment='创建时间')
     
     # 关联成绩
-    grades = relationship('Grade', backref='student', lazy=True, cascade="all, delete-orphan")
+    # 不允许隐式懒加载（逐个学生查成绩会产生 N+1 查询），需要时用 selectinload(Student.grades) 一次取回
+    grades = relationship('Grade', back_populates='student', lazy='raise_on_sql',
+                          cascade="all, delete-orphan", passive_deletes=True)
+
+    # 列表页按这些字段排序分页
+    __table_args__ = (
+        Index('idx_students_name', 'name'),
+        Index('idx_students_class_name', 'class_name'),
+    )
 
     def to_dict(self):
         return {
@@ -30,7 +39,8 @@ class Student(db.Model):
             'age': self.age,
             'phone': self.phone,
             'email': self.email,
-            'address': self.address
+            'address': self.address,
+            'created_at': self.created_at
         }
 
 class Grade(db.Model):
@@ -43,6 +53,17 @@ class Grade(db.Model):
     exam_type = Column(String(50), nullable=True, comment='考试类型')
     exam_date = Column(String(20), nullable=True, comment='考试日期')
 
+    # 多对一，列表页需要学生姓名时用 joinedload(Grade.student)
+    student = relationship('Student', back_populates='grades', lazy='raise_on_sql')
+
+    __table_args__ = (
+        Index('idx_grades_student_id', 'student_id'),
+        Index('idx_grades_subject', 'subject'),
+        Index('idx_grades_score', 'score'),
+        Index('idx_grades_exam_type', 'exam_type'),
+        Index('idx_grades_exam_date', 'exam_date'),
+    )
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -52,3 +73,56 @@ class Grade(db.Model):
             'exam_type': self.exam_type,
             'exam_date': self.exam_date
         }
+
+
+class SchoolClass(db.Model):
+    __tablename__ = 'classes'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    name = Column(String(50), unique=True, nullable=False, comment='班级名称')
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name
+        }
+
+class Course(db.Model):
+    __tablename__ = 'courses'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    name = Column(String(50), unique=True, nullable=False, comment='课程名称')
+    credit = Column(Float, nullable=True, comment='学分')
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'credit': self.credit
+        }
+
+class User(db.Model):
+    __tablename__ = 'users'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    username = Column(String(50), unique=True, nullable=False, comment='用户名')
+    password = Column(String(100), nullable=False, comment='密码')
+    role = Column(String(20), nullable=True, default='user', comment='角色')
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'username': self.username,
+            'password': self.password,
+            'role': self.role
+        }
+
+
+# 表名 -> 模型
+MODELS = {
+    'students': Student,
+    'grades': Grade,
+    'classes': SchoolClass,
+    'courses': Course,
+    'users': User,
+}
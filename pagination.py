@@ -0,0 +1,109 @@
+"""键集分页（keyset pagination）
+
+列表按 (排序字段, id) 排序，下一页从上一页最后一行之后开始：
+    WHERE 字段 >= :值 AND (字段 > :值 OR id > :id) ORDER BY 字段, id LIMIT :n
+存储层按有序索引直接定位到游标位置，翻到第几页耗时都一样，不像 OFFSET 那样越翻越慢。
+游标是最后一行的 (排序字段值, id)，编码成 URL 安全的字符串。
+
+排序字段为 NULL 的行和各存储后端的 ORDER BY 一致：NULL 比任何值都小，升序时排在最前、
+降序时排在最后，NULL 之间按 id 排。和 NULL 比较的结果不是真，游标条件里单独写出 NULL 的部分
+（见 _after_cursor），否则翻到 NULL 的行就取不到下一页。
+"""
+import base64
+import json
+
+# 每页默认行数
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def parse_sort(sort, allowed, default):
+    """
+    解析排序参数：'name' 升序，'-name' 降序；不在 allowed 中时用 default
+    :return: (字段, 是否降序)
+    """
+    sort = sort or default
+    desc = sort.startswith('-')
+    column = sort.lstrip('-')
+    if column not in allowed:
+        return parse_sort(default, allowed, default)
+    return column, desc
+
+
+def encode_cursor(row, column):
+    """由一页的最后一行生成游标"""
+    data = json.dumps([row.get(column), row.get('id')], ensure_ascii=False).encode('utf-8')
+    return base64.urlsafe_b64encode(data).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """解析游标，格式不对时返回 None（从第一页开始）"""
+    if not cursor:
+        return None
+    try:
+        data = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        value, row_id = json.loads(data.decode('utf-8'))
+    except (ValueError, TypeError):
+        return None
+    return value, row_id
+
+
+def keyset_query(base_sql, column, desc, cursor, params, where=None):
+    """
+    拼出一页的查询语句
+    :param base_sql: 'SELECT ... FROM 表'
+    :param where: 其他过滤条件（SQL 片段），可为 None
+    :param cursor: decode_cursor 的结果，None 表示第一页
+    :param params: 参数字典，会加入游标和 limit 参数
+    :return: SQL 语句；调用方传入 :limit 为每页行数 + 1（多取一行判断是否还有下一页）
+    """
+    conditions = [f'({where})'] if where else []
+    if cursor is not None:
+        params['cursor_value'], params['cursor_id'] = cursor
+        conditions.append(_after_cursor(column, desc, cursor[0] is None))
+    sql = base_sql
+    if conditions:
+        sql += ' WHERE ' + ' AND '.join(conditions)
+    order = ' DESC' if desc else ''
+    sql += f' ORDER BY {column}{order}'
+    if column != 'id':
+        sql += f', id{order}'
+    return sql + ' LIMIT :limit'
+
+
+def _after_cursor(column, desc, cursor_is_null):
+    """(字段, id) 按排序方向在游标之后的条件"""
+    gt, ge = ('<', '<=') if desc else ('>', '>=')
+    if column == 'id':
+        return f'id {gt} :cursor_id'
+    if cursor_is_null:
+        if desc:
+            # NULL 排在最后，游标之后只剩 id 更小的 NULL
+            return f'{column} IS NULL AND id < :cursor_id'
+        return f'(({column} IS NULL AND id > :cursor_id) OR {column} IS NOT NULL)'
+    after = f'{column} {ge} :cursor_value AND ({column} {gt} :cursor_value OR id {gt} :cursor_id)'
+    if desc:
+        # 非 NULL 的值之后还有全部 NULL
+        return f'(({after}) OR {column} IS NULL)'
+    return after
+
+
+def page(rows, column, page_size):
+    """
+    把多取了一行的查询结果整理成一页
+    :return: {'items': 本页记录, 'next_cursor': 下一页游标，没有下一页时为 None}
+    """
+    has_next = len(rows) > page_size
+    rows = rows[:page_size]
+    return {
+        'items': rows,
+        'next_cursor': encode_cursor(rows[-1], column) if has_next else None,
+    }
+
+
+def clamp_page_size(page_size):
+    try:
+        page_size = int(page_size)
+    except (TypeError, ValueError):
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(page_size, MAX_PAGE_SIZE))
@@ -0,0 +1,137 @@
+"""SQL 查询日志 - 取代原来 execute_sql 里的 print
+
+每条记录是一行 JSON：语句、脱敏后的参数、耗时、扫描行数、返回/影响行数。
+请求线程只把记录放进内存队列，格式化和写出都在后台 QueueListener 线程完成，
+不会因为终端或磁盘 I/O 阻塞请求。
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import threading
+import time
+
+# 日志级别: DEBUG / INFO 记录所有（采样后的）查询，WARNING 只记录慢查询，OFF 关闭
+# 默认只记录慢查询；排查问题时临时改成 INFO
+LOG_LEVEL = 'WARNING'
+# INFO 级别查询的采样比例，0~1，需要全部记录时设为 1
+SAMPLE_RATE = 0.01
+# 超过该耗时（毫秒）的查询按 WARNING 记录，不参与采样
+SLOW_QUERY_MS = 200
+# 参数名包含这些片段时用 *** 代替
+REDACT_PARAMS = ('password', 'passwd', 'secret', 'token')
+# 单个参数值最多记录的字符数（批量插入的 id 列表等）
+MAX_PARAM_LENGTH = 200
+# 日志文件路径，None 时输出到标准错误
+LOG_FILE = None
+
+logger = logging.getLogger('data_storage.sql')
+logger.propagate = False
+
+_listener = None
+_setup_lock = threading.Lock()
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """原样入队，JSON 格式化留给后台线程"""
+
+    def prepare(self, record):
+        return record
+
+
+class _JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(record.created)),
+            'level': record.levelname,
+        }
+        entry.update(record.msg)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def _ensure_listener():
+    global _listener
+    if _listener is not None:
+        return
+    with _setup_lock:
+        if _listener is not None:
+            return
+        if LOG_FILE:
+            handler = logging.FileHandler(LOG_FILE, encoding='utf-8')
+        else:
+            handler = logging.StreamHandler()
+        handler.setFormatter(_JsonFormatter())
+        log_queue = queue.SimpleQueue()
+        logger.addHandler(_QueueHandler(log_queue))
+        logger.setLevel(logging.DEBUG)
+        _listener = logging.handlers.QueueListener(log_queue, handler)
+        _listener.start()
+        atexit.register(_listener.stop)
+
+
+def redact(params):
+    """参数脱敏并截断过长的值；嵌套的字典和列表（如修改的字段）逐层脱敏"""
+    if not isinstance(params, dict):
+        return params
+    return {key: '***' if _sensitive(key) else _redact_value(value) for key, value in params.items()}
+
+
+def _sensitive(key):
+    return isinstance(key, str) and any(word in key.lower() for word in REDACT_PARAMS)
+
+
+def _redact_value(value):
+    if isinstance(value, dict):
+        return redact(value)
+    if isinstance(value, (list, tuple, set)):
+        text = repr([_redact_value(item) for item in value])
+    elif isinstance(value, (str, int, float, bool, type(None))):
+        text = value
+    else:
+        text = repr(value)
+    if isinstance(text, str) and len(text) > MAX_PARAM_LENGTH:
+        text = text[:MAX_PARAM_LENGTH] + '...'
+    return text
+
+
+def record(sql, params, elapsed_ms, rows_scanned, rows_returned, batch=None):
+    """
+    记录一次查询
+    :param elapsed_ms: 耗时（毫秒）
+    :param rows_scanned: 扫描的行数（走索引时只计候选行）
+    :param rows_returned: SELECT 返回的行数，或写操作影响的行数
+    :param batch: execute_many 的批大小
+    """
+    level_name = LOG_LEVEL.upper()
+    if level_name == 'OFF':
+        return
+    slow = elapsed_ms >= SLOW_QUERY_MS
+    level = logging.WARNING if slow else logging.INFO
+    if level < getattr(logging, level_name, logging.INFO):
+        return
+    if not slow and SAMPLE_RATE < 1 and random.random() >= SAMPLE_RATE:
+        return
+
+    entry = {
+        'sql': ' '.join(sql.split()),
+        'elapsed_ms': round(elapsed_ms, 3),
+        'rows_scanned': rows_scanned,
+        'rows_returned': rows_returned,
+    }
+    if batch is not None:
+        entry['batch'] = batch
+    elif params:
+        entry['params'] = redact(params)
+    _ensure_listener()
+    logger.log(level, entry)
+
+
+def flush():
+    """等待队列中的日志全部写出（测试或退出前使用）"""
+    with _setup_lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        _listener.start()
@@ -0,0 +1,208 @@
+"""排名 - RANKINGS 中的表的排名索引
+
+每个排名范围（如同科目同场考试）维护一个按 (分数, -id) 排好序的列表，
+和其他索引一样挂在表缓存上随每次写入增量更新（二分插入 / 删除），不需要整批重排。
+名次 = 1 + 分数更高的人数，在列表上二分一次即得；前 K 名 / 后 K 名是列表两端的切片。
+按父表字段细分的范围（同班）首次使用时由全体范围分出，之后学生换班由挂在父表缓存上的监视器
+调用 move 把该学生的成绩移到新班级的列表中。排名不落盘，重新加载后首次使用时重建。
+
+这里只有数据结构；加锁、挂监视器和 SQL 后端上的计算在 data_storage 中。
+"""
+import bisect
+
+_MISSING = object()
+
+
+class Ranking:
+    """一个排名范围内的记录，按 (分数, -id) 升序：第一名在末尾，同分时 id 小的在前"""
+    __slots__ = ('keys', 'rows')
+
+    def __init__(self, keys=None, rows=None):
+        """keys / rows: 已经按 (分数, -id) 排好序的键和记录"""
+        self.keys = keys if keys is not None else []
+        self.rows = rows if rows is not None else []
+
+    @classmethod
+    def build(cls, items):
+        """由 [(键, 记录), ...] 构建：整体排序一次，不逐条插入"""
+        items.sort(key=lambda item: item[0])
+        return cls([key for key, _ in items], [row for _, row in items])
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, row, score):
+        key = rank_key(row, score)
+        i = bisect.bisect_right(self.keys, key)
+        self.keys.insert(i, key)
+        self.rows.insert(i, row)
+
+    def remove(self, row, score):
+        key = rank_key(row, score)
+        i = bisect.bisect_left(self.keys, key)
+        while i < len(self.keys) and self.keys[i] == key:
+            if self.rows[i] is row:
+                del self.keys[i]
+                del self.rows[i]
+                return
+            i += 1
+
+    def rank(self, score):
+        """score 的名次：1 + 分数比它高的人数（同分同名次）"""
+        return len(self.keys) - bisect.bisect_right(self.keys, (score, float('inf'))) + 1
+
+    def below(self, score):
+        """分数比 score 低的人数"""
+        return bisect.bisect_left(self.keys, (score, float('-inf')))
+
+    def position(self, score):
+        total = len(self.keys)
+        return {
+            'rank': self.rank(score),
+            'total': total,
+            # 超过了范围内百分之多少的人
+            'percentile': round(self.below(score) * 100 / total, 1) if total else 0,
+        }
+
+    def top(self, k, lowest=False):
+        """前 k 名（lowest=True 时为后 k 名，从最低分起）"""
+        if lowest:
+            return self.rows[:k]
+        return self.rows[:len(self.rows) - k - 1 if k < len(self.rows) else None:-1]
+
+
+def rank_key(row, score):
+    return score, -(row.get('id') or 0)
+
+
+def score_of(value):
+    """参与排名的分数：只排数值（bool 不算），其他取值返回 None"""
+    if type(value) is int or type(value) is float:
+        return value
+    return None
+
+
+class RankIndex:
+    """一张表的排名索引"""
+    __slots__ = ('column', 'key_columns', 'joins', 'scopes', 'joined', 'parents', 'children', 'current')
+
+    def __init__(self, config, rows=()):
+        """config: (排名字段, 排名范围的字段, {父表字段: 外键字段})，见 data_storage.RANKINGS"""
+        column, key_columns, joins = config
+        self.column = column
+        self.key_columns = key_columns
+        self.joins = joins
+        # 按父表字段细分的范围 {父表字段: {(父表字段值,) + 范围的键: Ranking}}，没构建或已失效时为 None
+        self.joined = None
+        # 父表被外键引用的字段上的唯一索引、子表外键字段上的哈希索引 {外键字段: 索引}
+        # （父表记录变化时用来找出引用它的记录），以及判断父表缓存是否还是构建时那个的函数
+        self.parents = None
+        self.children = None
+        self.current = None
+        grouped = {}
+        for row in rows:
+            score = row.get(column)
+            if type(score) is int or type(score) is float:
+                key = tuple(map(row.get, key_columns))
+                items = grouped.get(key)
+                if items is None:
+                    items = grouped[key] = []
+                items.append(((score, -(row.get('id') or 0)), row))
+        # 排名范围的键 -> Ranking
+        self.scopes = {key: Ranking.build(items) for key, items in grouped.items()}
+
+    def score(self, row):
+        # 和 __init__ 中的判断一致
+        return score_of(row.get(self.column))
+
+    def key(self, row):
+        return tuple(map(row.get, self.key_columns))
+
+    def add(self, row):
+        self._update(row, True)
+
+    def remove(self, row):
+        self._update(row, False)
+
+    def _update(self, row, adding):
+        score = self.score(row)
+        if score is None:
+            return
+        key = self.key(row)
+        targets = [(self.scopes, key)]
+        if self.joined is not None and not self.current():
+            self.joined = None
+        if self.joined is not None:
+            for group, fk_column in self.joins.items():
+                parent = self.parent(row.get(fk_column))
+                if parent is not None:
+                    targets.append((self.joined[group], (parent.get(group),) + key))
+        for scopes, scope in targets:
+            _rank_update(scopes, scope, row, score, adding)
+
+    def parent(self, fk_value):
+        """外键值对应的父表记录，不存在时返回 None；需先 build_joins"""
+        rows = self.parents.lookup(fk_value)
+        return rows[0] if rows else None
+
+    def build_joins(self, parents, children, current):
+        """
+        由全体范围分出按父表字段细分的范围
+        :param parents: 父表被外键引用的字段上的唯一索引（有 column 属性和 lookup 方法）
+        :param children: {外键字段: 子表该字段上的哈希索引}
+        :param current: 无参函数，父表重新加载过（监视器已经不在）时返回 False，之后的写入使细分的范围失效
+        """
+        self.parents = parents
+        self.children = children
+        self.current = current
+        joined = {}
+        for group, fk_column in self.joins.items():
+            # 按顺序把每个范围拆到各父表字段值下，拆出的列表仍然有序，不需要再排序
+            prefixes = {}
+            scopes = joined[group] = {}
+            for key, ranking in self.scopes.items():
+                for sort_key, row in zip(ranking.keys, ranking.rows):
+                    fk_value = row.get(fk_column)
+                    prefix = prefixes.get(fk_value, _MISSING)
+                    if prefix is _MISSING:
+                        parent = self.parent(fk_value)
+                        prefix = prefixes[fk_value] = (parent.get(group),) if parent is not None else None
+                    if prefix is None:
+                        continue
+                    scope = prefix + key
+                    target = scopes.get(scope)
+                    if target is None:
+                        target = scopes[scope] = Ranking()
+                    target.keys.append(sort_key)
+                    target.rows.append(row)
+        self.joined = joined
+
+    def move(self, parent, sign):
+        """父表增加（sign=1）或去掉（sign=-1）一条记录时，把引用它的记录计入或移出对应范围"""
+        if self.joined is None:
+            return
+        for group, fk_column in self.joins.items():
+            for row in self.children[fk_column].lookup(parent.get(self.parents.column)):
+                score = self.score(row)
+                if score is not None:
+                    _rank_update(self.joined[group], (parent.get(group),) + self.key(row), row, score, sign > 0)
+
+    def scope(self, key, group=None, value=None):
+        """取一个排名范围，没有记录时返回空的 Ranking"""
+        if group is None:
+            ranking = self.scopes.get(key)
+        else:
+            ranking = self.joined[group].get((value,) + key)
+        return ranking if ranking is not None else Ranking()
+
+
+def _rank_update(scopes, scope, row, score, adding):
+    ranking = scopes.get(scope)
+    if adding:
+        if ranking is None:
+            ranking = scopes[scope] = Ranking()
+        ranking.add(row, score)
+    elif ranking is not None:
+        ranking.remove(row, score)
+        if not ranking:
+            del scopes[scope]
@@ -0,0 +1,173 @@
+"""存储层的行记录类型
+
+JSON 存储缓存中的每一行是一个带 __slots__ 的只读对象，而不是字典：
+字段名只在类上保存一份，每行只占每个字段一个指针；重复出现的字符串（学号、科目、
+班级等）用 sys.intern 共享同一个对象。
+记录不可修改，缓存中的同一个对象可以直接交给多个请求；需要修改时先 to_dict()。
+
+记录支持 row['name']、row.get('name')、模板中的 row.name 以及 dict(row)。
+插入时没有提供的字段不占值：row.get('x') 返回 None，row['x'] 抛 KeyError，
+to_dict() 中也不包含该字段，与原来的字典行为一致。
+数据中出现类上没有的字段时，自动派生一个多出这些槽位的子类。
+"""
+import sys
+import threading
+
+_MISSING = object()
+
+
+class Row:
+    """只读行记录的基类"""
+    __slots__ = ()
+    _table = None
+    _fields = ()
+    _field_set = frozenset()
+    _setters = {}
+    # 值需要驻留（sys.intern）的字段
+    _interned = frozenset()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        fields = []
+        for klass in reversed(cls.__mro__):
+            fields.extend(klass.__dict__.get('__slots__', ()))
+        cls._fields = tuple(fields)
+        cls._field_set = frozenset(fields)
+        cls._setters = {name: getattr(cls, name).__set__ for name in fields}
+
+    @classmethod
+    def _build(cls, data):
+        row = object.__new__(cls)
+        setters = cls._setters
+        interned = cls._interned
+        for name, value in data.items():
+            if name in interned and type(value) is str:
+                value = sys.intern(value)
+            setters[name](row, value)
+        return row
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f'{type(self).__name__} 是只读的，请先 to_dict() 再修改')
+
+    def __delattr__(self, name):
+        raise AttributeError(f'{type(self).__name__} 是只读的，请先 to_dict() 再修改')
+
+    def __getitem__(self, key):
+        if key in self._field_set:
+            value = getattr(self, key, _MISSING)
+            if value is not _MISSING:
+                return value
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        if key in self._field_set:
+            return getattr(self, key, default)
+        return default
+
+    def __contains__(self, key):
+        return key in self._field_set and getattr(self, key, _MISSING) is not _MISSING
+
+    def keys(self):
+        return [name for name in self._fields if getattr(self, name, _MISSING) is not _MISSING]
+
+    def values(self):
+        return [self[name] for name in self.keys()]
+
+    def items(self):
+        return [(name, self[name]) for name in self.keys()]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def to_dict(self):
+        """转成普通字典（新对象，可以随意修改）"""
+        result = {}
+        for name in self._fields:
+            value = getattr(self, name, _MISSING)
+            if value is not _MISSING:
+                result[name] = value
+        return result
+
+    def replace(self, changes):
+        """返回修改了部分字段的新记录"""
+        data = self.to_dict()
+        data.update(changes)
+        return make_row(self._table, data)
+
+    def __eq__(self, other):
+        if isinstance(other, Row):
+            other = other.to_dict()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __reduce__(self):
+        return make_row, (self._table, self.to_dict())
+
+    def __repr__(self):
+        return f'{type(self).__name__}({self.to_dict()!r})'
+
+
+class StudentRow(Row):
+    __slots__ = ('id', 'student_id', 'name', 'class_name', 'gender', 'age',
+                 'phone', 'email', 'address', 'created_at')
+    _table = 'students'
+    _interned = frozenset(('class_name', 'gender'))
+
+
+class GradeRow(Row):
+    __slots__ = ('id', 'student_id', 'subject', 'score', 'exam_type', 'exam_date')
+    _table = 'grades'
+    _interned = frozenset(('student_id', 'subject', 'exam_type', 'exam_date'))
+
+
+class CourseRow(Row):
+    __slots__ = ('id', 'name', 'credit')
+    _table = 'courses'
+    _interned = frozenset(('name',))
+
+
+class ClassInfoRow(Row):
+    __slots__ = ('id', 'name')
+    _table = 'classes'
+    _interned = frozenset(('name',))
+
+
+class UserRow(Row):
+    __slots__ = ('id', 'username', 'password', 'role')
+    _table = 'users'
+    _interned = frozenset(('role',))
+
+
+# 表名 -> 当前使用的记录类型（出现新字段后会换成派生出的子类）
+_types = {cls._table: cls for cls in (StudentRow, GradeRow, CourseRow, ClassInfoRow, UserRow)}
+_types_lock = threading.Lock()
+
+
+def _row_type(table, data):
+    """能容纳 data 中所有字段的记录类型"""
+    cls = _types.get(table)
+    if cls is not None and cls._field_set.issuperset(data):
+        return cls
+    with _types_lock:
+        cls = _types.get(table)
+        if cls is None:
+            cls = type(f'{table.title()}Row', (Row,), {'__slots__': (), '_table': table})
+        extra = tuple(name for name in data if name not in cls._field_set)
+        if extra:
+            bad = [name for name in extra if not name.isidentifier()]
+            if bad:
+                raise ValueError(f'{table} 表的字段名不合法: {bad}')
+            cls = type(cls.__name__, (cls,), {'__slots__': extra})
+        _types[table] = cls
+        return cls
+
+
+def make_row(table, data):
+    """由字典构造 table 表的只读记录"""
+    return _row_type(table, data)._build(data)
@@ -1,4 +1,4 @@
-from data_storage import execute_sql
+from data_storage import IntegrityError, count_rows, execute_sql, recent_rows, summarize
 
 # ----- 班级管理 -----
 
@@ -11,19 +11,17 @@ def add_class(name):
     if not name:
         return {'success': False, 'message': '班级名称不能为空'}
     
-    # 检查是否存在
-    classes = get_all_classes()
-    for c in classes:
-        if c['name'] == name:
-            return {'success': False, 'message': '该班级已存在'}
-            
-    execute_sql("INSERT INTO classes", {'name': name})
+    # 名称是否重复由存储层的唯一约束检查
+    try:
+        execute_sql("INSERT INTO classes (name) VALUES (:name)", {'name': name})
+    except IntegrityError:
+        return {'success': False, 'message': '该班级已存在'}
     return {'success': True, 'message': '班级添加成功'}
 
 def delete_class(class_id):
     """删除班级"""
     try:
-        count = execute_sql("DELETE FROM classes", {'id': int(class_id)})
+        count = execute_sql("DELETE FROM classes WHERE id = :id", {'id': int(class_id)})
         if count > 0:
             return {'success': True, 'message': '班级删除成功'}
         else:
@@ -43,27 +41,54 @@ def add_course(name, credit):
     if not name:
         return {'success': False, 'message': '课程名称不能为空'}
     
-    # 检查是否存在
-    courses = get_all_courses()
-    for c in courses:
-        if c['name'] == name:
-            return {'success': False, 'message': '该课程已存在'}
-            
     try:
         credit = float(credit)
     except ValueError:
         return {'success': False, 'message': '学分必须是数字'}
 
-    execute_sql("INSERT INTO courses", {'name': name, 'credit': credit})
+    # 名称是否重复由存储层的唯一约束检查
+    try:
+        execute_sql("INSERT INTO courses (name, credit) VALUES (:name, :credit)", {'name': name, 'credit': credit})
+    except IntegrityError:
+        return {'success': False, 'message': '该课程已存在'}
     return {'success': True, 'message': '课程添加成功'}
 
 def delete_course(course_id):
     """删除课程"""
     try:
-        count = execute_sql("DELETE FROM courses", {'id': int(course_id)})
+        count = execute_sql("DELETE FROM courses WHERE id = :id", {'id': int(course_id)})
         if count > 0:
             return {'success': True, 'message': '课程删除成功'}
         else:
             return {'success': False, 'message': '课程不存在'}
     except Exception as e:
         return {'success': False, 'message': str(e)}
+
+def update_course_credit(course_id, credit):
+    """修改课程学分（存储层的 GPA 视图随之更新该课程的成绩）"""
+    try:
+        credit = float(credit)
+    except (TypeError, ValueError):
+        return {'success': False, 'message': '学分必须是数字'}
+    count = execute_sql("UPDATE courses SET credit = :credit WHERE id = :id", {'credit': credit, 'id': int(course_id)})
+    if count > 0:
+        return {'success': True, 'message': '学分修改成功'}
+    return {'success': False, 'message': '课程不存在'}
+
+
+# ----- 仪表盘 -----
+
+def get_dashboard_summary(recent=5, pass_score=60):
+    """
+    仪表盘摘要：各表行数、不及格成绩条数、最近添加的 recent 个学生
+    都读存储层随写入维护的数据（表缓存的行数、分组聚合、最近添加的记录），不读取整张表
+    """
+    counts = count_rows('students', 'classes', 'courses', 'grades')
+    return {
+        'student_count': counts['students'],
+        'class_count': counts['classes'],
+        'course_count': counts['courses'],
+        'grade_count': counts['grades'],
+        'failed_count': summarize('grades', below=pass_score)['below'],
+        'recent_students': recent_rows('students', recent),
+    }
@@ -0,0 +1,638 @@
+"""SQL 解析 - 把服务层使用的 SQL 子集解析成语句对象
+
+支持的语法:
+    SELECT 列, ... | * | COUNT/SUM/AVG/MIN/MAX(列 | *) [AS 别名] FROM 表
+        [WHERE 条件] [ORDER BY 列 [ASC|DESC], ...] [LIMIT n [OFFSET m]]
+    INSERT INTO 表 [(列, ...) VALUES (值, ...)]
+    UPDATE 表 SET 列 = 值, ... [WHERE 条件]
+    DELETE FROM 表 [WHERE 条件]
+
+条件支持 AND / OR / NOT / 括号，= != <> < <= > >=，[NOT] LIKE，[NOT] IN (...) / IN :参数，
+IS [NOT] NULL。值可以是 :参数、数字或 '字符串'。
+
+parse() 按语句文本缓存解析结果，同一条 SQL 只解析一次；语句对象是共享的，不要修改。
+"""
+import re
+from functools import lru_cache
+
+AGGREGATES = ('COUNT', 'SUM', 'AVG', 'MIN', 'MAX')
+
+_TOKEN_RE = re.compile(r"""
+    \s*(?:
+        (?P<number>-?\d+(?:\.\d+)?)
+      | (?P<string>'(?:[^']|'')*')
+      | (?P<param>:[A-Za-z_]\w*)
+      | (?P<name>[A-Za-z_]\w*|`[^`]+`)
+      | (?P<op><=|>=|<>|!=|=|<|>)
+      | (?P<punct>[(),*.;])
+    )""", re.X)
+
+
+class SQLSyntaxError(ValueError):
+    """不支持或无法解析的 SQL"""
+
+
+# ==================== 值 ====================
+
+class Param:
+    """命名参数 :name"""
+    __slots__ = ('name',)
+
+    def __init__(self, name):
+        self.name = name
+
+    def bind(self, params):
+        if not params or self.name not in params:
+            raise SQLSyntaxError(f'缺少参数: {self.name}')
+        return params[self.name]
+
+    def __repr__(self):
+        return f':{self.name}'
+
+
+class Literal:
+    """字面量（数字或字符串）"""
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def bind(self, params):
+        return self.value
+
+    def __repr__(self):
+        return repr(self.value)
+
+
+# ==================== 条件 ====================
+
+class Compare:
+    __slots__ = ('column', 'op', 'operand')
+
+    def __init__(self, column, op, operand):
+        self.column = column
+        self.op = '!=' if op == '<>' else op
+        self.operand = operand
+
+    def __repr__(self):
+        return f'{self.column} {self.op} {self.operand!r}'
+
+
+class Like:
+    __slots__ = ('column', 'operand', 'negated')
+
+    def __init__(self, column, operand, negated=False):
+        self.column = column
+        self.operand = operand
+        self.negated = negated
+
+    def __repr__(self):
+        return f"{self.column} {'NOT ' if self.negated else ''}LIKE {self.operand!r}"
+
+
+class In:
+    """column IN (v1, v2, ...) 或 column IN :param（参数值为列表）"""
+    __slots__ = ('column', 'operands', 'negated')
+
+    def __init__(self, column, operands, negated=False):
+        self.column = column
+        self.operands = operands
+        self.negated = negated
+
+    def values(self, params):
+        if isinstance(self.operands, Param):
+            return self.operands.bind(params)
+        return [o.bind(params) for o in self.operands]
+
+    def __repr__(self):
+        return f"{self.column} {'NOT ' if self.negated else ''}IN {self.operands!r}"
+
+
+class IsNull:
+    __slots__ = ('column', 'negated')
+
+    def __init__(self, column, negated=False):
+        self.column = column
+        self.negated = negated
+
+    def __repr__(self):
+        return f"{self.column} IS {'NOT ' if self.negated else ''}NULL"
+
+
+class And:
+    __slots__ = ('items',)
+
+    def __init__(self, items):
+        self.items = items
+
+    def __repr__(self):
+        return '(' + ' AND '.join(map(repr, self.items)) + ')'
+
+
+class Or:
+    __slots__ = ('items',)
+
+    def __init__(self, items):
+        self.items = items
+
+    def __repr__(self):
+        return '(' + ' OR '.join(map(repr, self.items)) + ')'
+
+
+class Not:
+    __slots__ = ('item',)
+
+    def __init__(self, item):
+        self.item = item
+
+    def __repr__(self):
+        return f'NOT {self.item!r}'
+
+
+def conjuncts(condition):
+    """把条件拆成顶层 AND 的各项"""
+    if condition is None:
+        return []
+    if isinstance(condition, And):
+        return list(condition.items)
+    return [condition]
+
+
+# ==================== 语句 ====================
+
+class SelectItem:
+    """SELECT 列表中的一项: kind 为 'star' / 'column' / 'agg'"""
+    __slots__ = ('kind', 'func', 'column', 'alias')
+
+    def __init__(self, kind, column=None, func=None, alias=None):
+        self.kind = kind
+        self.column = column
+        self.func = func
+        self.alias = alias
+
+    @property
+    def name(self):
+        if self.alias:
+            return self.alias
+        if self.kind == 'agg':
+            return f"{self.func.lower()}({self.column or '*'})"
+        return self.column
+
+    def __repr__(self):
+        if self.kind == 'star':
+            return '*'
+        text = f"{self.func}({self.column or '*'})" if self.kind == 'agg' else self.column
+        return f'{text} AS {self.alias}' if self.alias else text
+
+
+class Select:
+    kind = 'select'
+
+    def __init__(self, table, items, where=None, order_by=(), limit=None, offset=None):
+        self.table = table
+        self.items = items
+        self.where = where
+        self.order_by = order_by
+        self.limit = limit
+        self.offset = offset
+
+    @property
+    def is_aggregate(self):
+        return any(item.kind == 'agg' for item in self.items)
+
+
+class Insert:
+    kind = 'insert'
+
+    def __init__(self, table, columns=None, values=None):
+        self.table = table
+        self.columns = columns
+        self.values = values
+
+    def row(self, params):
+        """按列和值构造要插入的记录；没有列清单时直接使用参数字典"""
+        if self.columns is None:
+            return dict(params or {})
+        row = {}
+        for column, operand in zip(self.columns, self.values):
+            # 可选字段没有传参时不写入该列，保持和原来 params.copy() 一致
+            if isinstance(operand, Param) and (not params or operand.name not in params):
+                continue
+            row[column] = operand.bind(params)
+        return row
+
+
+class Update:
+    kind = 'update'
+
+    def __init__(self, table, assignments, where=None):
+        self.table = table
+        self.assignments = assignments
+        self.where = where
+
+    def changes(self, params):
+        return {column: operand.bind(params) for column, operand in self.assignments}
+
+
+class Delete:
+    kind = 'delete'
+
+    def __init__(self, table, where=None):
+        self.table = table
+        self.where = where
+
+
+# ==================== 解析器 ====================
+
+def _tokenize(sql):
+    tokens = []
+    pos = 0
+    sql = sql.rstrip()
+    while pos < len(sql):
+        m = _TOKEN_RE.match(sql, pos)
+        if not m or m.end() == pos:
+            raise SQLSyntaxError(f'无法识别的 SQL 片段: {sql[pos:pos + 20]!r}')
+        pos = m.end()
+        kind = m.lastgroup
+        value = m.group(kind)
+        if kind == 'number':
+            value = float(value) if '.' in value else int(value)
+        elif kind == 'string':
+            value = value[1:-1].replace("''", "'")
+        elif kind == 'param':
+            value = value[1:]
+        elif kind == 'name' and value.startswith('`'):
+            value = value[1:-1]
+        tokens.append((kind, value))
+    return tokens
+
+
+class _Parser:
+    def __init__(self, sql):
+        self.sql = sql
+        self.tokens = _tokenize(sql)
+        self.pos = 0
+
+    # ----- 基础 -----
+
+    def peek(self, offset=0):
+        i = self.pos + offset
+        return self.tokens[i] if i < len(self.tokens) else (None, None)
+
+    def next(self):
+        token = self.peek()
+        self.pos += 1
+        return token
+
+    def at_keyword(self, *words):
+        kind, value = self.peek()
+        return kind == 'name' and value.upper() in words
+
+    def accept_keyword(self, *words):
+        if self.at_keyword(*words):
+            return self.next()[1].upper()
+        return None
+
+    def expect_keyword(self, word):
+        if not self.accept_keyword(word):
+            self.error(f'缺少 {word}')
+
+    def accept_punct(self, char):
+        if self.peek() == ('punct', char):
+            self.pos += 1
+            return True
+        return False
+
+    def expect_punct(self, char):
+        if not self.accept_punct(char):
+            self.error(f'缺少 {char!r}')
+
+    def error(self, message):
+        kind, value = self.peek()
+        near = '语句末尾' if kind is None else repr(value)
+        raise SQLSyntaxError(f'{message}（位置: {near}）: {self.sql.strip()}')
+
+    def name(self):
+        kind, value = self.next()
+        if kind != 'name':
+            self.pos -= 1
+            self.error('需要列名或表名')
+        # 允许 table.column 的写法，只取列名
+        if self.accept_punct('.'):
+            return self.name()
+        return value
+
+    def operand(self):
+        kind, value = self.next()
+        if kind == 'param':
+            return Param(value)
+        if kind in ('number', 'string'):
+            return Literal(value)
+        if kind == 'name' and value.upper() == 'NULL':
+            return Literal(None)
+        self.pos -= 1
+        self.error('需要参数或字面量')
+
+    # ----- 语句 -----
+
+    def parse(self):
+        keyword = self.accept_keyword('SELECT', 'INSERT', 'UPDATE', 'DELETE')
+        if keyword is None:
+            self.error('只支持 SELECT / INSERT / UPDATE / DELETE')
+        stmt = getattr(self, 'parse_' + keyword.lower())()
+        self.accept_punct(';')
+        if self.peek()[0] is not None:
+            self.error('多余的内容')
+        return stmt
+
+    def parse_select(self):
+        items = [self.select_item()]
+        while self.accept_punct(','):
+            items.append(self.select_item())
+        self.expect_keyword('FROM')
+        table = self.name()
+        where = self.where()
+        order_by = []
+        if self.accept_keyword('ORDER'):
+            self.expect_keyword('BY')
+            while True:
+                column = self.name()
+                desc = self.accept_keyword('ASC', 'DESC') == 'DESC'
+                order_by.append((column, desc))
+                if not self.accept_punct(','):
+                    break
+        limit = offset = None
+        if self.accept_keyword('LIMIT'):
+            limit = self.operand()
+            if self.accept_keyword('OFFSET'):
+                offset = self.operand()
+            elif self.accept_punct(','):
+                # MySQL 写法 LIMIT offset, count
+                offset, limit = limit, self.operand()
+        return Select(table, items, where, tuple(order_by), limit, offset)
+
+    def select_item(self):
+        if self.accept_punct('*'):
+            return SelectItem('star')
+        kind, value = self.peek()
+        if kind == 'name' and value.upper() in AGGREGATES and self.peek(1) == ('punct', '('):
+            self.pos += 2
+            column = None if self.accept_punct('*') else self.name()
+            self.expect_punct(')')
+            item = SelectItem('agg', column, value.upper())
+        else:
+            item = SelectItem('column', self.name())
+        if self.accept_keyword('AS'):
+            item.alias = self.name()
+        return item
+
+    def parse_insert(self):
+        self.expect_keyword('INTO')
+        table = self.name()
+        if not self.accept_punct('('):
+            return Insert(table)
+        columns = [self.name()]
+        while self.accept_punct(','):
+            columns.append(self.name())
+        self.expect_punct(')')
+        self.expect_keyword('VALUES')
+        self.expect_punct('(')
+        values = [self.operand()]
+        while self.accept_punct(','):
+            values.append(self.operand())
+        self.expect_punct(')')
+        if len(columns) != len(values):
+            self.error('列数和值的个数不一致')
+        return Insert(table, columns, values)
+
+    def parse_update(self):
+        table = self.name()
+        self.expect_keyword('SET')
+        assignments = []
+        while True:
+            column = self.name()
+            if self.next() != ('op', '='):
+                self.pos -= 1
+                self.error('SET 子句需要 =')
+            assignments.append((column, self.operand()))
+            if not self.accept_punct(','):
+                break
+        return Update(table, assignments, self.where())
+
+    def parse_delete(self):
+        self.expect_keyword('FROM')
+        table = self.name()
+        return Delete(table, self.where())
+
+    # ----- 条件 -----
+
+    def where(self):
+        if self.accept_keyword('WHERE'):
+            return self.or_expr()
+        return None
+
+    def or_expr(self):
+        items = [self.and_expr()]
+        while self.accept_keyword('OR'):
+            items.append(self.and_expr())
+        return items[0] if len(items) == 1 else Or(items)
+
+    def and_expr(self):
+        items = [self.not_expr()]
+        while self.accept_keyword('AND'):
+            items.append(self.not_expr())
+        return items[0] if len(items) == 1 else And(items)
+
+    def not_expr(self):
+        if self.accept_keyword('NOT'):
+            return Not(self.not_expr())
+        if self.accept_punct('('):
+            expr = self.or_expr()
+            self.expect_punct(')')
+            return expr
+        return self.predicate()
+
+    def predicate(self):
+        column = self.name()
+        kind, value = self.peek()
+        if kind == 'op':
+            self.pos += 1
+            return Compare(column, value, self.operand())
+        if self.accept_keyword('IS'):
+            negated = bool(self.accept_keyword('NOT'))
+            self.expect_keyword('NULL')
+            return IsNull(column, negated)
+        negated = bool(self.accept_keyword('NOT'))
+        if self.accept_keyword('LIKE'):
+            return Like(column, self.operand(), negated)
+        if self.accept_keyword('IN'):
+            if self.peek()[0] == 'param':
+                return In(column, Param(self.next()[1]), negated)
+            self.expect_punct('(')
+            operands = [self.operand()]
+            while self.accept_punct(','):
+                operands.append(self.operand())
+            self.expect_punct(')')
+            return In(column, operands, negated)
+        self.error('不支持的条件')
+
+
+@lru_cache(maxsize=512)
+def parse(sql):
+    """解析 SQL 语句（按文本缓存）"""
+    return _Parser(sql).parse()
+
+
+# ==================== 条件编译 ====================
+
+_COMPARATORS = {
+    '=': lambda a, b: a == b,
+    '!=': lambda a, b: a != b,
+    '<': lambda a, b: a < b,
+    '<=': lambda a, b: a <= b,
+    '>': lambda a, b: a > b,
+    '>=': lambda a, b: a >= b,
+}
+
+
+def like_to_regex(pattern):
+    """把 LIKE 模式转成正则：% 任意串，_ 单个字符，反斜杠转义；不区分大小写（同 MySQL 默认排序规则）"""
+    out = []
+    chars = iter(str(pattern))
+    for ch in chars:
+        if ch == '\\':
+            out.append(re.escape(next(chars, '\\')))
+        elif ch == '%':
+            out.append('.*')
+        elif ch == '_':
+            out.append('.')
+        else:
+            out.append(re.escape(ch))
+    return re.compile(''.join(out), re.S | re.I)
+
+
+def compile_condition(condition):
+    """
+    把条件编译成 bind(params) -> predicate(row)
+    每次执行先绑定一次参数（IN 列表转成集合、LIKE 模式转成正则），再逐行判断。
+    同 SQL 的三值逻辑：NULL 参与比较、LIKE、IN 的结果为未知（predicate 返回 None），
+    NOT 未知仍是未知，AND / OR 按 SQL 的规则合并；WHERE 只取结果为 True 的行，
+    所以 NOT (col = :v) 不匹配 col 为 NULL 的行，与数据库一致。
+    类型不可比较（如字符串和数字比大小）视为不满足
+    """
+    if condition is None:
+        return lambda params: lambda row: True
+
+    if isinstance(condition, Compare):
+        column, operand = condition.column, condition.operand
+        compare = _COMPARATORS[condition.op]
+
+        def bind(params):
+            right = operand.bind(params)
+            if right is None:
+                return lambda row: None
+
+            def predicate(row):
+                left = row.get(column)
+                if left is None:
+                    return None
+                try:
+                    return compare(left, right)
+                except TypeError:
+                    return False
+            return predicate
+        return bind
+
+    if isinstance(condition, Like):
+        column, operand, negated = condition.column, condition.operand, condition.negated
+
+        def bind(params):
+            pattern = operand.bind(params)
+            if pattern is None:
+                return lambda row: None
+            match = like_to_regex(pattern).fullmatch
+
+            def predicate(row):
+                value = row.get(column)
+                if value is None:
+                    return None
+                return bool(match(str(value))) != negated
+            return predicate
+        return bind
+
+    if isinstance(condition, In):
+        column, negated = condition.column, condition.negated
+
+        def bind(params):
+            values = condition.values(params)
+            try:
+                values = set(values)
+            except TypeError:
+                values = list(values)
+            # 列表中有 NULL 时，不在其余值中的结果是未知
+            missing = None if None in values else negated
+
+            def predicate(row):
+                value = row.get(column)
+                if value is None:
+                    return None
+                return (not negated) if value in values else missing
+            return predicate
+        return bind
+
+    if isinstance(condition, IsNull):
+        column, negated = condition.column, condition.negated
+        return lambda params: lambda row: (row.get(column) is None) != negated
+
+    if isinstance(condition, And):
+        parts = [compile_condition(c) for c in condition.items]
+
+        def bind(params):
+            bound = [p(params) for p in parts]
+
+            def predicate(row):
+                # 有一项为假即为假，否则有一项未知即为未知
+                result = True
+                for p in bound:
+                    value = p(row)
+                    if not value:
+                        if value is None:
+                            result = None
+                        else:
+                            return False
+                return result
+            return predicate
+        return bind
+
+    if isinstance(condition, Or):
+        parts = [compile_condition(c) for c in condition.items]
+
+        def bind(params):
+            bound = [p(params) for p in parts]
+
+            def predicate(row):
+                # 有一项为真即为真，否则有一项未知即为未知
+                result = False
+                for p in bound:
+                    value = p(row)
+                    if value:
+                        return True
+                    if value is None:
+                        result = None
+                return result
+            return predicate
+        return bind
+
+    if isinstance(condition, Not):
+        part = compile_condition(condition.item)
+
+        def bind(params):
+            predicate = part(params)
+
+            def negate(row):
+                value = predicate(row)
+                return None if value is None else not value
+            return negate
+        return bind
+
+    raise SQLSyntaxError(f'无法编译的条件: {condition!r}')
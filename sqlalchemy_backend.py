@@ -0,0 +1,305 @@
+"""SQLAlchemy 存储后端 - 通过 models.py 中的模型实现 execute_sql 的约定
+
+服务层发送的语句先由 sql_parser 解析，再转换成 SQLAlchemy 的查询（select / insert /
+update / delete），由 SQLAlchemy 生成对应数据库方言的 SQL。连接 URL 决定目标数据库：
+生产环境用 MySQL (mysql+pymysql://...)，本地测试直接用 sqlite:///... 即可。
+连接来自连接池（大小、溢出、回收时间、取用前探活均可配置）。
+
+模型之间的关联不允许隐式懒加载，需要关联数据时显式使用 selectinload，
+例如删除学生时一次查出所有待删学生的成绩做级联删除，而不是每个学生各查一次。
+"""
+import operator
+import threading
+
+from sqlalchemy import and_, bindparam, create_engine, delete, event, exc, func, insert, or_, select, text, update
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session, selectinload
+
+import sql_parser
+from models import MODELS, db
+
+_COMPARE = {
+    '=': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+}
+
+# 导入数据时每批删除的 id 数
+_LOAD_CHUNK = 500
+
+
+class _Builder:
+    """把语句对象转换成 SQLAlchemy 查询"""
+
+    def __init__(self, model, params, explain=False):
+        self.model = model
+        self.table = model.__table__
+        self.params = params or {}
+        self.explain = explain
+
+    def column(self, name):
+        try:
+            return self.table.c[name]
+        except KeyError:
+            raise sql_parser.SQLSyntaxError(f'表 {self.table.name} 没有列: {name}') from None
+
+    def value(self, operand, placeholder=None):
+        """取参数值；EXPLAIN 时没有实参，用占位值（默认是不带值的绑定参数）"""
+        if self.explain and isinstance(operand, sql_parser.Param) and operand.name not in self.params:
+            return bindparam(operand.name) if placeholder is None else placeholder
+        return operand.bind(self.params)
+
+    def condition(self, cond):
+        if isinstance(cond, sql_parser.Compare):
+            return _COMPARE[cond.op](self.column(cond.column), self.value(cond.operand))
+        if isinstance(cond, sql_parser.Like):
+            column = self.column(cond.column)
+            pattern = self.value(cond.operand, '')
+            if cond.negated:
+                return column.not_like(pattern, escape='\\')
+            return column.like(pattern, escape='\\')
+        if isinstance(cond, sql_parser.In):
+            column = self.column(cond.column)
+            if isinstance(cond.operands, sql_parser.Param):
+                values = list(self.value(cond.operands, [None]))
+            else:
+                values = [self.value(o) for o in cond.operands]
+            return column.not_in(values) if cond.negated else column.in_(values)
+        if isinstance(cond, sql_parser.IsNull):
+            column = self.column(cond.column)
+            return column.is_not(None) if cond.negated else column.is_(None)
+        if isinstance(cond, sql_parser.And):
+            return and_(*(self.condition(c) for c in cond.items))
+        if isinstance(cond, sql_parser.Or):
+            return or_(*(self.condition(c) for c in cond.items))
+        if isinstance(cond, sql_parser.Not):
+            return ~self.condition(cond.item)
+        raise sql_parser.SQLSyntaxError(f'无法转换的条件: {cond!r}')
+
+    def where(self, query, cond):
+        return query.where(self.condition(cond)) if cond is not None else query
+
+    def select(self, stmt):
+        if _whole_rows(stmt):
+            # 整行查询返回模型对象，由 to_dict() 转成字典
+            query = select(self.model)
+        else:
+            columns = []
+            for item in stmt.items:
+                if item.kind == 'star':
+                    columns.extend(self.table.c)
+                elif item.kind == 'agg':
+                    arg = self.column(item.column) if item.column else None
+                    agg = getattr(func, item.func.lower())
+                    columns.append((agg(arg) if arg is not None else agg()).label(item.name))
+                else:
+                    columns.append(self.column(item.column).label(item.name))
+            # COUNT(*) 不引用任何列，不显式给出 FROM 时生成的语句没有表
+            query = select(*columns).select_from(self.table)
+        query = self.where(query, stmt.where)
+        if stmt.order_by:
+            query = query.order_by(*(self.column(column).desc() if desc else self.column(column)
+                                     for column, desc in stmt.order_by))
+        if stmt.limit is not None:
+            query = query.limit(int(self.value(stmt.limit, 1)))
+        if stmt.offset is not None:
+            query = query.offset(int(self.value(stmt.offset, 0)))
+        return query
+
+    def row(self, stmt, params):
+        row = stmt.row(params)
+        for column in row:
+            self.column(column)
+        return row
+
+    def update(self, stmt):
+        changes = {self.column(column).key: self.value(operand)
+                   for column, operand in stmt.assignments}
+        query = update(self.model).values(changes)
+        return self.where(query, stmt.where).execution_options(synchronize_session=False)
+
+    def delete(self, stmt):
+        return self.where(delete(self.model), stmt.where).execution_options(synchronize_session=False)
+
+
+def _whole_rows(stmt):
+    return len(stmt.items) == 1 and stmt.items[0].kind == 'star'
+
+
+def _cascades(model):
+    """删除时需要级联删除的关联（如 Student.grades）"""
+    return [rel for rel in model.__mapper__.relationships if rel.cascade.delete]
+
+
+def _enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    """SQLite 默认不检查外键，每个新连接打开"""
+    dbapi_connection.execute('PRAGMA foreign_keys=ON')
+
+
+# 导入数据时临时关闭外键检查的语句: 方言 -> (关闭, 打开)
+_FOREIGN_KEY_CHECKS = {
+    'mysql': ('SET FOREIGN_KEY_CHECKS=0', 'SET FOREIGN_KEY_CHECKS=1'),
+    'sqlite': ('PRAGMA foreign_keys=OFF', 'PRAGMA foreign_keys=ON'),
+}
+
+
+class SQLAlchemyBackend:
+    """SQLAlchemy 后端，每次调用从连接池取一个连接，用完即还"""
+
+    # 违反外键 / 唯一约束时抛出的异常
+    integrity_errors = (exc.IntegrityError,)
+
+    def __init__(self, url, pool_size=10, max_overflow=20, pool_recycle=3600, pool_pre_ping=True):
+        url = make_url(url)
+        options = {'pool_pre_ping': pool_pre_ping}
+        if not (url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')):
+            # 内存 SQLite 只能用单连接池，不支持这些参数
+            options.update(pool_size=pool_size, max_overflow=max_overflow, pool_recycle=pool_recycle)
+        self.engine = create_engine(url, **options)
+        if url.get_backend_name() == 'sqlite':
+            event.listen(self.engine, 'connect', _enable_sqlite_foreign_keys)
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    def _create_tables(self):
+        """首次使用时按模型建表建索引（已存在的表不变）"""
+        if self._schema_ready:
+            return
+        with self._schema_lock:
+            if not self._schema_ready:
+                db.metadata.create_all(self.engine)
+                self._schema_ready = True
+
+    def _model(self, table):
+        try:
+            return MODELS[table]
+        except KeyError:
+            raise sql_parser.SQLSyntaxError(f'未知的表: {table}') from None
+
+    def _prepare(self, sql, params, explain=False):
+        self._create_tables()
+        stmt = sql_parser.parse(sql)
+        model = self._model(stmt.table)
+        return stmt, model, _Builder(model, params, explain)
+
+    def ensure_schema(self, defaults=None):
+        """
+        建表并写入初始数据
+        :param defaults: {表名: [记录, ...]}，表为空时写入的初始数据
+        """
+        self._create_tables()
+        with Session(self.engine) as session:
+            empty = [table for table in (defaults or {})
+                     if session.execute(select(self._model(table).__table__.c.id).limit(1)).first() is None]
+        for table in empty:
+            self.load_rows(table, defaults[table])
+
+    def execute(self, sql, params=None):
+        stmt, model, builder = self._prepare(sql, params)
+        with Session(self.engine) as session:
+            if stmt.kind == 'select':
+                query = builder.select(stmt)
+                if _whole_rows(stmt):
+                    return [obj.to_dict() for obj in session.scalars(query)]
+                return [dict(row._mapping) for row in session.execute(query)]
+            count = self._write(session, stmt, model, builder)
+            session.commit()
+            return count
+
+    def execute_many(self, sql, params_list):
+        """同一条语句整批在一个事务里执行；INSERT 使用批量插入"""
+        self._create_tables()
+        stmt = sql_parser.parse(sql)
+        model = self._model(stmt.table)
+        with Session(self.engine) as session:
+            if stmt.kind == 'insert':
+                rows = [_Builder(model, params).row(stmt, params) for params in params_list]
+                if rows:
+                    session.execute(insert(model), rows)
+                count = len(rows)
+            else:
+                count = sum(self._write(session, stmt, model, _Builder(model, params))
+                            for params in params_list)
+            session.commit()
+            return count
+
+    def _write(self, session, stmt, model, builder):
+        if stmt.kind == 'insert':
+            session.add(model(**builder.row(stmt, builder.params)))
+            session.flush()
+            return 1
+        if stmt.kind == 'update':
+            return session.execute(builder.update(stmt)).rowcount
+        if stmt.kind == 'delete':
+            cascades = _cascades(model)
+            if not cascades:
+                return session.execute(builder.delete(stmt)).rowcount
+            # 通过 ORM 删除以级联关联记录；关联数据用 selectinload 一次取回，避免 N+1
+            query = builder.where(select(model), stmt.where)
+            query = query.options(*(selectinload(rel.class_attribute) for rel in cascades))
+            objects = session.scalars(query).all()
+            for obj in objects:
+                session.delete(obj)
+            session.flush()
+            return len(objects)
+        raise sql_parser.SQLSyntaxError(f'不支持的语句: {stmt.kind}')
+
+    def explain(self, sql, params=None):
+        """数据库自己的执行计划（SQLite: EXPLAIN QUERY PLAN，MySQL: EXPLAIN）"""
+        stmt, model, builder = self._prepare(sql, params, explain=True)
+        if stmt.kind == 'select':
+            query = builder.select(stmt)
+        elif stmt.kind == 'update':
+            query = builder.update(stmt)
+        elif stmt.kind == 'delete':
+            query = builder.delete(stmt)
+        else:
+            row = (dict(zip(stmt.columns, map(builder.value, stmt.values)))
+                   if stmt.columns else builder.row(stmt, params))
+            query = insert(model).values(row)
+        dialect = self.engine.dialect
+        compiled = query.compile(dialect=dialect, compile_kwargs={'render_postcompile': True})
+        if dialect.positional:
+            bound = tuple(compiled.params[name] for name in compiled.positiontup)
+        else:
+            bound = compiled.params
+        prefix = 'EXPLAIN QUERY PLAN ' if dialect.name == 'sqlite' else 'EXPLAIN '
+        with self.engine.connect() as conn:
+            rows = conn.exec_driver_sql(prefix + str(compiled), bound).mappings().all()
+        return {
+            'statement': stmt.kind.upper(),
+            'table': stmt.table,
+            'sql': str(compiled),
+            'plan': [row['detail'] if 'detail' in row else dict(row) for row in rows],
+        }
+
+    def load_rows(self, table, rows):
+        """
+        原样导入记录（保留 id，已存在的 id 覆盖），用于初始化数据或从 JSON 迁移
+        导入期间不检查外键，旧数据里可能有已删除学生的成绩
+        """
+        self._create_tables()
+        model = self._model(table)
+        columns = set(model.__table__.c.keys())
+        rows = [{k: v for k, v in row.items() if k in columns} for row in rows]
+        with Session(self.engine) as session:
+            checks = _FOREIGN_KEY_CHECKS.get(self.engine.dialect.name)
+            if checks:
+                session.execute(text(checks[0]))
+            try:
+                ids = [row['id'] for row in rows if row.get('id') is not None]
+                for start in range(0, len(ids), _LOAD_CHUNK):
+                    session.execute(delete(model).where(model.id.in_(ids[start:start + _LOAD_CHUNK]))
+                                    .execution_options(synchronize_session=False))
+                if rows:
+                    session.execute(insert(model), rows)
+                session.commit()
+            finally:
+                if checks:
+                    # SQLite 在事务内切换外键检查无效，先结束（失败时回滚）当前事务
+                    session.rollback()
+                    session.execute(text(checks[1]))
+        return len(rows)
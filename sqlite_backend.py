@@ -0,0 +1,282 @@
+"""SQLite 存储后端 - 在内嵌 SQLite 数据库上实现 execute_sql 的约定
+
+服务层发送的语句先由 sql_parser 解析，再按 SQLite 方言重新生成：
+命名参数 (:student_id 等) 直接作为预编译语句的参数绑定，IN :列表 展开成多个参数，
+LIKE 加上反斜杠转义。表结构和索引按 schema.sql 的字段建立。
+每个线程一个连接，数据库使用 WAL 日志模式，读写互不阻塞。
+"""
+import sqlite3
+import threading
+
+import sql_parser
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS students (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    student_id TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    class_name TEXT NOT NULL,
+    gender TEXT DEFAULT NULL,
+    age INTEGER DEFAULT NULL,
+    phone TEXT DEFAULT NULL,
+    email TEXT DEFAULT NULL,
+    address TEXT DEFAULT NULL,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_students_class_name ON students (class_name);
+CREATE INDEX IF NOT EXISTS idx_students_name ON students (name);
+
+CREATE TABLE IF NOT EXISTS grades (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    student_id TEXT NOT NULL REFERENCES students (student_id) ON DELETE CASCADE,
+    subject TEXT NOT NULL,
+    score REAL NOT NULL,
+    exam_type TEXT DEFAULT '期末考试',
+    exam_date TEXT DEFAULT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_grades_student_id ON grades (student_id);
+CREATE INDEX IF NOT EXISTS idx_grades_subject ON grades (subject);
+CREATE INDEX IF NOT EXISTS idx_grades_score ON grades (score);
+CREATE INDEX IF NOT EXISTS idx_grades_exam_type ON grades (exam_type);
+CREATE INDEX IF NOT EXISTS idx_grades_exam_date ON grades (exam_date);
+
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT NOT NULL UNIQUE,
+    password TEXT NOT NULL,
+    role TEXT DEFAULT 'user'
+);
+
+CREATE TABLE IF NOT EXISTS classes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS courses (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL UNIQUE,
+    credit REAL DEFAULT NULL
+);
+"""
+
+TABLES = ('students', 'grades', 'users', 'classes', 'courses')
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _literal(value):
+    if value is None:
+        return 'NULL'
+    if isinstance(value, (int, float)):
+        return repr(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+class _Renderer:
+    """把语句对象渲染成 SQLite 语句，同时收集要绑定的参数"""
+
+    def __init__(self, params, explain=False):
+        self.params = params or {}
+        self.explain = explain
+        self.bound = {}
+
+    def value(self, operand, placeholder=None):
+        """取参数值；EXPLAIN 时没有实参，用占位值"""
+        if self.explain and isinstance(operand, sql_parser.Param) and operand.name not in self.params:
+            return placeholder
+        return operand.bind(self.params)
+
+    def operand(self, operand):
+        if isinstance(operand, sql_parser.Param):
+            self.bound[operand.name] = self.value(operand)
+            return ':' + operand.name
+        return _literal(operand.value)
+
+    def condition(self, cond):
+        if isinstance(cond, sql_parser.Compare):
+            return f'{_quote(cond.column)} {cond.op} {self.operand(cond.operand)}'
+        if isinstance(cond, sql_parser.Like):
+            op = 'NOT LIKE' if cond.negated else 'LIKE'
+            return f"{_quote(cond.column)} {op} {self.operand(cond.operand)} ESCAPE '\\'"
+        if isinstance(cond, sql_parser.In):
+            if isinstance(cond.operands, sql_parser.Param):
+                values = self.value(cond.operands, [None])
+                base = cond.operands.name
+                names = []
+                for i, value in enumerate(values):
+                    name = f'{base}__{i}'
+                    self.bound[name] = value
+                    names.append(':' + name)
+            else:
+                names = [self.operand(o) for o in cond.operands]
+            if not names:
+                # 空列表：IN 恒假，NOT IN 恒真
+                return '1 = 1' if cond.negated else '1 = 0'
+            op = 'NOT IN' if cond.negated else 'IN'
+            return f"{_quote(cond.column)} {op} ({', '.join(names)})"
+        if isinstance(cond, sql_parser.IsNull):
+            return f"{_quote(cond.column)} IS {'NOT ' if cond.negated else ''}NULL"
+        if isinstance(cond, sql_parser.And):
+            return '(' + ' AND '.join(self.condition(c) for c in cond.items) + ')'
+        if isinstance(cond, sql_parser.Or):
+            return '(' + ' OR '.join(self.condition(c) for c in cond.items) + ')'
+        if isinstance(cond, sql_parser.Not):
+            return f'NOT ({self.condition(cond.item)})'
+        raise sql_parser.SQLSyntaxError(f'无法渲染的条件: {cond!r}')
+
+    def where(self, cond):
+        return f' WHERE {self.condition(cond)}' if cond is not None else ''
+
+    def select(self, stmt):
+        items = []
+        for item in stmt.items:
+            if item.kind == 'star':
+                items.append('*')
+            elif item.kind == 'agg':
+                column = _quote(item.column) if item.column else '*'
+                items.append(f'{item.func}({column}) AS {_quote(item.name)}')
+            else:
+                items.append(f'{_quote(item.column)} AS {_quote(item.name)}')
+        sql = f"SELECT {', '.join(items)} FROM {_quote(stmt.table)}{self.where(stmt.where)}"
+        if stmt.order_by:
+            sql += ' ORDER BY ' + ', '.join(
+                f"{_quote(column)}{' DESC' if desc else ''}" for column, desc in stmt.order_by)
+        if stmt.limit is not None:
+            sql += f' LIMIT {int(self.value(stmt.limit, 1))}'
+            if stmt.offset is not None:
+                sql += f' OFFSET {int(self.value(stmt.offset, 0))}'
+        elif stmt.offset is not None:
+            sql += f' LIMIT -1 OFFSET {int(self.value(stmt.offset, 0))}'
+        return sql
+
+    def insert(self, stmt):
+        row = stmt.row(self.params)
+        columns = list(row)
+        self.bound = {f'v{i}': row[c] for i, c in enumerate(columns)}
+        if not columns:
+            return f'INSERT INTO {_quote(stmt.table)} DEFAULT VALUES'
+        return (f"INSERT INTO {_quote(stmt.table)} ({', '.join(map(_quote, columns))}) "
+                f"VALUES ({', '.join(f':v{i}' for i in range(len(columns)))})")
+
+    def update(self, stmt):
+        sets = ', '.join(f'{_quote(column)} = {self.operand(operand)}'
+                         for column, operand in stmt.assignments)
+        return f'UPDATE {_quote(stmt.table)} SET {sets}{self.where(stmt.where)}'
+
+    def delete(self, stmt):
+        return f'DELETE FROM {_quote(stmt.table)}{self.where(stmt.where)}'
+
+
+def render(sql, params, explain=False):
+    """
+    把服务层的 SQL 转成 SQLite 语句
+    :param explain: 为 True 时允许缺少参数（用占位值渲染）
+    :return: (语句对象, SQLite 语句, 绑定参数)
+    """
+    stmt = sql_parser.parse(sql)
+    if stmt.table not in TABLES:
+        raise sql_parser.SQLSyntaxError(f'未知的表: {stmt.table}')
+    renderer = _Renderer(params, explain)
+    text = getattr(renderer, stmt.kind)(stmt)
+    return stmt, text, renderer.bound
+
+
+class SQLiteBackend:
+    """SQLite 后端，每个线程一个连接"""
+
+    # 违反外键 / 唯一约束时抛出的异常
+    integrity_errors = (sqlite3.IntegrityError,)
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    def connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # isolation_level=None: 单条语句自动提交，批量操作显式开启事务
+            conn = sqlite3.connect(self.path, isolation_level=None, timeout=30,
+                                   cached_statements=256)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA foreign_keys=ON')
+            self._local.conn = conn
+            with self._schema_lock:
+                if not self._schema_ready:
+                    conn.executescript(SCHEMA)
+                    self._schema_ready = True
+        return conn
+
+    def ensure_schema(self, defaults=None):
+        """
+        建表建索引（首次连接时自动执行）
+        :param defaults: {表名: [记录, ...]}，表为空时写入的初始数据
+        """
+        conn = self.connection()
+        for table, rows in (defaults or {}).items():
+            if not conn.execute(f'SELECT 1 FROM {_quote(table)} LIMIT 1').fetchone():
+                self.load_rows(table, rows)
+
+    def execute(self, sql, params=None):
+        stmt, text, bound = render(sql, params)
+        cursor = self.connection().execute(text, bound)
+        if stmt.kind == 'select':
+            return [dict(row) for row in cursor.fetchall()]
+        return cursor.rowcount
+
+    def execute_many(self, sql, params_list):
+        """同一条语句整批在一个事务里执行"""
+        conn = self.connection()
+        count = 0
+        conn.execute('BEGIN')
+        try:
+            for params in params_list:
+                _, text, bound = render(sql, params)
+                count += conn.execute(text, bound).rowcount
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+        return count
+
+    def explain(self, sql, params=None):
+        """SQLite 的 EXPLAIN QUERY PLAN"""
+        stmt, text, bound = render(sql, params, explain=True)
+        rows = self.connection().execute('EXPLAIN QUERY PLAN ' + text, bound).fetchall()
+        return {
+            'statement': stmt.kind.upper(),
+            'table': stmt.table,
+            'sql': text,
+            'plan': [row['detail'] for row in rows],
+        }
+
+    def load_rows(self, table, rows):
+        """
+        原样导入记录（保留 id），用于初始化数据或从 JSON 迁移
+        导入期间不检查外键，旧数据里可能有已删除学生的成绩
+        """
+        conn = self.connection()
+        conn.execute('PRAGMA foreign_keys=OFF')
+        conn.execute('BEGIN')
+        try:
+            columns = {r['name'] for r in conn.execute(f'PRAGMA table_info({_quote(table)})')}
+            for row in rows:
+                row = {k: v for k, v in row.items() if k in columns}
+                names = list(row)
+                conn.execute(
+                    f"INSERT OR REPLACE INTO {_quote(table)} ({', '.join(map(_quote, names))}) "
+                    f"VALUES ({', '.join('?' * len(names))})",
+                    [row[n] for n in names])
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.execute('PRAGMA foreign_keys=ON')
+        return len(rows)
+
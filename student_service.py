@@ -1,14 +1,127 @@
 """学生管理服务 - 构造 SQL 并调用模拟引擎"""
 import time
-from data_storage import execute_sql
+from data_storage import (IntegrityError, count_rows, execute_sql, execute_many, gpa_order, gpa_summary, recent_rows,
+                          scan, search)
+import pagination
 
+# 学生列表可以排序的字段（存储层对这些字段有有序索引）
+STUDENT_SORTS = ('student_id', 'name', 'class_name')
+# 修改学生时可以更新的字段，其他传入的字段忽略（字段名会拼进 SQL）
+STUDENT_UPDATE_FIELDS = ('student_id', 'name', 'class_name', 'gender', 'age', 'phone', 'email', 'address')
+# 按累计 GPA 排序（不是学生表的字段，按存储层 GPA 视图的顺序分页）
+GPA_SORT = 'gpa'
 
-def get_all_students():
-    """获取所有学生"""
+
+def get_all_students(page_size=None, cursor=None, sort=None):
+    """
+    获取所有学生
+    不传 page_size 时返回全部学生的列表；传入时只取一页，返回
+    {'items': 本页学生, 'next_cursor': 下一页游标}，下一页把 next_cursor 作为 cursor 传回
+    :param sort: 排序字段（见 STUDENT_SORTS，或 GPA_SORT），前面加 '-' 为降序，默认按学号
+    """
+    if page_size is not None:
+        return _page_students(None, {}, page_size, cursor, sort)
     sql = "SELECT * FROM students"
     return execute_sql(sql)
 
 
+def _page_students(where, params, page_size, cursor, sort, keyword=None):
+    """按 sort 键集分页取一页学生"""
+    column, desc = pagination.parse_sort(sort, STUDENT_SORTS + (GPA_SORT,), 'student_id')
+    page_size = pagination.clamp_page_size(page_size)
+    if column == GPA_SORT:
+        return _page_students_by_gpa(keyword, desc, pagination.decode_cursor(cursor), page_size)
+    sql = pagination.keyset_query("SELECT * FROM students", column, desc,
+                                  pagination.decode_cursor(cursor), params, where)
+    params['limit'] = page_size + 1
+    return pagination.page(execute_sql(sql, params), column, page_size)
+
+
+def _page_students_by_gpa(keyword, desc, cursor, page_size):
+    """
+    按累计 GPA 分页：有 GPA 的学生按 (GPA, 学号) 排在前面，没有 GPA 的按 id 排在最后
+    游标是最后一行的 (GPA, 学号)，进入没有 GPA 的部分后是 (None, id)
+    """
+    if keyword:
+        # 搜索结果不多，取全部匹配的学生在内存中排序
+        students = search('students', keyword)
+        gpas = gpa_summary('grades', [s['student_id'] for s in students])
+        ranked = sorted((dict(s, gpa=gpas[s['student_id']]['gpa']) for s in students if s['student_id'] in gpas),
+                        key=lambda s: (s['gpa'], s['student_id']), reverse=desc)
+        rest = sorted((dict(s, gpa=None) for s in students if s['student_id'] not in gpas),
+                      key=lambda s: s['id'])
+        rows = [s for s in ranked + rest if _after_gpa_cursor(s, cursor, desc)][:page_size + 1]
+        return _gpa_page(rows, page_size)
+
+    rows = []
+    if cursor is None or cursor[0] is not None:
+        # 有 GPA 的部分：按视图的顺序取学号，再按学号取学生（视图中可能有已删除学生的学号）
+        after = cursor
+        while len(rows) <= page_size:
+            keys = gpa_order('grades', after, page_size + 1 - len(rows), desc)
+            if not keys:
+                break
+            found = {s['student_id']: s for s in execute_sql(
+                "SELECT * FROM students WHERE student_id IN :ids", {'ids': [sid for _, sid in keys]})}
+            rows += [dict(found[sid], gpa=gpa) for gpa, sid in keys if sid in found]
+            after = keys[-1]
+        cursor = None
+    # 没有 GPA 的部分：按 id 分批读取，跳过有 GPA 的学生
+    after_id = cursor[1] if cursor is not None else None
+    while len(rows) <= page_size:
+        params = {'limit': page_size + 1}
+        sql = pagination.keyset_query("SELECT * FROM students", 'id', False,
+                                      None if after_id is None else (None, after_id), params)
+        batch = execute_sql(sql, params)
+        if not batch:
+            break
+        has_gpa = gpa_summary('grades', [s['student_id'] for s in batch])
+        rows += [dict(s, gpa=None) for s in batch if s['student_id'] not in has_gpa]
+        after_id = batch[-1]['id']
+        if len(batch) <= page_size:
+            break
+    return _gpa_page(rows, page_size)
+
+
+def _after_gpa_cursor(student, cursor, desc):
+    """student 是否排在游标之后（排序规则见 _page_students_by_gpa）"""
+    if cursor is None:
+        return True
+    value, key = cursor
+    if value is None:
+        return student['gpa'] is None and student['id'] > key
+    if student['gpa'] is None:
+        return True
+    position = (student['gpa'], student['student_id'])
+    return position < (value, key) if desc else position > (value, key)
+
+
+def _gpa_page(rows, page_size):
+    has_next = len(rows) > page_size
+    rows = rows[:page_size]
+    next_cursor = None
+    if has_next:
+        last = rows[-1]
+        key = last['student_id'] if last['gpa'] is not None else last['id']
+        next_cursor = pagination.encode_cursor({'gpa': last['gpa'], 'id': key}, GPA_SORT)
+    return {'items': rows, 'next_cursor': next_cursor}
+
+
+def iter_students(columns=None):
+    """逐个遍历学生（导出等场景使用，不一次性载入全部学生）"""
+    return scan('students', columns=columns)
+
+
+def count_students():
+    """学生总数（取存储层的行数，不逐行计数）"""
+    return count_rows('students')['students']
+
+
+def get_recent_students(limit=5):
+    """最近添加的学生（按添加时间 created_at 从新到旧，存储层维护最新的若干个）"""
+    return recent_rows('students', limit)
+
+
 def get_student_by_id(student_id):
     """根据学号获取学生"""
     sql = "SELECT * FROM students WHERE student_id = :student_id"
@@ -17,12 +130,7 @@ def get_student_by_id(student_id):
 
 
 def add_student(student_data):
-    """添加学生"""
-    # 检查是否存在
-    existing = get_student_by_id(student_data['student_id'])
-    if existing:
-        return {'success': False, 'message': '学号已存在'}
-    
+    """添加学生（学号是否重复由存储层的唯一约束在写锁内检查）"""
     # 验证必填字段
     required_fields = ['student_id', 'name', 'class_name']
     for field in required_fields:
@@ -39,30 +147,88 @@ def add_student(student_data):
     params = student_data.copy()
     params['created_at'] = time.strftime('%Y-%m-%dT%H:%M:%S')
     
-    execute_sql(sql, params)
+    try:
+        execute_sql(sql, params)
+    except IntegrityError:
+        return {'success': False, 'message': '学号已存在'}
     return {'success': True, 'message': '添加成功'}
 
 
+def add_students_bulk(students_data):
+    """
+    批量添加学生
+    整批校验通过后才写入，且只写一次；任何一条不合法则整批不写入
+    :param students_data: 学生字典列表
+    :return: 结果字典，失败时 errors 列出每条错误
+    """
+    if not students_data:
+        return {'success': True, 'message': '成功添加 0 名学生', 'count': 0}
+    errors = []
+    seen = set()
+    required_fields = ['student_id', 'name', 'class_name']
+    for i, student_data in enumerate(students_data, 1):
+        for field in required_fields:
+            if field not in student_data or not student_data[field]:
+                errors.append(f'第 {i} 条: 缺少必填字段: {field}')
+                break
+        student_id = student_data.get('student_id')
+        if student_id in seen:
+            errors.append(f'第 {i} 条: 学号在本批中重复')
+        seen.add(student_id)
+
+    # 一次查询检查学号是否已存在
+    sql = "SELECT * FROM students WHERE student_id IN :student_ids"
+    existing = {s['student_id'] for s in execute_sql(sql, {'student_ids': list(seen)})}
+    for i, student_data in enumerate(students_data, 1):
+        if student_data.get('student_id') in existing:
+            errors.append(f'第 {i} 条: 学号已存在')
+
+    if errors:
+        return {'success': False, 'message': errors[0], 'errors': errors}
+
+    sql = """
+    INSERT INTO students (student_id, name, class_name, gender, age, phone, email, address, created_at)
+    VALUES (:student_id, :name, :class_name, :gender, :age, :phone, :email, :address, :created_at)
+    """
+    created_at = time.strftime('%Y-%m-%dT%H:%M:%S')
+    params_list = []
+    for student_data in students_data:
+        params = student_data.copy()
+        params['created_at'] = created_at
+        params_list.append(params)
+
+    try:
+        count = execute_many(sql, params_list)
+    except IntegrityError:
+        # 校验之后其他请求添加了同一学号
+        return {'success': False, 'message': '学号已存在', 'errors': ['学号已存在']}
+    return {'success': True, 'message': f'成功添加 {count} 名学生', 'count': count}
+
+
 def update_student(student_id, student_data):
     """更新学生信息"""
     existing = get_student_by_id(student_id)
     if not existing:
         return {'success': False, 'message': '学生不存在'}
         
-    sql = "UPDATE students SET name=:name, class_name=:class_name, ... WHERE student_id=:student_id"
+    # 只更新传入的、允许修改的字段
+    student_data = {field: value for field, value in student_data.items() if field in STUDENT_UPDATE_FIELDS}
+    if not student_data:
+        return {'success': False, 'message': '没有可更新的字段'}
+    assignments = ', '.join(f'{field} = :{field}' for field in student_data)
+    sql = f"UPDATE students SET {assignments} WHERE student_id = :where_student_id"
     
-    # 传递给模拟器的参数
-    params = {
-        'where_student_id': student_id,
-        'update_data': student_data
-    }
+    params = dict(student_data, where_student_id=student_id)
     
-    execute_sql(sql, params)
+    try:
+        execute_sql(sql, params)
+    except IntegrityError as e:
+        return {'success': False, 'message': f'更新失败: {e}'}
     return {'success': True, 'message': '更新成功'}
 
 
 def delete_student(student_id):
-    """删除学生"""
+    """删除学生（该学生的成绩由存储层级联删除）"""
     sql = "DELETE FROM students WHERE student_id = :student_id"
     count = execute_sql(sql, {'student_id': student_id})
     
@@ -71,15 +237,22 @@ def delete_student(student_id):
     else:
         return {'success': False, 'message': '学生不存在'}
 
-def search_students(keyword):
-    """搜索学生（按姓名或学号）"""
-    all_students = get_all_students()
+def search_students(keyword, page_size=None, cursor=None, sort=None, limit=None):
+    """
+    搜索学生：姓名包含关键字，或学号以关键字开头（不区分大小写）
+    传入 page_size 时按 sort 分页，参数同 get_all_students；
+    否则按匹配程度排序（完全相同 > 开头相同 > 包含），limit 为最多返回的条数
+    """
     if not keyword:
-        return all_students
-    
-    keyword = keyword.lower()
-    return [
-        s for s in all_students 
-        if keyword in s['name'].lower() or keyword in s['student_id'].lower()
-    ]
+        if page_size is None:
+            students = get_all_students()
+            return students[:limit] if limit is not None else students
+        return get_all_students(page_size, cursor, sort)
 
+    if page_size is None:
+        return search('students', keyword, limit)
+    # 转义关键字里的通配符；存储层用搜索索引取候选行，不逐行匹配
+    pattern = keyword.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    where = "name LIKE :contains OR student_id LIKE :prefix"
+    params = {'contains': f'%{pattern}%', 'prefix': f'{pattern}%'}
+    return _page_students(where, params, page_size, cursor, sort, keyword)
@@ -0,0 +1,96 @@
+"""测试公共部分：每个测试在临时数据目录上重新导入存储层和服务层"""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+# 持有存储层状态（缓存、锁、后端连接）或从 data_storage 导入了函数的模块，每个测试重新导入
+APP_MODULES = ('data_storage', 'student_service', 'grade_service', 'school_service', 'user_service',
+               'analytics', 'sqlite_backend', 'sqlalchemy_backend', 'models', 'app')
+
+
+def _purge():
+    for name in APP_MODULES:
+        sys.modules.pop(name, None)
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    """使用临时目录的 JSON 存储，返回重新导入的 data_storage 模块"""
+    monkeypatch.setenv('SMS_DATA_DIR', str(tmp_path / 'data'))
+    _purge()
+    import query_log
+    monkeypatch.setattr(query_log, 'LOG_LEVEL', 'OFF')
+    import data_storage
+    data_storage.ensure_data_files()
+    yield data_storage
+    if data_storage.WRITE_BEHIND:
+        data_storage.flush_writes()
+    _purge()
+
+
+@pytest.fixture(params=['json', 'sqlite', 'sqlalchemy'])
+def backend_storage(request, storage, tmp_path):
+    """同一套测试分别在三种存储后端上运行（SQLAlchemy 连接临时 SQLite 文件）"""
+    if request.param == 'sqlite':
+        storage.STORAGE_BACKEND = 'sqlite'
+        storage.SQLITE_PATH = str(tmp_path / 'school.db')
+    elif request.param == 'sqlalchemy':
+        pytest.importorskip('sqlalchemy')
+        storage.STORAGE_BACKEND = 'sqlalchemy'
+        storage.SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'sa.db'}"
+    storage.ensure_data_files()
+    return storage
+
+
+def add_students(storage, count, classes=('一班', '二班', '三班')):
+    """插入 count 个学生 S0000, S0001, ...，返回学号列表"""
+    rows = [{'student_id': f'S{i:04d}', 'name': f'学生{i}', 'class_name': classes[i % len(classes)],
+             'created_at': f'2025-01-01T00:00:{i % 60:02d}'} for i in range(count)]
+    storage.execute_many(
+        "INSERT INTO students (student_id, name, class_name, created_at) "
+        "VALUES (:student_id, :name, :class_name, :created_at)", rows)
+    return [row['student_id'] for row in rows]
+
+
+def all_rows(storage, table):
+    return storage.execute_sql(f"SELECT * FROM {table}")
+
+
+# 默认课程（见 DEFAULT_DATA），成绩的科目从中选
+SUBJECTS = ('Python程序设计', '数据结构', '高等数学')
+EXAM_TYPES = ('期中考试', '期末考试')
+EXAM_DATES = ('2024-11-10', '2025-01-10', '2025-06-20')
+
+
+def add_grades(storage, rnd, student_ids, count):
+    """随机插入 count 条成绩（整数和一位小数的分数都有）"""
+    rows = [{'student_id': rnd.choice(student_ids), 'subject': rnd.choice(SUBJECTS),
+             'score': rnd.choice((rnd.randint(0, 100), round(rnd.uniform(0, 100), 1))),
+             'exam_type': rnd.choice(EXAM_TYPES), 'exam_date': rnd.choice(EXAM_DATES)}
+            for _ in range(count)]
+    storage.execute_many(
+        "INSERT INTO grades (student_id, subject, score, exam_type, exam_date) "
+        "VALUES (:student_id, :subject, :score, :exam_type, :exam_date)", rows)
+
+
+def change_grades(storage, rnd):
+    """一轮随机修改：改分数、改科目和考试、删成绩、学生换班、删学生（级联删除成绩）"""
+    grades = all_rows(storage, 'grades')
+    for grade in rnd.sample(grades, min(10, len(grades))):
+        storage.execute_sql("UPDATE grades SET score = :score WHERE id = :id",
+                            {'score': rnd.randint(0, 100), 'id': grade['id']})
+    for grade in rnd.sample(grades, min(5, len(grades))):
+        storage.execute_sql("UPDATE grades SET subject = :subject, exam_type = :exam_type WHERE id = :id",
+                            {'subject': rnd.choice(SUBJECTS), 'exam_type': rnd.choice(EXAM_TYPES), 'id': grade['id']})
+    storage.execute_sql("DELETE FROM grades WHERE id IN :ids",
+                        {'ids': [g['id'] for g in rnd.sample(grades, min(5, len(grades)))]})
+    students = all_rows(storage, 'students')
+    for student in rnd.sample(students, min(3, len(students))):
+        storage.execute_sql("UPDATE students SET class_name = :c WHERE id = :id",
+                            {'c': rnd.choice(('一班', '二班', '三班')), 'id': student['id']})
+    storage.execute_sql("DELETE FROM students WHERE id = :id", {'id': rnd.choice(students)['id']})
@@ -0,0 +1,63 @@
+"""分组聚合：增删改、学生换班和删除之后，summarize 与按记录直接计算的一致"""
+import os
+import random
+
+import pytest
+
+from conftest import add_grades, add_students, all_rows, change_grades
+
+
+def _recompute(rows, below=60):
+    scores = [r['score'] for r in rows]
+    return {
+        'count': len(scores),
+        'sum': pytest.approx(sum(scores)),
+        'sum_squares': pytest.approx(sum(s * s for s in scores)),
+        'min': min(scores, default=None),
+        'max': max(scores, default=None),
+        'below': sum(s < below for s in scores),
+    }
+
+
+def _check(storage):
+    grades = all_rows(storage, 'grades')
+    classes = {s['student_id']: s['class_name'] for s in all_rows(storage, 'students')}
+    assert storage.summarize('grades', below=60) == _recompute(grades)
+    groups = {
+        'student_id': lambda g: g['student_id'],
+        'subject': lambda g: g['subject'],
+        'class_name': lambda g: classes.get(g['student_id']),
+    }
+    for group, key in groups.items():
+        values = {key(g) for g in grades} | {'不存在'}
+        for value in values:
+            expected = _recompute([g for g in grades if key(g) == value])
+            assert storage.summarize('grades', group, value, below=60) == expected, (group, value)
+
+
+def test_aggregates_follow_writes(backend_storage):
+    storage = backend_storage
+    rnd = random.Random(7)
+    student_ids = add_students(storage, 15)
+    add_grades(storage, rnd, student_ids, 120)
+    _check(storage)
+    for _ in range(3):
+        change_grades(storage, rnd)
+        _check(storage)
+
+
+def test_aggregates_after_reload(storage):
+    rnd = random.Random(8)
+    storage.WAL_COMPACT_THRESHOLD = 50
+    student_ids = add_students(storage, 10)
+    add_grades(storage, rnd, student_ids, 80)
+    change_grades(storage, rnd)
+    # 合并时写出的聚合文件加上之后的日志
+    assert storage.get_cache_stats()['compactions'] > 0
+    assert os.path.exists(storage._aggregate_path(storage.GRADES_FILE))
+    change_grades(storage, rnd)
+    storage.clear_cache()
+    _check(storage)
+    storage.compact_all()
+    storage.clear_cache()
+    _check(storage)
@@ -0,0 +1,56 @@
+"""成绩分析报表：NumPy 和纯 Python 两种算法结果相同，与按记录直接计算的一致"""
+import random
+import statistics
+from fractions import Fraction
+
+import pytest
+
+from conftest import SUBJECTS, add_students, all_rows
+
+
+def _report(analytics, np):
+    analytics.np = np
+    analytics._cache.update(key=None, report=None)
+    return analytics.get_report()
+
+
+def _rounded(value):
+    """精确值四舍五入到两位小数"""
+    return int((value * 100 + Fraction(1, 2)) // 1) / 100
+
+
+def _check(stats, scores, analytics):
+    exact = sorted(Fraction(str(s)) for s in scores)
+    assert stats['count'] == len(scores)
+    assert stats['average'] == pytest.approx(statistics.fmean(scores), abs=0.0051)
+    assert stats['std'] == pytest.approx(statistics.pstdev(scores), abs=0.0051)
+    assert (stats['min'], stats['max']) == (min(scores), max(scores))
+    # inclusive 与 np.percentile 的默认线性插值相同
+    quantiles = statistics.quantiles(exact, n=100, method='inclusive')
+    assert stats['percentiles'] == {f'p{p}': _rounded(quantiles[p - 1]) for p in analytics.PERCENTILES}
+    assert stats['median'] == _rounded(statistics.median(exact))
+    assert stats['pass_rate'] == round(sum(s >= 60 for s in scores) * 100 / len(scores), 1)
+
+
+def test_report_same_with_and_without_numpy(storage):
+    np = pytest.importorskip('numpy')
+    import analytics
+    rnd = random.Random(21)
+    student_ids = add_students(storage, 30)
+    rows = [{'student_id': rnd.choice(student_ids), 'subject': rnd.choice(SUBJECTS),
+             'score': rnd.choice((rnd.randint(0, 100), round(rnd.uniform(0, 100), 2), round(rnd.uniform(50, 60), 1)))}
+            for _ in range(400)]
+    storage.execute_many("INSERT INTO grades (student_id, subject, score) VALUES (:student_id, :subject, :score)",
+                         rows)
+
+    with_numpy = _report(analytics, np)
+    without_numpy = _report(analytics, None)
+    assert with_numpy == without_numpy
+
+    grades = all_rows(storage, 'grades')
+    classes = {s['student_id']: s['class_name'] for s in all_rows(storage, 'students')}
+    _check(with_numpy['overall'], [g['score'] for g in grades], analytics)
+    for stats in with_numpy['subjects']:
+        _check(stats, [g['score'] for g in grades if g['subject'] == stats['name']], analytics)
+    for stats in with_numpy['classes']:
+        _check(stats, [g['score'] for g in grades if classes[g['student_id']] == stats['name']], analytics)
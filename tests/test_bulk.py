@@ -0,0 +1,71 @@
+"""批量添加：整批校验，有一条不合法整批不写入；成功时一次写入，id 连续；空列表不查询"""
+import pytest
+
+from conftest import add_students, all_rows
+
+
+@pytest.fixture
+def services(backend_storage):
+    import grade_service
+    import student_service
+    return backend_storage, grade_service, student_service
+
+
+def _grade(student_id, score=80, subject='数据结构'):
+    return {'student_id': student_id, 'subject': subject, 'score': score,
+            'exam_type': '期末考试', 'exam_date': '2025-01-10'}
+
+
+def _student(student_id):
+    return {'student_id': student_id, 'name': f'学生{student_id}', 'class_name': '一班'}
+
+
+def _queries(storage, monkeypatch):
+    recorded = []
+    monkeypatch.setattr(storage.query_log, 'record', lambda sql, *args, **kwargs: recorded.append(sql))
+    return recorded
+
+
+def test_add_grades_bulk_all_or_nothing(services):
+    storage, grade_service, _ = services
+    student_ids = add_students(storage, 5)
+    grade_service.add_grade(_grade(student_ids[0]))
+
+    for batch, position in (
+            ([_grade(s) for s in student_ids[:3]] + [_grade(student_ids[3], score=101)], 4),
+            ([_grade(student_ids[0]), _grade('不存在'), _grade(student_ids[1])], 2),
+            ([_grade(student_ids[0]), {'student_id': student_ids[1], 'score': 70}], 2)):
+        result = grade_service.add_grades_bulk(batch)
+        assert not result['success'] and result['errors'][0].startswith(f'第 {position} 条')
+        assert len(all_rows(storage, 'grades')) == 1
+
+    result = grade_service.add_grades_bulk([_grade(s, score) for s, score in zip(student_ids, (60, 70.5, 80, 0, 100))])
+    assert result['success'] and result['count'] == 5
+    ids = sorted(g['id'] for g in all_rows(storage, 'grades'))
+    assert ids == list(range(ids[0], ids[0] + 6))
+
+
+def test_add_students_bulk_all_or_nothing(services):
+    storage, _, student_service = services
+    add_students(storage, 2)
+
+    for batch, message in (
+            ([_student('N1'), _student('N2'), _student('N1')], '第 3 条: 学号在本批中重复'),
+            ([_student('N1'), _student('S0001')], '第 2 条: 学号已存在'),
+            ([_student('N1'), {'student_id': 'N2', 'name': '缺班级'}], '第 2 条: 缺少必填字段: class_name')):
+        result = student_service.add_students_bulk(batch)
+        assert not result['success'] and result['errors'] == [message]
+        assert len(all_rows(storage, 'students')) == 2
+
+    result = student_service.add_students_bulk([_student(f'N{i}') for i in range(10)])
+    assert result['success'] and result['count'] == 10
+    ids = [s['id'] for s in sorted(all_rows(storage, 'students'), key=lambda s: s['student_id'])]
+    assert ids[:10] == list(range(ids[0], ids[0] + 10)) and sorted(ids[10:]) == [1, 2]
+
+
+def test_empty_batches_do_not_query(services, monkeypatch):
+    storage, grade_service, student_service = services
+    recorded = _queries(storage, monkeypatch)
+    assert grade_service.add_grades_bulk([]) == {'success': True, 'message': '成功添加 0 条成绩', 'count': 0}
+    assert student_service.add_students_bulk([]) == {'success': True, 'message': '成功添加 0 名学生', 'count': 0}
+    assert recorded == []
@@ -0,0 +1,72 @@
+"""缓存失效：文件签名 (mtime, size, inode) 不变时命中缓存，其他进程写入或直接改写快照后下一次读取即可看到"""
+import json
+import os
+import subprocess
+import sys
+
+from conftest import ROOT, add_students, all_rows
+
+_INSERT = """
+import query_log
+query_log.LOG_LEVEL = 'OFF'
+import data_storage
+data_storage.execute_sql("INSERT INTO students (student_id, name, class_name) VALUES ('P1', '另一个进程', '一班')")
+"""
+
+
+def _names(storage):
+    return sorted(s['name'] for s in all_rows(storage, 'students'))
+
+
+def _rewrite(path, rows, keep_stat=None):
+    """改写快照；keep_stat 时恢复原来的 mtime（大小也相同时只有 inode 不同）"""
+    tmp = path + '.new'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(rows, f, ensure_ascii=False)
+    if keep_stat is not None:
+        os.utime(tmp, ns=(keep_stat.st_atime_ns, keep_stat.st_mtime_ns))
+    os.replace(tmp, path)
+
+
+def test_unchanged_files_hit_cache(storage):
+    add_students(storage, 3)
+    all_rows(storage, 'students')
+    before = storage.get_cache_stats()
+    for _ in range(5):
+        all_rows(storage, 'students')
+    after = storage.get_cache_stats()
+    assert after['hits'] - before['hits'] == 5
+    assert (after['misses'], after['wal_replays']) == (before['misses'], before['wal_replays'])
+
+
+def test_other_process_writes_are_read(storage):
+    add_students(storage, 3)
+    assert '另一个进程' not in _names(storage)
+    subprocess.run([sys.executable, '-c', _INSERT], cwd=ROOT, env=dict(os.environ), check=True)
+    before = storage.get_cache_stats()
+    assert '另一个进程' in _names(storage)
+    # 只重放对方追加的日志，不重新加载快照
+    after = storage.get_cache_stats()
+    assert after['wal_replays'] == before['wal_replays'] + 1 and after['misses'] == before['misses']
+
+
+def test_direct_snapshot_rewrite_is_read(storage):
+    storage.compact_table(storage.STUDENTS_FILE)
+    rows = [{'id': 1, 'student_id': 'S1', 'name': '甲', 'class_name': '一班'}]
+    _rewrite(storage.STUDENTS_FILE, rows)
+    assert _names(storage) == ['甲']
+
+    # 原地改写，大小不变：mtime 变化（文件系统的时间精度可能较粗，显式往后推 1 毫秒）
+    stat = os.stat(storage.STUDENTS_FILE)
+    with open(storage.STUDENTS_FILE, 'r+', encoding='utf-8') as f:
+        text = f.read()
+        f.seek(0)
+        f.write(text.replace('甲', '乙'))
+    os.utime(storage.STUDENTS_FILE, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert _names(storage) == ['乙']
+
+    # 大小和 mtime 都不变的替换：inode 变化
+    stat = os.stat(storage.STUDENTS_FILE)
+    _rewrite(storage.STUDENTS_FILE, [dict(rows[0], name='丙')], keep_stat=stat)
+    assert os.stat(storage.STUDENTS_FILE).st_size == stat.st_size
+    assert _names(storage) == ['丙']
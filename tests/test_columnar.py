@@ -0,0 +1,43 @@
+"""列式成绩表：查询和统计的结果与行记录完全一致，表示不了的记录退回行记录"""
+import pytest
+
+import columnar
+
+
+def _rows(storage, scores):
+    storage.execute_sql("INSERT INTO students (student_id, name, class_name) VALUES ('S0', '张三', '一班')")
+    storage.execute_many(
+        "INSERT INTO grades (student_id, subject, score, exam_type, exam_date) "
+        "VALUES ('S0', '数学', :score, '期末考试', '2025-01-10')", [{'score': s} for s in scores])
+
+
+@pytest.fixture
+def columnar_storage(storage):
+    storage.COLUMNAR_GRADES = True
+    return storage
+
+
+def test_exact_scores_use_columns(columnar_storage):
+    storage = columnar_storage
+    _rows(storage, [95, 62.5, 70.3, 0, 100])
+    assert storage.get_grade_columns() is not None
+    rows = storage.execute_sql("SELECT * FROM grades")
+    assert [r['score'] for r in rows] == [95, 62.5, 70.3, 0, 100]
+    assert all(type(r['score']) is int for r in rows if r['score'] in (95, 0, 100))
+    stats = storage.execute_sql("SELECT COUNT(*) AS n, SUM(score) AS s, MIN(score) AS lo FROM grades")[0]
+    assert stats == {'n': 5, 's': pytest.approx(327.8), 'lo': 0}
+
+
+def test_inexact_score_keeps_rows(columnar_storage):
+    storage = columnar_storage
+    _rows(storage, [59.555, 80])
+    assert storage.get_grade_columns() is None
+    assert [r['score'] for r in storage.execute_sql("SELECT * FROM grades")] == [59.555, 80]
+    assert storage.execute_sql("SELECT MIN(score) AS lo FROM grades")[0]['lo'] == 59.555
+
+
+def test_missing_fields_are_not_invented():
+    rows = [{'id': 1, 'student_id': 'S0', 'subject': '数学', 'score': 90}]
+    assert columnar.GradeColumns.from_rows(rows) is None
+    full = [dict(rows[0], exam_type=None, exam_date='2025-01-10')]
+    assert list(columnar.GradeColumns.from_rows(full).rows()) == full
@@ -0,0 +1,53 @@
+"""仪表盘摘要：行数、最近添加的学生在各存储后端上与按记录直接计算的一致"""
+from conftest import add_students, all_rows
+
+
+def _newest(storage, limit):
+    rows = all_rows(storage, 'students')
+    rows.sort(key=lambda r: (r.get('created_at') is not None, r.get('created_at'), r['id']), reverse=True)
+    return [row['student_id'] for row in rows[:limit]]
+
+
+def test_count_rows(backend_storage):
+    storage = backend_storage
+    add_students(storage, 12)
+    storage.execute_sql("DELETE FROM students WHERE student_id = :s", {'s': 'S0003'})
+    counts = storage.count_rows('students', 'classes', 'courses', 'grades')
+    assert counts == {table: len(all_rows(storage, table)) for table in counts}
+    assert counts['students'] == 11
+
+
+def test_recent_rows_follow_writes(backend_storage):
+    storage = backend_storage
+    storage.RECENT_ROWS[storage.STUDENTS_FILE] = ('created_at', 4)
+    add_students(storage, 10)
+    assert [r['student_id'] for r in storage.recent_rows('students', 3)] == _newest(storage, 3)
+    # 删除最新的几个，缓冲区不够时从整表补齐
+    for student_id in _newest(storage, 3):
+        storage.execute_sql("DELETE FROM students WHERE student_id = :s", {'s': student_id})
+    assert [r['student_id'] for r in storage.recent_rows('students', 3)] == _newest(storage, 3)
+    # 比缓冲区里都旧的插入不进入缓冲区，时间更新的排到最前
+    storage.execute_sql("INSERT INTO students (student_id, name, class_name, created_at) "
+                        "VALUES ('OLD', '旧', '一班', '2000-01-01T00:00:00')")
+    storage.execute_sql("INSERT INTO students (student_id, name, class_name, created_at) "
+                        "VALUES ('NEW', '新', '一班', '2030-01-01T00:00:00')")
+    storage.execute_sql("UPDATE students SET created_at = NULL WHERE student_id = 'S0001'")
+    for limit in (1, 4, 6, 20):
+        assert [r['student_id'] for r in storage.recent_rows('students', limit)] == _newest(storage, limit)
+
+
+def test_dashboard_summary(backend_storage):
+    storage = backend_storage
+    import school_service
+    add_students(storage, 5)
+    storage.execute_many(
+        "INSERT INTO grades (student_id, subject, score, exam_type, exam_date) "
+        "VALUES (:student_id, '数学', :score, '期末考试', '2025-01-10')",
+        [{'student_id': f'S{i % 5:04d}', 'score': score} for i, score in enumerate((30, 59.5, 60, 75, 91))])
+    summary = school_service.get_dashboard_summary(recent=2)
+    assert summary['student_count'] == 5
+    assert summary['grade_count'] == 5
+    assert summary['class_count'] == len(all_rows(storage, 'classes'))
+    assert summary['course_count'] == len(all_rows(storage, 'courses'))
+    assert summary['failed_count'] == 2
+    assert [r['student_id'] for r in summary['recent_students']] == _newest(storage, 2)
@@ -0,0 +1,69 @@
+"""外键：成绩的学号必须存在，删除学生级联删除成绩，结果与按记录直接计算的一致"""
+import pytest
+
+from conftest import add_students, all_rows
+
+
+def _add_grades(storage, student_ids, per_student=3):
+    storage.execute_many(
+        "INSERT INTO grades (student_id, subject, score, exam_type, exam_date) "
+        "VALUES (:student_id, :subject, :score, '期末考试', '2025-01-10')",
+        [{'student_id': s, 'subject': f'科目{k}', 'score': 50 + k * 10}
+         for s in student_ids for k in range(per_student)])
+
+
+def _grade_students(storage):
+    return sorted(g['student_id'] for g in all_rows(storage, 'grades'))
+
+
+def test_insert_requires_student(backend_storage):
+    storage = backend_storage
+    add_students(storage, 2)
+    with pytest.raises(storage.IntegrityError):
+        storage.execute_sql("INSERT INTO grades (student_id, subject, score) VALUES ('NOPE', '数学', 80)")
+    with pytest.raises(storage.IntegrityError):
+        _add_grades(storage, ['S0000', 'NOPE'])
+    assert all_rows(storage, 'grades') == []
+    _add_grades(storage, ['S0000'])
+    with pytest.raises(storage.IntegrityError):
+        storage.execute_sql("UPDATE grades SET student_id = 'NOPE' WHERE student_id = 'S0000'")
+    assert _grade_students(storage) == ['S0000'] * 3
+
+
+def test_delete_cascades_to_grades(backend_storage):
+    storage = backend_storage
+    student_ids = add_students(storage, 10)
+    _add_grades(storage, student_ids)
+    deleted = student_ids[::3]
+    count = storage.execute_sql("DELETE FROM students WHERE student_id IN :ids", {'ids': deleted})
+    assert count == len(deleted)
+    remaining = [s for s in student_ids if s not in deleted]
+    assert sorted({r['student_id'] for r in all_rows(storage, 'students')}) == remaining
+    assert _grade_students(storage) == sorted(remaining * 3)
+    # 删除全部学生后不留孤立的成绩
+    storage.execute_sql("DELETE FROM students")
+    assert all_rows(storage, 'grades') == []
+
+
+def test_referenced_student_id_cannot_change(backend_storage):
+    storage = backend_storage
+    add_students(storage, 2)
+    _add_grades(storage, ['S0000'])
+    with pytest.raises(storage.IntegrityError):
+        storage.execute_sql("UPDATE students SET student_id = 'S9' WHERE student_id = 'S0000'")
+    # 没有成绩的学生可以改学号
+    assert storage.execute_sql("UPDATE students SET student_id = 'S9' WHERE student_id = 'S0001'") == 1
+    assert _grade_students(storage) == ['S0000'] * 3
+
+
+def test_cascade_survives_reload(storage):
+    student_ids = add_students(storage, 6)
+    _add_grades(storage, student_ids, per_student=2)
+    storage.execute_sql("DELETE FROM students WHERE class_name = '一班'")
+    expected = _grade_students(storage)
+    assert expected and '一班' not in {r['class_name'] for r in all_rows(storage, 'students')}
+    storage.clear_cache()
+    assert _grade_students(storage) == expected
+    storage.compact_all()
+    storage.clear_cache()
+    assert _grade_students(storage) == expected
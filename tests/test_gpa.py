@@ -0,0 +1,100 @@
+"""学分绩点视图：成绩和课程学分变化之后，GPA 与按记录直接计算的一致"""
+import os
+import random
+
+import pytest
+
+import gpa
+from conftest import add_grades, add_students, all_rows, change_grades
+
+
+def _recompute(storage):
+    """学号 -> {学期: [学分和, 学分×绩点之和, 学分×分数之和]}"""
+    credits = {c['name']: c['credit'] for c in all_rows(storage, 'courses')
+               if isinstance(c.get('credit'), (int, float)) and c['credit'] > 0}
+    sums = {}
+    for grade in all_rows(storage, 'grades'):
+        credit = credits.get(grade['subject'])
+        if credit is None or grade['exam_type'] not in storage.GPA_EXAM_TYPES:
+            continue
+        term = storage._term_of(grade['exam_date'])
+        values = sums.setdefault(grade['student_id'], {}).setdefault(term, [0, 0, 0])
+        values[0] += credit
+        values[1] += credit * gpa.grade_point(grade['score'], storage.GPA_SCALE)
+        values[2] += credit * grade['score']
+    return sums
+
+
+def _summary(values):
+    credits, points, scores = values
+    return {'gpa': pytest.approx(points / credits, abs=0.006),
+            'average': pytest.approx(scores / credits, abs=0.006),
+            'credits': pytest.approx(credits)}
+
+
+def _check(storage):
+    sums = _recompute(storage)
+    students = [s['student_id'] for s in all_rows(storage, 'students')] + ['不存在']
+    expected = {}
+    for student, terms in sums.items():
+        total = [sum(values) for values in zip(*terms.values())]
+        expected[student] = dict(_summary(total), terms=[dict(_summary(values), term=term)
+                                                         for term, values in sorted(terms.items())])
+    assert storage.gpa_summary('grades', students) == expected
+
+    order = storage.gpa_order('grades')
+    assert sorted(student for _, student in order) == sorted(sums)
+    for gpa, student in order:
+        total = [sum(values) for values in zip(*sums[student].values())]
+        assert gpa == pytest.approx(total[1] / total[0])
+    assert all(a <= b for a, b in zip(order, order[1:]))
+    # 分页：从中间某个学生之后取，降序时倒过来
+    if len(order) > 4:
+        assert storage.gpa_order('grades', after=order[1], limit=2) == order[2:4]
+        assert storage.gpa_order('grades', after=order[-2], limit=2, desc=True) == order[-4:-2][::-1]
+
+
+def test_gpa_follows_writes(backend_storage):
+    storage = backend_storage
+    rnd = random.Random(21)
+    student_ids = add_students(storage, 15)
+    add_grades(storage, rnd, student_ids, 120)
+    _check(storage)
+    for _ in range(3):
+        change_grades(storage, rnd)
+        _check(storage)
+    # 课程学分变化：改学分、学分改成 0 时不计入
+    storage.execute_sql("UPDATE courses SET credit = 2 WHERE name = '数据结构'")
+    _check(storage)
+    storage.execute_sql("UPDATE courses SET credit = 0 WHERE name = '高等数学'")
+    _check(storage)
+
+
+def test_gpa_rebuild_matches_incremental(storage):
+    rnd = random.Random(22)
+    student_ids = add_students(storage, 12)
+    add_grades(storage, rnd, student_ids, 100)
+    _check(storage)
+    change_grades(storage, rnd)
+    incremental = storage.gpa_summary('grades', student_ids)
+    assert storage.rebuild_gpa_view() == len(incremental)
+    assert storage.gpa_summary('grades', student_ids) == incremental
+    storage.clear_cache()
+    _check(storage)
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='进程池分段计算需要 fork')
+def test_gpa_parallel_rebuild_matches(storage):
+    rnd = random.Random(23)
+    student_ids = add_students(storage, 12)
+    add_grades(storage, rnd, student_ids, 100)
+    change_grades(storage, rnd)
+    incremental = storage.gpa_summary('grades', student_ids)
+    order = storage.gpa_order('grades')
+    storage.GPA_PARALLEL_MIN_ROWS = 0
+    assert storage.rebuild_gpa_view(workers=3) == len(incremental)
+    assert storage.gpa_summary('grades', student_ids) == incremental
+    assert storage.gpa_order('grades') == order
+    # 重算出的视图同样随写入维护
+    change_grades(storage, rnd)
+    _check(storage)
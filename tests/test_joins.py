@@ -0,0 +1,57 @@
+"""关联字段：成绩带上的学生姓名和班级与学生表一致，找不到学生时为 None，改名后下一次查询即可看到"""
+import random
+
+import pytest
+
+from conftest import add_grades, add_students, all_rows
+
+COLUMNS = ('student_name', 'class_name')
+
+
+def _expected(storage, grades):
+    students = {s['student_id']: s for s in all_rows(storage, 'students')}
+    result = []
+    for grade in grades:
+        student = students.get(grade.get('student_id'))
+        result.append(dict(grade, student_name=student and student['name'],
+                           class_name=student and student['class_name']))
+    return result
+
+
+def test_join_columns_follow_students(backend_storage):
+    storage = backend_storage
+    import grade_service
+    import student_service
+    rnd = random.Random(25)
+    student_ids = add_students(storage, 10)
+    add_grades(storage, rnd, student_ids, 60)
+
+    grades = all_rows(storage, 'grades')
+    assert storage.join_rows('grades', grades, COLUMNS) == _expected(storage, grades)
+    assert storage.join_rows('grades', grades, ('class_name',)) == \
+        [{k: v for k, v in row.items() if k != 'student_name'} for row in _expected(storage, grades)]
+
+    # 找不到学生（或学号为空）的成绩，关联字段为 None
+    orphans = [dict(grades[0], id=1000, student_id='不存在'), dict(grades[1], id=1001, student_id=None)]
+    joined = storage.join_rows('grades', grades[:2] + orphans, COLUMNS)
+    assert [(row['student_name'], row['class_name']) for row in joined[2:]] == [(None, None), (None, None)]
+    assert joined[:2] == _expected(storage, grades[:2])
+
+    # 改名、换班之后下一次查询带上的是新值
+    page = grade_service.query_grades(student_id='S0003', page_size=50, columns=COLUMNS)
+    assert {row['student_name'] for row in page['items']} <= {'学生3'}
+    assert student_service.update_student('S0003', {'name': '新名字', 'class_name': '五班'})['success']
+    expected = [row for row in _expected(storage, all_rows(storage, 'grades')) if row['student_id'] == 'S0003']
+    assert expected and all((row['student_name'], row['class_name']) == ('新名字', '五班') for row in expected)
+    assert grade_service.query_grades(student_id='S0003', columns=COLUMNS) == expected
+    assert grade_service.query_grades(student_id='S0003', page_size=50, columns=COLUMNS)['items'] == expected
+
+    grades = all_rows(storage, 'grades')
+    assert grade_service.query_grades(columns=COLUMNS) == _expected(storage, grades)
+
+
+def test_join_rows_rejects_unknown_columns(storage):
+    with pytest.raises(ValueError):
+        storage.join_rows('grades', [], ('phone',))
+    with pytest.raises(ValueError):
+        storage.join_rows('students', [], ('student_name',))
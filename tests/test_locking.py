@@ -0,0 +1,94 @@
+"""并发控制：多线程、多进程同时写同一张表不丢修改，写锁在进程之间同样独占"""
+import multiprocessing
+import os
+import threading
+
+import pytest
+
+from conftest import all_rows
+
+fcntl = pytest.importorskip('fcntl')
+
+
+def _write_students(prefix, count):
+    """插入 count 个学生，再逐个改名；每次修改都是读取最新数据后在写锁内完成的"""
+    import data_storage
+    for i in range(count):
+        data_storage.execute_sql("INSERT INTO students (student_id, name, class_name) VALUES (:s, '新', '一班')",
+                                 {'s': f'{prefix}{i}'})
+    for i in range(count):
+        data_storage.execute_sql("UPDATE students SET name = :n WHERE student_id = :s",
+                                 {'n': f'{prefix}改{i}', 's': f'{prefix}{i}'})
+    data_storage.execute_sql("DELETE FROM students WHERE student_id = :s", {'s': f'{prefix}0'})
+
+
+def _expected(prefixes, count):
+    return {f'{p}{i}': f'{p}改{i}' for p in prefixes for i in range(1, count)}
+
+
+def _names(storage):
+    rows = all_rows(storage, 'students')
+    assert len({r['id'] for r in rows}) == len(rows)
+    return {r['student_id']: r['name'] for r in rows}
+
+
+def test_threads_do_not_lose_writes(storage):
+    prefixes = [f'T{n}-' for n in range(8)]
+    threads = [threading.Thread(target=_write_students, args=(p, 25)) for p in prefixes]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert _names(storage) == _expected(prefixes, 25)
+    storage.clear_cache()
+    assert _names(storage) == _expected(prefixes, 25)
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='需要 fork')
+def test_processes_do_not_lose_writes(storage):
+    # 父进程先建好缓存，子进程的写入要从日志重放进来
+    storage.execute_sql("SELECT * FROM students")
+    prefixes = [f'P{n}-' for n in range(3)]
+    context = multiprocessing.get_context('fork')
+    children = [context.Process(target=_write_students, args=(p, 30)) for p in prefixes]
+    for child in children:
+        child.start()
+    _write_students('M-', 30)
+    for child in children:
+        child.join()
+        assert child.exitcode == 0
+    expected = _expected(prefixes + ['M-'], 30)
+    assert _names(storage) == expected
+    storage.clear_cache()
+    assert _names(storage) == expected
+
+
+def _try_lock(lock_path, operation, result):
+    fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, getattr(fcntl, operation) | fcntl.LOCK_NB)
+    except BlockingIOError:
+        result.put(False)
+    else:
+        result.put(True)
+    finally:
+        os.close(fd)
+
+
+def _other_process_can_lock(lock_path, operation):
+    context = multiprocessing.get_context('spawn')
+    result = context.Queue()
+    child = context.Process(target=_try_lock, args=(lock_path, operation, result))
+    child.start()
+    child.join()
+    return result.get(timeout=10)
+
+
+def test_write_lock_excludes_other_processes(storage):
+    lock = storage._table_lock(storage.STUDENTS_FILE)
+    with lock.write():
+        assert not _other_process_can_lock(lock.lock_path, 'LOCK_SH')
+    with lock.read():
+        assert _other_process_can_lock(lock.lock_path, 'LOCK_SH')
+        assert not _other_process_can_lock(lock.lock_path, 'LOCK_EX')
+    assert _other_process_can_lock(lock.lock_path, 'LOCK_EX')
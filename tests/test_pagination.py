@@ -0,0 +1,64 @@
+"""键集分页：排序字段有 NULL 时逐页取完的结果与按记录直接排序的一致（NULL 最小，同值按 id）"""
+import pytest
+
+import pagination
+from conftest import add_students, all_rows
+
+
+def _sorted(rows, column, desc):
+    rows = sorted(rows, key=lambda r: (r.get(column) is not None, r.get(column) or 0, r['id']), reverse=desc)
+    return [r['id'] for r in rows]
+
+
+def _pages(storage, column, desc, page_size, where=None, params=None):
+    ids, cursor, pages = [], None, 0
+    while True:
+        query_params = dict(params or {})
+        sql = pagination.keyset_query("SELECT * FROM students", column, desc, cursor, query_params, where)
+        query_params['limit'] = page_size + 1
+        page = pagination.page(storage.execute_sql(sql, query_params), column, page_size)
+        ids += [r['id'] for r in page['items']]
+        pages += 1
+        assert pages <= len(ids) + 1
+        if page['next_cursor'] is None:
+            return ids
+        cursor = pagination.decode_cursor(page['next_cursor'])
+
+
+@pytest.mark.parametrize('desc', [False, True])
+@pytest.mark.parametrize('page_size', [1, 3, 7])
+def test_paging_across_null(backend_storage, desc, page_size):
+    storage = backend_storage
+    add_students(storage, 20)
+    # 一半学生没有年龄，有年龄的有重复值
+    storage.execute_sql("UPDATE students SET age = 18 WHERE class_name = '一班'")
+    storage.execute_sql("UPDATE students SET age = 20 WHERE class_name = '二班'")
+    storage.execute_sql("UPDATE students SET age = 19 WHERE student_id IN :ids", {'ids': ['S0002', 'S0005']})
+    rows = all_rows(storage, 'students')
+    assert any(r.get('age') is None for r in rows)
+    assert _pages(storage, 'age', desc, page_size) == _sorted(rows, 'age', desc)
+    where = 'class_name != :skip'
+    expected = _sorted([r for r in rows if r['class_name'] != '一班'], 'age', desc)
+    assert _pages(storage, 'age', desc, page_size, where, {'skip': '一班'}) == expected
+
+
+@pytest.mark.parametrize('desc', [False, True])
+def test_paging_sorted_index_with_null(storage, desc):
+    # JSON 存储允许缺少字段：按有序索引字段 class_name 分页，缺少的当作 NULL
+    add_students(storage, 12)
+    storage.execute_many("INSERT INTO students (student_id, name) VALUES (:s, '无班级')",
+                         [{'s': f'N{i}'} for i in range(5)])
+    rows = all_rows(storage, 'students')
+    for page_size in (1, 2, 5):
+        assert _pages(storage, 'class_name', desc, page_size) == _sorted(rows, 'class_name', desc)
+
+
+@pytest.mark.parametrize('desc', [False, True])
+@pytest.mark.parametrize('value', [None, '二班'])
+def test_cursor_uses_sorted_index(storage, desc, value):
+    """各种游标条件都识别为有序索引上的区间，按索引顺序读取而不是逐行排序"""
+    params = {}
+    sql = pagination.keyset_query("SELECT * FROM students", 'class_name', desc, (value, 3), params)
+    plan = storage._get_plan(sql)
+    assert plan.order is not None
+    assert any(cursor_id is not None for _, _, cursor_id in plan.order[2])
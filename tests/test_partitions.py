@@ -0,0 +1,149 @@
+"""成绩表分区：拆分前后查询结果一致，带日期、考试类型条件时跳过分区，合并时只重写有修改的学期"""
+import builtins
+import os
+import random
+
+import pytest
+
+from conftest import SUBJECTS, add_students, all_rows
+
+# 四个学期加上日期为空的 other 分区；2023-2024-1 学期只有期中考试
+DATES = {
+    '2023-09-15': ('期中考试',),
+    '2024-01-10': ('期中考试',),
+    '2024-04-20': ('期中考试', '期末考试'),
+    '2024-11-10': ('期中考试', '期末考试'),
+    '2025-06-20': ('期中考试', '期末考试'),
+    None: ('期末考试',),
+}
+
+QUERIES = [
+    ("SELECT * FROM grades WHERE exam_date >= :d", {'d': '2024-08-01'}),
+    ("SELECT * FROM grades WHERE exam_date < :d AND score >= :s", {'d': '2024-02-01', 's': 60}),
+    ("SELECT * FROM grades WHERE exam_date IN :ds", {'ds': ['2023-09-15', '2025-06-20']}),
+    ("SELECT * FROM grades WHERE exam_type = :t", {'t': '期末考试'}),
+    ("SELECT * FROM grades WHERE exam_date IS NULL", {}),
+    ("SELECT COUNT(*) AS n, AVG(score) AS avg FROM grades WHERE exam_date >= :d AND exam_type = :t",
+     {'d': '2023-08-01', 't': '期末考试'}),
+    ("SELECT COUNT(*) AS n, MAX(score) AS top FROM grades WHERE exam_date <= :d", {'d': '2024-01-31'}),
+]
+
+
+@pytest.fixture
+def grades(storage):
+    storage.WAL_COMPACT_THRESHOLD = 10 ** 6
+    rnd = random.Random(15)
+    student_ids = add_students(storage, 20)
+    rows = []
+    for _ in range(200):
+        date = rnd.choice(list(DATES))
+        rows.append({'student_id': rnd.choice(student_ids), 'subject': rnd.choice(SUBJECTS),
+                     'score': rnd.randint(0, 100), 'exam_type': rnd.choice(DATES[date]), 'exam_date': date})
+    storage.execute_many(
+        "INSERT INTO grades (student_id, subject, score, exam_type, exam_date) "
+        "VALUES (:student_id, :subject, :score, :exam_type, :exam_date)", rows)
+    return storage
+
+
+def _results(storage):
+    """各查询的结果，表已缓存和未缓存（聚合查询逐行读取文件）各执行一次"""
+    results = []
+    for cached in (True, False):
+        for sql, params in QUERIES:
+            if not cached:
+                storage.clear_cache()
+            rows = storage.execute_sql(sql, params)
+            results.append(sorted(rows, key=lambda r: r.get('id', 0)))
+    return results
+
+
+def _catalog(storage):
+    return storage._load_json(storage._catalog_path(storage.GRADES_FILE))['partitions']
+
+
+def test_results_same_after_split(grades):
+    storage = grades
+    with open(storage.GRADES_FILE, 'rb') as f:
+        original = f.read()
+    before = _results(storage)
+    storage.compact_table(storage.GRADES_FILE)
+    assert set(_catalog(storage)) == {'2023-2024-1', '2023-2024-2', '2024-2025-1', '2024-2025-2', 'other'}
+    # 原来的单文件快照不删除也不改写
+    with open(storage.GRADES_FILE, 'rb') as f:
+        assert f.read() == original
+    assert _results(storage) == before
+    storage.clear_cache()
+    assert _results(storage) == before
+
+
+def test_explain_names_partition_path(grades):
+    storage = grades
+    info = storage.explain("SELECT COUNT(*) AS n FROM grades WHERE exam_date >= :d AND exam_type = :t")
+    assert 'partition scan grades when not cached' in info['access']
+    assert "exam_date >= :d" in info['access'] and "exam_type = :t" in info['access']
+    # 取出整行的查询走索引，不按分区读取
+    info = storage.explain("SELECT * FROM grades WHERE exam_date >= :d")
+    assert 'partition' not in info['access']
+
+
+def test_explain_partition_scan_without_indexes(storage, monkeypatch):
+    monkeypatch.setitem(storage.INDEXES, storage.GRADES_FILE, {'id': True})
+    monkeypatch.setitem(storage.SORTED_INDEXES, storage.GRADES_FILE, ('id',))
+    info = storage.explain("SELECT * FROM grades WHERE exam_date >= :d")
+    assert info['access'] == "partition scan grades (pruned by exam_date >= :d)"
+
+
+def test_pruned_partitions_not_opened(grades, monkeypatch):
+    storage = grades
+    storage.compact_table(storage.GRADES_FILE)
+    catalog = _catalog(storage)
+    directory = storage._partition_dir(storage.GRADES_FILE)
+    rows = all_rows(storage, 'grades')
+    storage.clear_cache()
+
+    opened = []
+
+    def recording_open(path, *args, **kwargs):
+        if os.path.dirname(os.path.abspath(path)) == os.path.abspath(directory) and \
+                os.path.basename(path) != 'catalog.json':
+            opened.append(os.path.basename(path))
+        return builtins.open(path, *args, **kwargs)
+
+    monkeypatch.setattr(storage, 'open', recording_open, raising=False)
+    cases = [
+        ({'d': '2024-08-01', 't': '期中考试'}, {'2024-2025-1', '2024-2025-2', 'other'}),
+        # 2023-2024-1 学期没有期末考试，按分区目录中记录的取值跳过
+        ({'d': '2023-08-01', 't': '期末考试'}, {'2023-2024-2', '2024-2025-1', '2024-2025-2', 'other'}),
+    ]
+    for params, terms in cases:
+        opened.clear()
+        result = storage.execute_sql(
+            "SELECT COUNT(*) AS n FROM grades WHERE exam_date >= :d AND exam_type = :t", params)
+        expected = [r for r in rows
+                    if r['exam_date'] is not None and r['exam_date'] >= params['d'] and r['exam_type'] == params['t']]
+        assert result == [{'n': len(expected)}]
+        assert sorted(opened) == sorted(catalog[term]['file'] for term in terms)
+        assert storage.GRADES_FILE not in storage._cache
+
+
+def test_compaction_rewrites_only_changed_term(grades):
+    storage = grades
+    storage.compact_table(storage.GRADES_FILE)
+    directory = storage._partition_dir(storage.GRADES_FILE)
+    before = _catalog(storage)
+    stats = {term: os.stat(os.path.join(directory, meta['file'])).st_mtime_ns for term, meta in before.items()}
+
+    changed = next(r for r in all_rows(storage, 'grades') if r['exam_date'] == '2024-04-20')
+    storage.execute_sql("UPDATE grades SET score = :s WHERE id = :id", {'s': 100, 'id': changed['id']})
+    expected = all_rows(storage, 'grades')
+    storage.compact_table(storage.GRADES_FILE)
+    after = _catalog(storage)
+    assert {term for term in after if after[term]['file'] != before[term]['file']} == {'2023-2024-2'}
+    for term, meta in after.items():
+        path = os.path.join(directory, meta['file'])
+        if term != '2023-2024-2':
+            assert os.stat(path).st_mtime_ns == stats[term]
+    # 被替换的旧分区文件已删除
+    assert not os.path.exists(os.path.join(directory, before['2023-2024-2']['file']))
+    storage.clear_cache()
+    assert sorted(all_rows(storage, 'grades'), key=lambda r: r['id']) == sorted(expected, key=lambda r: r['id'])
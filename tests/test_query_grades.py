@@ -0,0 +1,107 @@
+"""成绩筛选：query_grades 的各种条件组合（分页和不分页）与逐行筛选一致，多个索引条件时从候选行最少的取行"""
+import random
+
+from conftest import EXAM_DATES, EXAM_TYPES, SUBJECTS, add_grades, add_students, all_rows
+
+CLASSES = ('一班', '二班', '三班', '没有学生的班')
+
+
+def _filters(rnd, student_ids):
+    """随机取几个条件，其余为 None 或空串（不限制）"""
+    choices = {
+        'student_id': lambda: rnd.choice(student_ids + ['不存在']),
+        'subject': lambda: rnd.choice(SUBJECTS),
+        'exam_type': lambda: rnd.choice(EXAM_TYPES),
+        'date_from': lambda: rnd.choice(EXAM_DATES),
+        'date_to': lambda: rnd.choice(EXAM_DATES),
+        'min_score': lambda: rnd.randint(0, 90),
+        'max_score': lambda: rnd.randint(30, 100),
+        'class_name': lambda: rnd.choice(CLASSES),
+    }
+    filters = {name: rnd.choice((None, '')) for name in choices}
+    for name in rnd.sample(list(choices), rnd.randint(1, 4)):
+        filters[name] = choices[name]()
+    return filters
+
+
+def _conditions(filters, classes):
+    """每个条件单独的判断函数"""
+    checks = {
+        'student_id': lambda g, v: g['student_id'] == v,
+        'subject': lambda g, v: g['subject'] == v,
+        'exam_type': lambda g, v: g['exam_type'] == v,
+        'date_from': lambda g, v: g['exam_date'] is not None and g['exam_date'] >= v,
+        'date_to': lambda g, v: g['exam_date'] is not None and g['exam_date'] <= v,
+        'min_score': lambda g, v: g['score'] >= v,
+        'max_score': lambda g, v: g['score'] <= v,
+        'class_name': lambda g, v: classes.get(g['student_id']) == v,
+    }
+    return {name: (lambda g, check=checks[name], v=value: check(g, v))
+            for name, value in filters.items() if value not in (None, '')}
+
+
+def _sort_key(sort):
+    column = (sort or 'id').lstrip('-')
+    return lambda g: (g[column] is not None, g[column], g['id'])
+
+
+def _pages(grade_service, filters, sort, page_size):
+    rows, cursor = [], None
+    while True:
+        page = grade_service.query_grades(**filters, page_size=page_size, cursor=cursor, sort=sort)
+        assert len(page['items']) <= page_size
+        rows += page['items']
+        cursor = page['next_cursor']
+        if cursor is None:
+            return rows
+
+
+def test_query_grades_matches_list_comprehension(backend_storage):
+    storage = backend_storage
+    import grade_service
+    rnd = random.Random(19)
+    student_ids = add_students(storage, 20)
+    add_grades(storage, rnd, student_ids, 200)
+    storage.execute_sql("UPDATE grades SET exam_date = NULL WHERE id IN :ids", {'ids': list(range(1, 200, 17))})
+    grades = all_rows(storage, 'grades')
+    classes = {s['student_id']: s['class_name'] for s in all_rows(storage, 'students')}
+
+    for _ in range(40):
+        filters = _filters(rnd, student_ids)
+        checks = _conditions(filters, classes).values()
+        expected = [g for g in grades if all(check(g) for check in checks)]
+        result = grade_service.query_grades(**filters)
+        assert sorted(r['id'] for r in result) == sorted(g['id'] for g in expected), filters
+
+        sort = rnd.choice((None, 'score', '-score', 'student_id', '-student_id', '-id'))
+        ordered = sorted(expected, key=_sort_key(sort), reverse=bool(sort) and sort.startswith('-'))
+        paged = _pages(grade_service, filters, sort, rnd.choice((1, 7, 50)))
+        assert [r['id'] for r in paged] == [g['id'] for g in ordered], (filters, sort)
+
+
+def test_planner_scans_smallest_candidate_set(storage, monkeypatch):
+    import grade_service
+    rnd = random.Random(20)
+    student_ids = add_students(storage, 20)
+    add_grades(storage, rnd, student_ids, 300)
+    grades = all_rows(storage, 'grades')
+    classes = {s['student_id']: s['class_name'] for s in all_rows(storage, 'students')}
+
+    scanned = []
+    monkeypatch.setattr(storage.query_log, 'record',
+                        lambda sql, params, ms, rows, returned, batch=None: scanned.append(rows))
+    for _ in range(40):
+        filters = _filters(rnd, student_ids)
+        conditions = _conditions(filters, classes)
+        # 日期和分数的上下界合成一个区间，各自只算一个候选集合
+        sizes = []
+        for names in (('student_id',), ('subject',), ('exam_type',), ('date_from', 'date_to'),
+                      ('min_score', 'max_score'), ('class_name',)):
+            present = [conditions[name] for name in names if name in conditions]
+            if present:
+                sizes.append(sum(all(check(g) for check in present) for g in grades))
+        if filters['class_name'] and not any(classes[s] == filters['class_name'] for s in student_ids):
+            continue
+        scanned.clear()
+        grade_service.query_grades(**filters)
+        assert scanned[-1] == min(sizes), filters
@@ -0,0 +1,51 @@
+"""查询日志：嵌套参数脱敏，默认只记录慢查询"""
+import pytest
+
+import query_log
+
+
+def test_redact_nested():
+    params = {
+        'id': 1,
+        'password': 'p0',
+        'update_data': {'name': '新名字', 'Password': 'p1', 'profile': {'api_token': 't'}},
+        'rows': [{'username': 'u', 'passwd': 'p2'}],
+    }
+    result = query_log.redact(params)
+    assert result['id'] == 1
+    assert result['password'] == '***'
+    assert result['update_data'] == {'name': '新名字', 'Password': '***', 'profile': {'api_token': '***'}}
+    assert 'p2' not in result['rows'] and '***' in result['rows']
+    # 原参数不变
+    assert params['update_data']['Password'] == 'p1'
+
+
+def test_redact_truncates_long_values():
+    result = query_log.redact({'ids': list(range(1000)), 'text': 'x' * 1000})
+    assert len(result['ids']) == query_log.MAX_PARAM_LENGTH + 3
+    assert result['text'].endswith('...')
+
+
+@pytest.fixture
+def logged(monkeypatch):
+    entries = []
+    monkeypatch.setattr(query_log, '_ensure_listener', lambda: None)
+    monkeypatch.setattr(query_log.logger, 'log', lambda level, entry: entries.append((level, entry)))
+    return entries
+
+
+def test_default_logs_slow_queries_only(monkeypatch, logged):
+    monkeypatch.setattr(query_log, 'LOG_LEVEL', 'WARNING')
+    query_log.record('SELECT * FROM students', None, 1, 10, 10)
+    query_log.record('SELECT * FROM grades', None, query_log.SLOW_QUERY_MS, 10, 10)
+    assert [entry['sql'] for _, entry in logged] == ['SELECT * FROM grades']
+
+
+def test_info_samples_fast_queries(monkeypatch, logged):
+    monkeypatch.setattr(query_log, 'LOG_LEVEL', 'INFO')
+    monkeypatch.setattr(query_log, 'SAMPLE_RATE', 0)
+    query_log.record('SELECT 1', None, 1, 0, 0)
+    assert logged == []
+    monkeypatch.setattr(query_log, 'SAMPLE_RATE', 1)
+    query_log.record('SELECT 1', {'password': 'p'}, 1, 0, 0)
+    assert logged[0][1]['params'] == {'password': '***'}
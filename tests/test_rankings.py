@@ -0,0 +1,102 @@
+"""排名：增删改、学生换班和删除之后，名次和前 K 名与按记录直接计算的一致"""
+import itertools
+import random
+
+from conftest import EXAM_DATES, EXAM_TYPES, SUBJECTS, add_grades, add_students, all_rows, change_grades
+
+
+def _position(score, scope):
+    scores = [g['score'] for g in scope]
+    total = len(scores)
+    return {
+        'rank': 1 + sum(s > score for s in scores),
+        'total': total,
+        'percentile': round(sum(s < score for s in scores) * 100 / total, 1) if total else 0,
+    }
+
+
+def _scope_key(grade):
+    return grade['subject'], grade['exam_type'], grade['exam_date']
+
+
+def _check(storage):
+    grades = all_rows(storage, 'grades')
+    classes = {s['student_id']: s['class_name'] for s in all_rows(storage, 'students')}
+    scopes = {}
+    for grade in grades:
+        scopes.setdefault(_scope_key(grade), []).append(grade)
+
+    expected = [_position(g['score'], scopes[_scope_key(g)]) for g in grades]
+    assert storage.rank_rows('grades', grades) == expected
+    expected = [_position(g['score'], [o for o in scopes[_scope_key(g)]
+                                       if classes.get(o['student_id']) == classes[g['student_id']]])
+                for g in grades]
+    assert storage.rank_rows('grades', grades, 'class_name') == expected
+
+    for subject, exam_type, exam_date in itertools.product(SUBJECTS, EXAM_TYPES, EXAM_DATES):
+        key = {'subject': subject, 'exam_type': exam_type, 'exam_date': exam_date}
+        scope = scopes.get((subject, exam_type, exam_date), [])
+        ordered = sorted(scope, key=lambda g: (-g['score'], g['id']))
+        top = storage.top_ranked('grades', key, limit=5)
+        assert [(rank, row['id']) for rank, row in top] == \
+               [(_position(g['score'], scope)['rank'], g['id']) for g in ordered[:5]]
+        lowest = storage.top_ranked('grades', key, limit=3, lowest=True)
+        assert [row['id'] for _, row in lowest] == [g['id'] for g in sorted(scope, key=lambda g: (g['score'], -g['id']))[:3]]
+        for class_name in ('一班', '二班', '三班'):
+            in_class = [g for g in ordered if classes.get(g['student_id']) == class_name]
+            top = storage.top_ranked('grades', key, limit=3, group='class_name', value=class_name)
+            assert [row['id'] for _, row in top] == [g['id'] for g in in_class[:3]]
+            assert storage.rank_score('grades', 60, key, 'class_name', class_name) == _position(60, in_class)
+
+
+def test_rankings_follow_writes(backend_storage):
+    storage = backend_storage
+    rnd = random.Random(11)
+    student_ids = add_students(storage, 18)
+    add_grades(storage, rnd, student_ids, 150)
+    _check(storage)
+    for _ in range(3):
+        change_grades(storage, rnd)
+        _check(storage)
+
+
+def test_rankings_after_reload(storage):
+    rnd = random.Random(12)
+    student_ids = add_students(storage, 12)
+    add_grades(storage, rnd, student_ids, 100)
+    _check(storage)
+    change_grades(storage, rnd)
+    storage.clear_cache()
+    _check(storage)
+    change_grades(storage, rnd)
+    _check(storage)
+
+
+def test_rankings_api_defaults_to_latest_exam(backend_storage):
+    storage = backend_storage
+    import app
+    client = app.app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = 1
+    add_students(storage, 6)
+    rows = [('S0000', 80, '2024-11-10'), ('S0001', 95, '2024-11-10'), ('S0002', 70, '2025-06-20'),
+            ('S0003', 88, '2025-06-20'), ('S0004', 99, None), ('S0005', 60, '2025-06-20')]
+    storage.execute_many(
+        "INSERT INTO grades (student_id, subject, score, exam_type, exam_date) "
+        "VALUES (:s, '数据结构', :score, '期末考试', :d)",
+        [{'s': s, 'score': score, 'd': d} for s, score, d in rows])
+
+    def ranking(query):
+        response = client.get(f'/api/rankings?subject=数据结构&exam_type=期末考试{query}')
+        assert response.status_code == 200
+        return [(row['rank'], row['student_id'], row['exam_date']) for row in response.get_json()['data']]
+
+    # 不传日期：最近一场（2025-06-20），没有日期的成绩不算
+    assert ranking('') == [(1, 'S0003', '2025-06-20'), (2, 'S0002', '2025-06-20'), (3, 'S0005', '2025-06-20')]
+    assert ranking('&exam_date=') == ranking('')
+    assert ranking('&exam_date=2024-11-10&limit=1') == [(1, 'S0001', '2024-11-10')]
+    assert ranking('&lowest=1&limit=1') == [(3, 'S0005', '2025-06-20')]
+    assert ranking('&class_name=一班') == [(1, 'S0003', '2025-06-20')]
+    response = client.get('/api/rankings?subject=数据结构&exam_type=期中考试')
+    assert response.get_json() == {'success': True, 'data': []}
+    assert client.get('/api/rankings?subject=数据结构').status_code == 400
@@ -0,0 +1,81 @@
+"""只读行记录：字典式访问、未设置的字段、未知字段派生子类、不可修改，查询结果改不到缓存"""
+import pickle
+
+import pytest
+
+import records
+from conftest import add_students, all_rows
+
+
+def test_row_mapping_access():
+    row = records.make_row('students', {'id': 1, 'student_id': 'S1', 'name': '张三', 'age': None})
+    assert isinstance(row, records.StudentRow)
+    assert row['name'] == '张三' and row.name == '张三'
+    assert row.get('name') == '张三' and row.get('age', 5) is None
+    assert 'student_id' in row and 'age' in row
+    assert row.keys() == ['id', 'student_id', 'name', 'age']
+    assert row.items() == [('id', 1), ('student_id', 'S1'), ('name', '张三'), ('age', None)]
+    assert dict(row) == row.to_dict() == {'id': 1, 'student_id': 'S1', 'name': '张三', 'age': None}
+    assert len(row) == 4 and list(row) == row.keys()
+    assert row == {'id': 1, 'student_id': 'S1', 'name': '张三', 'age': None}
+    assert row == records.make_row('students', row.to_dict())
+    assert pickle.loads(pickle.dumps(row)) == row
+
+
+def test_unset_slots_behave_like_missing_keys():
+    row = records.make_row('students', {'id': 1, 'name': '张三'})
+    # 类上有这个槽位，但插入时没有提供
+    assert 'phone' not in row and 'phone' not in row.to_dict()
+    assert row.get('phone') is None and row.get('phone', '无') == '无'
+    with pytest.raises(KeyError):
+        row['phone']
+    # 类上没有的字段
+    assert 'nickname' not in row and row.get('nickname') is None
+    with pytest.raises(KeyError):
+        row['nickname']
+
+
+def test_unknown_columns_derive_subclass(monkeypatch):
+    monkeypatch.setitem(records._types, 'students', records.StudentRow)
+    row = records.make_row('students', {'id': 1, 'name': '张三', 'nickname': '小张'})
+    assert type(row) is not records.StudentRow and isinstance(row, records.StudentRow)
+    assert row['nickname'] == '小张' and row.keys() == ['id', 'name', 'nickname']
+    # 之后的记录用派生出的类型，没有新字段的记录也是
+    assert type(records.make_row('students', {'id': 2})) is type(row)
+    assert row.replace({'name': '李四'}) == {'id': 1, 'name': '李四', 'nickname': '小张'}
+
+    monkeypatch.delitem(records._types, 'widgets', raising=False)
+    widget = records.make_row('widgets', {'id': 1, 'size': 3})
+    assert type(widget).__name__ == 'WidgetsRow' and widget.to_dict() == {'id': 1, 'size': 3}
+    with pytest.raises(ValueError):
+        records.make_row('widgets', {'bad name': 1})
+
+
+def test_rows_are_read_only():
+    row = records.make_row('grades', {'id': 1, 'score': 80})
+    with pytest.raises(AttributeError):
+        row.score = 90
+    with pytest.raises(AttributeError):
+        row.new_field = 1
+    with pytest.raises(AttributeError):
+        del row.score
+    with pytest.raises(TypeError):
+        row['score'] = 90
+    with pytest.raises(TypeError):
+        hash(row)
+    assert row['score'] == 80
+
+
+def test_select_results_cannot_change_cache(storage):
+    add_students(storage, 3)
+    rows = all_rows(storage, 'students')
+    before = [row.to_dict() for row in rows]
+    with pytest.raises(AttributeError):
+        rows[0].name = '改名'
+    copy = rows[0].to_dict()
+    copy['name'] = '改名'
+    rows.clear()
+    found = storage.execute_sql("SELECT * FROM students WHERE student_id = 'S0000'")
+    assert found[0]['name'] == '学生0'
+    found.append('x')
+    assert [row.to_dict() for row in all_rows(storage, 'students')] == before
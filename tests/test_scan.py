@@ -0,0 +1,70 @@
+"""逐行遍历：scan 在未缓存的表上叠加日志后与 SELECT * 一致，不填充缓存，旧格式的快照仍能读取"""
+import csv
+import io
+import json
+import random
+
+import pytest
+
+from conftest import add_grades, add_students, all_rows, change_grades
+
+
+def _by_id(rows):
+    return sorted((dict(row) for row in rows), key=lambda r: r['id'])
+
+
+def test_scan_overlays_wal_without_caching(storage):
+    rnd = random.Random(12)
+    student_ids = add_students(storage, 30)
+    add_grades(storage, rnd, student_ids, 100)
+    storage.compact_all()
+    # 合并之后的修改只在日志里
+    change_grades(storage, rnd)
+    storage.execute_many("INSERT INTO students (student_id, name, class_name) VALUES (:s, '新生', '四班')",
+                         [{'s': f'N{i}'} for i in range(5)])
+    storage.execute_sql("UPDATE students SET name = '改名' WHERE class_name = '二班'")
+
+    for table, file_path in (('students', storage.STUDENTS_FILE), ('grades', storage.GRADES_FILE)):
+        assert storage._read_wal(file_path)[0]
+        storage.clear_cache()
+        scanned = list(storage.scan(table))
+        projected = list(storage.scan(table, lambda r: r['id'] % 2, columns=('id', 'student_id', '不存在')))
+        assert file_path not in storage._cache
+        expected = all_rows(storage, table)
+        assert _by_id(scanned) == _by_id(expected)
+        assert _by_id(projected) == [{'id': r['id'], 'student_id': r['student_id'], '不存在': None}
+                                     for r in _by_id(expected) if r['id'] % 2]
+        # 已缓存时遍历缓存中的记录
+        assert _by_id(storage.scan(table)) == _by_id(expected)
+
+
+@pytest.mark.parametrize('indent', [4, 2, None])
+def test_old_snapshot_formats_still_load(storage, indent):
+    rows = [{'id': i, 'student_id': f'S{i}', 'name': f'学生{i}', 'class_name': '一班'} for i in range(1, 6)]
+    with open(storage.STUDENTS_FILE, 'w', encoding='utf-8') as f:
+        json.dump(rows, f, ensure_ascii=False, indent=indent)
+    storage.clear_cache()
+    storage.execute_sql("DELETE FROM students WHERE student_id = 'S2'")
+    storage.clear_cache()
+    expected = [row for row in rows if row['student_id'] != 'S2']
+    assert _by_id(storage.scan('students')) == expected
+    assert storage.STUDENTS_FILE not in storage._cache
+    assert _by_id(all_rows(storage, 'students')) == expected
+
+
+def test_export_streams_current_students(storage):
+    import app
+    client = app.app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = 1
+    add_students(storage, 1200)
+    storage.execute_sql("UPDATE students SET phone = '123' WHERE student_id = 'S0007'")
+    storage.clear_cache()
+    response = client.get('/students/export')
+    assert response.status_code == 200
+    lines = list(csv.reader(io.StringIO(response.get_data(as_text=True).lstrip('﻿'))))
+    assert lines[0][:3] == ['学号', '姓名', '班级']
+    assert storage.STUDENTS_FILE not in storage._cache
+    students = _by_id(all_rows(storage, 'students'))
+    assert [line[:3] for line in lines[1:]] == [[s['student_id'], s['name'], s['class_name']] for s in students]
+    assert lines[8][5] == '123'
@@ -0,0 +1,78 @@
+"""搜索：search / search_students 的结果和顺序与逐行匹配的一致，索引随增删改和重新加载保持正确"""
+import random
+
+from conftest import all_rows
+
+PIECES = ('张', '三', '丰', '李', 'An', 'na', 'NE', '王')
+KEYWORDS = ('张', '张三', '三丰', 'an', 'AN', 'anna', 's1', 'S00', 'S0012', '1', '李张', '王王王', '不存在')
+
+
+def _add(storage, rnd, count, start=0):
+    rows = [{'student_id': rnd.choice((f'S{i:04d}', f's{i}', f'{i}S')),
+             'name': ''.join(rnd.choice(PIECES) for _ in range(rnd.randint(1, 3))),
+             'class_name': '一班'} for i in range(start, start + count)]
+    storage.execute_many("INSERT INTO students (student_id, name, class_name) VALUES (:student_id, :name, :class_name)",
+                         rows)
+
+
+def _naive(storage, keyword):
+    """逐行匹配：完全相同 > 以关键字开头 > 姓名包含关键字，同一档内按匹配的值、id 排序"""
+    text = keyword.lower()
+    ranked = []
+    for row in all_rows(storage, 'students'):
+        keys = []
+        for column, contains in storage.SEARCH_INDEXES[storage.STUDENTS_FILE].items():
+            if row.get(column) is None:
+                continue
+            value = str(row[column]).lower()
+            if value == text:
+                keys.append((0, value))
+            elif value.startswith(text):
+                keys.append((1, value))
+            elif contains and text in value:
+                keys.append((2, value))
+        if keys:
+            ranked.append(min(keys) + (row['id'],))
+    return [row_id for *_, row_id in sorted(ranked)]
+
+
+def _check(storage):
+    for keyword in KEYWORDS:
+        expected = _naive(storage, keyword)
+        assert [r['id'] for r in storage.search('students', keyword)] == expected, keyword
+        assert [r['id'] for r in storage.search('students', keyword, limit=3)] == expected[:3], keyword
+
+
+def test_search_matches_naive_scan(backend_storage):
+    storage = backend_storage
+    rnd = random.Random(18)
+    _add(storage, rnd, 80)
+    _check(storage)
+
+    students = all_rows(storage, 'students')
+    for row in rnd.sample(students, 15):
+        storage.execute_sql("UPDATE students SET name = :name WHERE id = :id",
+                            {'name': ''.join(rnd.choice(PIECES) for _ in range(2)), 'id': row['id']})
+    for row in rnd.sample(students, 5):
+        storage.execute_sql("UPDATE students SET student_id = :s WHERE id = :id",
+                            {'s': f'S00{row["id"]}X', 'id': row['id']})
+    storage.execute_sql("DELETE FROM students WHERE id IN :ids", {'ids': [r['id'] for r in rnd.sample(students, 10)]})
+    _add(storage, rnd, 10, start=100)
+    _check(storage)
+
+    storage.clear_cache()
+    _check(storage)
+
+
+def test_search_students_matches_student_id_by_prefix(storage):
+    import student_service
+    storage.execute_many("INSERT INTO students (student_id, name, class_name) VALUES (:s, :n, '一班')",
+                         [{'s': 'S1', 'n': '学生'}, {'s': '1S', 'n': '张三'}, {'s': 'X9', 'n': '李1'},
+                          {'s': '12', 'n': '王五'}])
+    # 学号只按前缀匹配，姓名按包含匹配
+    found = student_service.search_students('1')
+    assert [s['student_id'] for s in found] == ['12', '1S', 'X9']
+    assert [s['student_id'] for s in student_service.search_students('1', limit=1)] == ['12']
+    page = student_service.search_students('1', page_size=10)
+    assert [s['student_id'] for s in page['items']] == ['12', '1S', 'X9']
+    assert [s['student_id'] for s in student_service.search_students('s1')] == ['S1']
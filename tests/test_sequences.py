@@ -0,0 +1,40 @@
+"""ID 序列：分配的 id 不重复，fork 出的子进程不沿用父进程预留的 id 段"""
+import multiprocessing
+import os
+
+import pytest
+
+from conftest import add_students, all_rows
+
+
+def _insert_students(prefix, count):
+    import data_storage
+    for i in range(count):
+        data_storage.execute_sql("INSERT INTO students (student_id, name, class_name) VALUES (:s, '子进程', '一班')",
+                                 {'s': f'{prefix}{i}'})
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='需要 fork')
+def test_forked_children_do_not_reuse_reserved_ids(storage):
+    # 父进程先分配过 id，手里有一段预留的 id
+    add_students(storage, 3)
+    assert storage._sequences
+    context = multiprocessing.get_context('fork')
+    children = [context.Process(target=_insert_students, args=(f'C{n}-', 20)) for n in range(3)]
+    for child in children:
+        child.start()
+    for child in children:
+        child.join()
+        assert child.exitcode == 0
+    storage.execute_sql("INSERT INTO students (student_id, name, class_name) VALUES ('P', '父进程', '一班')")
+    # 子进程的写入在日志里，父进程的缓存按文件签名失效后重新读取
+    ids = [row['id'] for row in all_rows(storage, 'students')]
+    assert len(ids) == 3 + 3 * 20 + 1
+    assert len(set(ids)) == len(ids)
+
+
+def test_bulk_and_single_inserts_are_monotonic(storage):
+    add_students(storage, 5)
+    storage.execute_sql("INSERT INTO students (student_id, name, class_name) VALUES ('X', 'x', '一班')")
+    ids = [row['id'] for row in all_rows(storage, 'students')]
+    assert ids == sorted(ids) and len(set(ids)) == len(ids)
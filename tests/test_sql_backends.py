@@ -0,0 +1,43 @@
+"""execute_sql 的聚合查询在各存储后端上的结果与按记录直接计算的一致"""
+import pytest
+
+from conftest import all_rows
+
+
+@pytest.fixture
+def scores(backend_storage):
+    storage = backend_storage
+    storage.execute_sql("INSERT INTO students (student_id, name, class_name) VALUES ('S0', '张三', '一班')")
+    rows = [{'student_id': 'S0', 'subject': ('数学', '英语')[i % 2], 'score': float(40 + i * 3 % 61),
+             'exam_type': '期末考试', 'exam_date': '2025-01-10'} for i in range(30)]
+    storage.execute_many(
+        "INSERT INTO grades (student_id, subject, score, exam_type, exam_date) "
+        "VALUES (:student_id, :subject, :score, :exam_type, :exam_date)", rows)
+    return storage
+
+
+def test_count_star_counts_rows(scores):
+    storage = scores
+    assert storage.execute_sql("SELECT COUNT(*) AS count FROM grades")[0]['count'] == 30
+    # 默认数据的三门课程
+    assert storage.execute_sql("SELECT COUNT(*) AS count FROM courses")[0]['count'] == 3
+
+
+def test_aggregates_match_rows(scores):
+    storage = scores
+    rows = [row for row in all_rows(storage, 'grades') if row['subject'] == '数学']
+    values = [row['score'] for row in rows]
+    result = storage.execute_sql(
+        "SELECT COUNT(*) AS count, AVG(score) AS average, MIN(score) AS low, MAX(score) AS high "
+        "FROM grades WHERE subject = :subject", {'subject': '数学'})[0]
+    assert result['count'] == len(values)
+    assert result['average'] == pytest.approx(sum(values) / len(values))
+    assert result['low'] == min(values)
+    assert result['high'] == max(values)
+
+
+def test_aggregates_on_empty_result(scores):
+    result = scores.execute_sql(
+        "SELECT COUNT(*) AS count, AVG(score) AS average, MIN(score) AS low FROM grades WHERE score > :x",
+        {'x': 1000})[0]
+    assert result == {'count': 0, 'average': None, 'low': None}
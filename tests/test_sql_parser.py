@@ -0,0 +1,151 @@
+"""SQL 解析：各种运算符、ORDER BY / LIMIT / OFFSET、语法错误、EXPLAIN 选中的索引，以及 NULL 的三值逻辑"""
+import pytest
+
+import sql_parser
+from conftest import add_students, all_rows
+from sql_parser import SQLSyntaxError
+
+# (WHERE 子句, 解析后的条件)
+CONDITIONS = [
+    ("a = :v", "a = :v"),
+    ("a <> 1", "a != 1"),
+    ("a >= -2.5 AND b < 'x'", "(a >= -2.5 AND b < 'x')"),
+    ("a IN (1, 'x')", "a IN [1, 'x']"),
+    ("a NOT IN :ids", "a NOT IN :ids"),
+    ("a LIKE '%x_'", "a LIKE '%x_'"),
+    ("a NOT LIKE :p", "a NOT LIKE :p"),
+    ("a IS NULL", "a IS NULL"),
+    ("a IS NOT NULL", "a IS NOT NULL"),
+    ("NOT a = 1 AND b = 2", "(NOT a = 1 AND b = 2)"),
+    ("NOT (a = 1 OR b LIKE 'y%')", "NOT (a = 1 OR b LIKE 'y%')"),
+    ("a = 1 OR b = 2 AND c = 3", "(a = 1 OR (b = 2 AND c = 3))"),
+    ("(a = 1 OR b = 2) AND c = 3", "((a = 1 OR b = 2) AND c = 3)"),
+    ("`a` = 'it''s'", "a = \"it's\""),
+]
+
+# (WHERE 子句, 参数, 满足条件的行号)，行见 ROWS
+ROWS = [
+    {'a': 1, 'b': 'xa'},
+    {'a': 2, 'b': 'XB'},
+    {'a': None, 'b': 'xa'},
+    {'a': 3, 'b': None},
+]
+PREDICATES = [
+    ("a = :v", {'v': 1}, [0]),
+    ("a != :v", {'v': 1}, [1, 3]),
+    ("a = :v", {'v': None}, []),
+    ("a > 1", {}, [1, 3]),
+    ("a > 'x'", {}, []),
+    ("a IN (1, 3)", {}, [0, 3]),
+    ("a NOT IN :ids", {'ids': [1, 3]}, [1]),
+    ("a NOT IN :ids", {'ids': [1, None]}, []),
+    ("a IN :ids", {'ids': [1, None]}, [0]),
+    ("b LIKE 'x%'", {}, [0, 1, 2]),
+    ("b LIKE '_a'", {}, [0, 2]),
+    ("b NOT LIKE 'x_'", {}, []),
+    ("a IS NULL", {}, [2]),
+    ("b IS NOT NULL", {}, [0, 1, 2]),
+    ("NOT (a = 1)", {}, [1, 3]),
+    ("NOT (a = 1 OR b = 'xa')", {}, [1]),
+    ("NOT (a = 1 AND b = 'xa')", {}, [1, 3]),
+    ("NOT (a > 1 AND b LIKE 'x%')", {}, [0]),
+    ("NOT NOT a = 1", {}, [0]),
+    ("a = 1 OR a IS NULL", {}, [0, 2]),
+]
+
+SYNTAX_ERRORS = [
+    "SELEC * FROM t",
+    "DROP TABLE t",
+    "SELECT * FROM",
+    "SELECT * FROM t WHERE",
+    "SELECT * FROM t WHERE a =",
+    "SELECT * FROM t WHERE (a = 1",
+    "SELECT * FROM t WHERE a IS 1",
+    "SELECT * FROM t WHERE a LIKE",
+    "SELECT * FROM t WHERE a ~ 1",
+    "SELECT * FROM t WHERE a = 1 extra",
+    "SELECT * FROM t ORDER a",
+    "SELECT * FROM t LIMIT",
+    "SELECT FOO(a) FROM t",
+    "INSERT INTO t (a, b) VALUES (1)",
+]
+
+
+@pytest.mark.parametrize('where, expected', CONDITIONS)
+def test_parse_conditions(where, expected):
+    assert repr(sql_parser.parse(f"SELECT * FROM t WHERE {where}").where) == expected
+
+
+@pytest.mark.parametrize('where, params, expected', PREDICATES)
+def test_compiled_predicate(where, params, expected):
+    predicate = sql_parser.compile_condition(sql_parser.parse(f"SELECT * FROM t WHERE {where}").where)(params)
+    assert [i for i, row in enumerate(ROWS) if predicate(row)] == expected
+
+
+def test_parse_order_limit_offset():
+    stmt = sql_parser.parse("SELECT a, COUNT(*) AS n FROM t ORDER BY a DESC, id LIMIT 10 OFFSET :o")
+    assert [repr(item) for item in stmt.items] == ['a', 'COUNT(*) AS n']
+    assert stmt.is_aggregate
+    assert stmt.order_by == (('a', True), ('id', False))
+    assert (stmt.limit.bind({}), stmt.offset.bind({'o': 20})) == (10, 20)
+    stmt = sql_parser.parse("SELECT * FROM t ORDER BY a ASC LIMIT :n")
+    assert (stmt.order_by, stmt.offset) == ((('a', False),), None)
+    with pytest.raises(SQLSyntaxError):
+        stmt.limit.bind({})
+
+
+@pytest.mark.parametrize('sql', SYNTAX_ERRORS)
+def test_syntax_errors(sql):
+    with pytest.raises(SQLSyntaxError):
+        sql_parser.parse(sql)
+
+
+@pytest.mark.parametrize('sql, access', [
+    ("SELECT * FROM students WHERE student_id = :s", "index lookup students.student_id = :s"),
+    ("SELECT * FROM grades WHERE subject IN :subjects", "index lookup grades.subject IN :subjects"),
+    ("SELECT * FROM grades WHERE subject = :s AND score >= :m",
+     "index intersection grades (most selective of: subject = :s; score >= :m)"),
+    ("SELECT * FROM students WHERE name LIKE :p", "search index students (name LIKE :p)"),
+    ("SELECT * FROM grades ORDER BY score DESC LIMIT 10", "ordered index scan grades.score DESC"),
+    ("SELECT * FROM students WHERE age > 3", "full scan students"),
+])
+def test_explain_names_index(storage, sql, access):
+    assert storage.explain(sql)['access'] == access
+    assert storage.execute_sql(f"EXPLAIN {sql}") == [storage.explain(sql)]
+
+
+# NOT 和 NULL：三种后端结果相同，都按 SQL 的三值逻辑（NULL 行不因 NOT 而匹配）
+NULL_QUERIES = [
+    ("NOT (exam_type = :t)", lambda g: g['exam_type'] is not None and g['exam_type'] != '期中考试'),
+    ("exam_type != :t", lambda g: g['exam_type'] is not None and g['exam_type'] != '期中考试'),
+    ("NOT (exam_date > :d)", lambda g: g['exam_date'] is not None and g['exam_date'] <= '2024-12-01'),
+    ("exam_type NOT IN :ts", lambda g: g['exam_type'] is not None and g['exam_type'] != '期中考试'),
+    ("NOT (exam_type LIKE :p)", lambda g: g['exam_type'] is not None and not g['exam_type'].startswith('期中')),
+    ("NOT (exam_type = :t OR score > :s)",
+     lambda g: g['exam_type'] is not None and g['exam_type'] != '期中考试' and g['score'] <= 60),
+    ("NOT (exam_type = :t AND score > :s)",
+     lambda g: (g['exam_type'] is not None and g['exam_type'] != '期中考试') or g['score'] <= 60),
+    ("NOT (exam_type IS NULL) AND NOT (exam_date IS NOT NULL)",
+     lambda g: g['exam_type'] is not None and g['exam_date'] is None),
+]
+
+
+def test_not_follows_sql_null_semantics(backend_storage):
+    storage = backend_storage
+    student_ids = add_students(storage, 3)
+    rows = [{'student_id': student_ids[i % 3], 'subject': '数据结构', 'score': score,
+             'exam_type': exam_type, 'exam_date': exam_date}
+            for i, (score, exam_type, exam_date) in enumerate(
+                (score, exam_type, exam_date) for score in (40, 80)
+                for exam_type in ('期中考试', '期末考试', None) for exam_date in ('2024-11-10', '2025-01-10', None))]
+    storage.execute_many(
+        "INSERT INTO grades (student_id, subject, score, exam_type, exam_date) "
+        "VALUES (:student_id, :subject, :score, :exam_type, :exam_date)", rows)
+    grades = all_rows(storage, 'grades')
+    params = {'t': '期中考试', 'ts': ['期中考试'], 'd': '2024-12-01', 'p': '期中%', 's': 60}
+    for where, expected in NULL_QUERIES:
+        found = storage.execute_sql(f"SELECT * FROM grades WHERE {where}", params)
+        assert sorted(g['id'] for g in found) == sorted(g['id'] for g in grades if expected(g)), where
+    # IN 列表中有 NULL：NOT IN 对任何行都不成立
+    found = storage.execute_sql("SELECT * FROM grades WHERE exam_type NOT IN :ts", {'ts': ['期中考试', None]})
+    assert found == []
@@ -0,0 +1,56 @@
+"""唯一约束：JSON 存储与 SQL 后端一样拒绝重复值，并发添加同一学号只有一个成功"""
+import threading
+
+import pytest
+
+from conftest import add_students, all_rows
+
+
+def test_duplicate_insert_rejected(backend_storage):
+    storage = backend_storage
+    add_students(storage, 3)
+    with pytest.raises(storage.IntegrityError):
+        storage.execute_sql("INSERT INTO students (student_id, name, class_name) VALUES ('S0001', '重复', '一班')")
+    with pytest.raises(storage.IntegrityError):
+        storage.execute_sql("INSERT INTO classes (name) VALUES (:name)", {'name': all_rows(storage, 'classes')[0]['name']})
+    assert len(all_rows(storage, 'students')) == 3
+
+
+def test_duplicate_in_batch_rejected(backend_storage):
+    storage = backend_storage
+    with pytest.raises(storage.IntegrityError):
+        storage.execute_many("INSERT INTO students (student_id, name, class_name) VALUES (:s, '学生', '一班')",
+                             [{'s': 'A'}, {'s': 'B'}, {'s': 'A'}])
+    assert all_rows(storage, 'students') == []
+
+
+def test_update_to_existing_value_rejected(backend_storage):
+    storage = backend_storage
+    add_students(storage, 3)
+    with pytest.raises(storage.IntegrityError):
+        storage.execute_sql("UPDATE students SET student_id = 'S0000' WHERE student_id = 'S0001'")
+    # 改成自己原来的值、改其他字段不算重复
+    assert storage.execute_sql("UPDATE students SET student_id = 'S0001' WHERE student_id = 'S0001'") == 1
+    assert storage.execute_sql("UPDATE students SET class_name = '新班'") == 3
+    # 交换后不重复的改名可以
+    assert storage.execute_sql("UPDATE students SET student_id = 'X' WHERE student_id = 'S0002'") == 1
+    assert sorted(r['student_id'] for r in all_rows(storage, 'students')) == ['S0000', 'S0001', 'X']
+
+
+def test_concurrent_add_student(storage):
+    import student_service
+    results = []
+    barrier = threading.Barrier(8)
+
+    def add(i):
+        barrier.wait()
+        results.append(student_service.add_student({'student_id': 'S1', 'name': f'学生{i}', 'class_name': '一班'}))
+
+    threads = [threading.Thread(target=add, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sum(r['success'] for r in results) == 1
+    assert [r['message'] for r in results if not r['success']] == ['学号已存在'] * 7
+    assert len(storage.execute_sql("SELECT * FROM students WHERE student_id = 'S1'")) == 1
@@ -0,0 +1,34 @@
+"""修改学生 / 成绩时只有允许的字段进入 SET 子句"""
+from conftest import add_students
+
+
+def test_update_student_ignores_unknown_fields(storage):
+    import student_service
+    add_students(storage, 2)
+    before = student_service.get_student_by_id('S0000')
+    result = student_service.update_student('S0000', {
+        'name': '新名字', 'id': 999, 'created_at': '1999-01-01',
+        "class_name = '注入', name": 'x',
+    })
+    assert result['success']
+    after = student_service.get_student_by_id('S0000')
+    assert after == dict(before, name='新名字')
+
+
+def test_update_student_without_allowed_fields(storage):
+    import student_service
+    add_students(storage, 1)
+    result = student_service.update_student('S0000', {'id': 5})
+    assert not result['success']
+    assert student_service.get_student_by_id('S0000')['id'] != 5
+
+
+def test_update_grade_ignores_unknown_fields(storage):
+    import grade_service
+    add_students(storage, 1)
+    assert grade_service.add_grade({'student_id': 'S0000', 'subject': '数学', 'score': 80,
+                                    'exam_type': '期末考试', 'exam_date': '2025-01-10'})['success']
+    grade = grade_service.get_all_grades()[0]
+    result = grade_service.update_grade(grade['id'], {'score': 90, 'id': 999, 'student_name': 'x'})
+    assert result['success']
+    assert grade_service.get_grade_by_id(grade['id']) == dict(grade, score=90)
@@ -0,0 +1,106 @@
+"""写前日志：缓存上的原地写入、从快照加日志重新加载、合并日志后的结果都与按记录直接计算的一致"""
+import os
+import random
+
+from conftest import all_rows
+
+
+def _expected(rows):
+    return sorted((dict(r) for r in rows), key=lambda r: r['id'])
+
+
+def _reloaded(storage, table):
+    """丢掉缓存，相当于另一个进程从快照和日志重新读取"""
+    storage.clear_cache()
+    return _expected(all_rows(storage, table))
+
+
+def _random_writes(storage, count, seed=1, prefix='S'):
+    """随机插入、修改、删除学生，同时在字典里直接维护期望的结果"""
+    rnd = random.Random(seed)
+    expected = {}
+    for i in range(count):
+        action = rnd.random()
+        if action < 0.6 or not expected:
+            student_id = f'{prefix}{i:04d}'
+            storage.execute_sql(
+                "INSERT INTO students (student_id, name, class_name) VALUES (:s, :n, :c)",
+                {'s': student_id, 'n': f'学生{i}', 'c': rnd.choice(('一班', '二班'))})
+            expected[student_id] = {'student_id': student_id, 'name': f'学生{i}'}
+        elif action < 0.8:
+            student_id = rnd.choice(sorted(expected))
+            storage.execute_sql("UPDATE students SET name = :n WHERE student_id = :s",
+                                {'n': f'改名{i}', 's': student_id})
+            expected[student_id]['name'] = f'改名{i}'
+        else:
+            student_id = rnd.choice(sorted(expected))
+            storage.execute_sql("DELETE FROM students WHERE student_id = :s", {'s': student_id})
+            del expected[student_id]
+    return expected
+
+
+def _names(rows):
+    return {r['student_id']: r['name'] for r in rows}
+
+
+def test_writes_match_recompute(storage):
+    expected = _random_writes(storage, 300)
+    rows = all_rows(storage, 'students')
+    assert _names(rows) == {s: r['name'] for s, r in expected.items()}
+    # 索引查找与整表扫描一致
+    for student_id in list(expected)[::7]:
+        found = storage.execute_sql("SELECT * FROM students WHERE student_id = :s", {'s': student_id})
+        assert [r['name'] for r in found] == [expected[student_id]['name']]
+
+
+def test_reload_replays_wal(storage):
+    _random_writes(storage, 200)
+    before = _expected(all_rows(storage, 'students'))
+    assert os.path.getsize(storage._wal_path(storage.STUDENTS_FILE)) > 0
+    assert _reloaded(storage, 'students') == before
+
+
+def test_compaction_keeps_rows(storage):
+    storage.WAL_COMPACT_THRESHOLD = 25
+    _random_writes(storage, 200)
+    before = _expected(all_rows(storage, 'students'))
+    assert storage.get_cache_stats()['compactions'] > 0
+    assert _reloaded(storage, 'students') == before
+    storage.compact_all()
+    assert os.path.getsize(storage._wal_path(storage.STUDENTS_FILE)) == 0
+    assert _reloaded(storage, 'students') == before
+
+
+def test_other_process_wal_is_replayed(storage):
+    _random_writes(storage, 50)
+    entry = storage._get_entry(storage.STUDENTS_FILE)
+    # 另一个进程追加的日志：直接写日志文件，缓存只重放新增部分
+    storage._append_wal(storage.STUDENTS_FILE, [
+        {'op': 'insert', 'row': {'id': 10000, 'student_id': 'X1', 'name': '外部', 'class_name': '一班'}},
+        {'op': 'update', 'column': 'id', 'values': [10000], 'set': {'name': '外部改'}},
+    ])
+    rows = all_rows(storage, 'students')
+    assert storage._get_entry(storage.STUDENTS_FILE) is entry
+    assert _names(rows)['X1'] == '外部改'
+    assert _reloaded(storage, 'students') == _expected(rows)
+
+
+def test_writes_do_not_copy_table(storage):
+    _random_writes(storage, 50)
+    entry = storage._get_entry(storage.STUDENTS_FILE)
+    data = entry.data
+    _random_writes(storage, 50, seed=2, prefix='T')
+    # 插入、修改、删除都在缓存的列表上原地进行
+    assert storage._get_entry(storage.STUDENTS_FILE).data is data
+
+
+def test_readers_keep_their_snapshot(storage):
+    _random_writes(storage, 30)
+    rows = storage._read_table(storage.STUDENTS_FILE)
+    before = [dict(r) for r in rows]
+    storage.execute_sql("INSERT INTO students (student_id, name) VALUES ('NEW', '新')")
+    storage.execute_sql("UPDATE students SET name = '改' WHERE student_id = :s", {'s': before[0]['student_id']})
+    storage.execute_sql("DELETE FROM students WHERE student_id = :s", {'s': before[-1]['student_id']})
+    # 不持锁遍历的调用方手里的列表不受之后写入的影响
+    assert [dict(r) for r in rows] == before
+    assert storage._read_table(storage.STUDENTS_FILE) is not rows
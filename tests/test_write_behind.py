@@ -0,0 +1,154 @@
+"""写后缓冲：写入立即可见，写出后从磁盘重新读取的结果与按记录直接计算的一致"""
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import pytest
+
+from conftest import ROOT, add_students, all_rows
+
+# 子进程：打开写后缓冲后不停地插入学生（单条插入和批量插入交替），每写完一次输出已确认的行数
+_WRITER = """
+import query_log
+query_log.LOG_LEVEL = 'OFF'
+import data_storage
+data_storage.WRITE_BEHIND = True
+data_storage.WRITE_BEHIND_INTERVAL = 60
+data_storage.ensure_data_files()
+sql = "INSERT INTO students (student_id, name, class_name) VALUES (:s, 'x', '一班')"
+count = 0
+while True:
+    if count % 2:
+        data_storage.execute_sql(sql, {'s': f'S{count}'})
+    else:
+        data_storage.execute_many(sql, [{'s': f'S{count}'}])
+    count += 1
+    print(count, flush=True)
+"""
+
+
+@pytest.fixture
+def deferred(storage):
+    storage.WRITE_BEHIND = True
+    # 测试里手工写出，后台线程不在中途写出
+    storage.WRITE_BEHIND_INTERVAL = 60
+    return storage
+
+
+def _wal_ops(storage, file_path):
+    ops, _ = storage._read_wal(file_path)
+    return ops
+
+
+def _snapshot(storage):
+    return {table: sorted(all_rows(storage, table), key=lambda r: r['id']) for table in ('students', 'grades')}
+
+
+def _writes(storage):
+    student_ids = add_students(storage, 12)
+    for student_id in student_ids:
+        storage.execute_sql("INSERT INTO grades (student_id, subject, score) VALUES (:s, '数学', 70)",
+                            {'s': student_id})
+    storage.execute_sql("UPDATE grades SET score = 95 WHERE student_id IN :ids", {'ids': student_ids[:4]})
+    storage.execute_sql("UPDATE students SET name = '改名' WHERE class_name = '二班'")
+    storage.execute_sql("DELETE FROM students WHERE student_id IN :ids", {'ids': student_ids[::5]})
+    return student_ids
+
+
+def test_writes_visible_before_flush(deferred):
+    storage = deferred
+    student_ids = _writes(storage)
+    # 还没有写出，日志文件里什么都没有，本进程已经能读到
+    assert _wal_ops(storage, storage.STUDENTS_FILE) == []
+    assert _wal_ops(storage, storage.GRADES_FILE) == []
+    students = all_rows(storage, 'students')
+    assert sorted(r['student_id'] for r in students) == sorted(set(student_ids) - set(student_ids[::5]))
+    grades = all_rows(storage, 'grades')
+    assert sorted(g['student_id'] for g in grades) == sorted(r['student_id'] for r in students)
+    assert {g['student_id'] for g in grades if g['score'] == 95} == set(student_ids[1:4])
+
+
+def test_flush_then_reload_matches(deferred):
+    storage = deferred
+    _writes(storage)
+    before = _snapshot(storage)
+    storage.flush_writes()
+    assert storage._pending == {}
+    storage.clear_cache()
+    assert _snapshot(storage) == before
+
+
+def test_flush_coalesces_inserts(deferred):
+    storage = deferred
+    for i in range(20):
+        storage.execute_sql("INSERT INTO students (student_id, name, class_name) VALUES (:s, 'x', '一班')",
+                            {'s': f'S{i}'})
+    storage.execute_sql("DELETE FROM students WHERE student_id = 'S1'")
+    storage.execute_sql("DELETE FROM students WHERE student_id = 'S2'")
+    storage.flush_writes()
+    ops = _wal_ops(storage, storage.STUDENTS_FILE)
+    assert [op['op'] for op in ops] == ['insert_many', 'delete']
+    assert len(ops[0]['rows']) == 20 and len(ops[1]['values']) == 2
+
+
+def test_backpressure_flushes_synchronously(deferred):
+    storage = deferred
+    storage.WRITE_BEHIND_MAX_PENDING = 10
+    for i in range(25):
+        storage.execute_sql("INSERT INTO students (student_id, name, class_name) VALUES (:s, 'x', '一班')",
+                            {'s': f'S{i}'})
+    assert len(storage._pending.get(storage.STUDENTS_FILE, [])) < 10
+    flushed = sum(len(op['rows']) for op in _wal_ops(storage, storage.STUDENTS_FILE))
+    assert flushed >= 20
+
+
+def test_background_flusher(deferred):
+    storage = deferred
+    storage.WRITE_BEHIND_INTERVAL = 0.01
+    add_students(storage, 5)
+    deadline = time.monotonic() + 5
+    while storage._pending and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert storage._pending == {}
+    assert sum(len(op['rows']) for op in _wal_ops(storage, storage.STUDENTS_FILE)) == 5
+
+
+def test_compaction_includes_pending(deferred):
+    storage = deferred
+    storage.WAL_COMPACT_THRESHOLD = 10
+    _writes(storage)
+    before = _snapshot(storage)
+    assert storage.get_cache_stats()['compactions'] > 0
+    storage.flush_writes()
+    storage.clear_cache()
+    assert _snapshot(storage) == before
+
+
+@pytest.mark.skipif(not hasattr(signal, 'SIGTERM') or os.name != 'posix', reason='需要 POSIX 信号')
+def test_sigterm_during_write_burst(storage, tmp_path):
+    """写入过程中收到 SIGTERM：不死锁，退出前写出缓冲中已确认的全部写入"""
+    # 与 storage 使用同一个数据目录
+    env = dict(os.environ, SMS_DATA_DIR=str(tmp_path / 'data'))
+    child = subprocess.Popen([sys.executable, '-c', _WRITER], cwd=ROOT, env=env,
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    confirmed = 0
+    for line in child.stdout:
+        confirmed = int(line)
+        if confirmed >= 300:
+            break
+    child.send_signal(signal.SIGTERM)
+    try:
+        rest, errors = child.communicate(timeout=20)
+    except subprocess.TimeoutExpired:
+        child.kill()
+        pytest.fail('收到 SIGTERM 后子进程没有退出（死锁）')
+    lines = rest.split()
+    confirmed = int(lines[-1]) if lines else confirmed
+    assert child.returncode == 128 + signal.SIGTERM, errors
+    storage.clear_cache()
+    student_ids = {r['student_id'] for r in all_rows(storage, 'students')}
+    # 最后一次写入可能已经进了缓冲但还没来得及输出
+    assert {f'S{i}' for i in range(confirmed)} <= student_ids
+    assert len(student_ids) - confirmed in (0, 1)
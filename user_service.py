@@ -34,7 +34,8 @@ def add_user(user_data):
         return {'success': False, 'message': '用户名已存在'}
         
     try:
-        execute_sql("INSERT INTO users", user_data)
+        execute_sql("INSERT INTO users (username, password, role) VALUES (:username, :password, :role)",
+                    user_data)
         return {'success': True, 'message': '用户添加成功'}
     except Exception as e:
         return {'success': False, 'message': str(e)}
@@ -42,7 +43,7 @@ def add_user(user_data):
 def delete_user(user_id):
     """删除用户"""
     try:
-        count = execute_sql("DELETE FROM users", {'id': int(user_id)})
+        count = execute_sql("DELETE FROM users WHERE id = :id", {'id': int(user_id)})
         if count > 0:
             return {'success': True, 'message': '用户删除成功'}
         else:
@@ -52,8 +53,5 @@ def delete_user(user_id):
 
 def get_user_by_id(user_id):
     """通过 ID 获取用户"""
-    users = get_all_users()
-    for user in users:
-        if user['id'] == int(user_id):
-            return user
-    return None
+    users = execute_sql("SELECT * FROM users WHERE id = :id", {'id': int(user_id)})
+    return users[0] if users else None